@@ -4,7 +4,9 @@ from fastapi import Depends, Request
 from sqlmodel import Session
 
 from ..db.session import get_session
+from ..services.storage.availability import AvailabilityIndex
 from ..services.usgs import USGSLiveClient
+from ..services.utils.station_registry import StationRegistry
 
 
 def get_db_session() -> Generator[Session, None, None]:
@@ -16,3 +18,17 @@ def get_usgs_client(request: Request) -> USGSLiveClient:
     if client is None:
         raise RuntimeError("USGS client has not been initialised")
     return client
+
+
+def get_station_registry(request: Request) -> StationRegistry:
+    registry = getattr(request.app.state, "station_registry", None)
+    if registry is None:
+        raise RuntimeError("Station registry has not been initialised")
+    return registry
+
+
+def get_availability_index(request: Request) -> AvailabilityIndex:
+    index = getattr(request.app.state, "availability_index", None)
+    if index is None:
+        raise RuntimeError("Availability index has not been initialised")
+    return index
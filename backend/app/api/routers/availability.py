@@ -0,0 +1,136 @@
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from obspy import UTCDateTime
+
+from ...schemas.availability import (
+    AvailabilityDatasource,
+    AvailabilityExtent,
+    AvailabilityExtentResponse,
+    AvailabilityGaps,
+    AvailabilityGapsResponse,
+    AvailabilityQueryResponse,
+)
+from ...services.storage.availability import AvailabilityIndex
+from ..deps import get_availability_index
+
+router = APIRouter(prefix="/availability", tags=["availability"])
+
+
+def _time(epoch: float) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def _spans(spans: List[Tuple[float, float]]) -> List[List[datetime]]:
+    return [[_time(start), _time(end)] for start, end in spans]
+
+
+def _window(start: datetime, end: datetime) -> Tuple[float, float]:
+    lower, upper = UTCDateTime(start).timestamp, UTCDateTime(end).timestamp
+    if upper <= lower:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must be after start")
+    return lower, upper
+
+
+@router.get("/query", response_model=AvailabilityQueryResponse)
+def query_availability(
+    start: datetime,
+    end: datetime,
+    network: str | None = Query(default=None, description="Comma list, wildcards * and ?"),
+    station: str | None = None,
+    location: str | None = Query(default=None, description="Use -- for an empty location"),
+    channel: str | None = None,
+    index: AvailabilityIndex = Depends(get_availability_index),
+) -> AvailabilityQueryResponse:
+    """Continuous time spans per channel, in the spirit of FDSN availability ``query``."""
+
+    lower, upper = _window(start, end)
+    datasources = []
+    for (net, sta, loc, cha), entry in index.select(network, station, location, channel):
+        spans = entry.runs.spans(lower, upper)
+        if spans:
+            datasources.append(
+                AvailabilityDatasource(
+                    network=net,
+                    station=sta,
+                    location=loc,
+                    channel=cha,
+                    samplerate=entry.sampling_rate,
+                    timespans=_spans(spans),
+                )
+            )
+    if not datasources:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No data matched the query")
+    return AvailabilityQueryResponse(created=datetime.now(timezone.utc), datasources=datasources)
+
+
+@router.get("/extent", response_model=AvailabilityExtentResponse)
+def availability_extent(
+    network: str | None = None,
+    station: str | None = None,
+    location: str | None = None,
+    channel: str | None = None,
+    index: AvailabilityIndex = Depends(get_availability_index),
+) -> AvailabilityExtentResponse:
+    """Earliest and latest data per channel, like FDSN availability ``extent``."""
+
+    datasources = []
+    for (net, sta, loc, cha), entry in index.select(network, station, location, channel):
+        extent = entry.runs.extent()
+        if extent is None:
+            continue
+        datasources.append(
+            AvailabilityExtent(
+                network=net,
+                station=sta,
+                location=loc,
+                channel=cha,
+                samplerate=entry.sampling_rate,
+                earliest=_time(extent[0]),
+                latest=_time(extent[1]),
+                timespan_count=len(entry.runs),
+            )
+        )
+    if not datasources:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No data matched the query")
+    return AvailabilityExtentResponse(created=datetime.now(timezone.utc), datasources=datasources)
+
+
+@router.get("/gaps", response_model=AvailabilityGapsResponse)
+def availability_gaps(
+    start: datetime,
+    end: datetime,
+    network: str | None = None,
+    station: str | None = None,
+    location: str | None = None,
+    channel: str | None = None,
+    mingap: float = Query(0.0, ge=0, description="Ignore gaps shorter than this many seconds"),
+    gaps_only: bool = Query(False, description="Only list channels that have gaps"),
+    index: AvailabilityIndex = Depends(get_availability_index),
+) -> AvailabilityGapsResponse:
+    """Coverage, gaps and overlaps per channel within ``[start, end]``."""
+
+    lower, upper = _window(start, end)
+    datasources = []
+    for (net, sta, loc, cha), entry in index.select(network, station, location, channel):
+        gaps = entry.runs.gaps(lower, upper, mingap)
+        if gaps_only and not gaps:
+            continue
+        covered = entry.runs.covered(lower, upper)
+        datasources.append(
+            AvailabilityGaps(
+                network=net,
+                station=sta,
+                location=loc,
+                channel=cha,
+                samplerate=entry.sampling_rate,
+                covered_seconds=covered,
+                coverage=covered / (upper - lower),
+                gaps=_spans(gaps),
+                overlaps=_spans(entry.overlaps.spans(lower, upper)),
+            )
+        )
+    return AvailabilityGapsResponse(
+        created=datetime.now(timezone.utc), start=start, end=end, datasources=datasources
+    )
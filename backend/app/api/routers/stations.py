@@ -1,11 +1,13 @@
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 from ...models.base import Station
 from ...schemas.station import StationCreate, StationRead, StationUpdate
-from ..deps import get_db_session
+from ...services.utils.station_registry import StationRegistry
+from ..deps import get_db_session, get_station_registry
 
 router = APIRouter(prefix="/stations", tags=["stations"])
 
@@ -17,12 +19,21 @@ def list_stations(session: Session = Depends(get_db_session)) -> List[Station]:
 
 @router.post("/", response_model=StationRead, status_code=status.HTTP_201_CREATED)
 def create_station(
-    payload: StationCreate, session: Session = Depends(get_db_session)
+    payload: StationCreate,
+    session: Session = Depends(get_db_session),
+    registry: StationRegistry = Depends(get_station_registry),
 ) -> Station:
     station = Station.from_orm(payload)
     session.add(station)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError as exc:
+        session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Station already exists"
+        ) from exc
     session.refresh(station)
+    registry.register(station)
     return station
 
 
@@ -36,23 +47,41 @@ def get_station(station_id: int, session: Session = Depends(get_db_session)) ->
 
 @router.patch("/{station_id}", response_model=StationRead)
 def update_station(
-    station_id: int, payload: StationUpdate, session: Session = Depends(get_db_session)
+    station_id: int,
+    payload: StationUpdate,
+    session: Session = Depends(get_db_session),
+    registry: StationRegistry = Depends(get_station_registry),
 ) -> Station:
     station = session.get(Station, station_id)
     if not station:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Station not found")
+    previous_network = station.network
     for key, value in payload.dict(exclude_unset=True).items():
         setattr(station, key, value)
     session.add(station)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError as exc:
+        session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Station already exists"
+        ) from exc
     session.refresh(station)
+    registry.invalidate(previous_network, station.code)
+    registry.register(station)
     return station
 
 
 @router.delete("/{station_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_station(station_id: int, session: Session = Depends(get_db_session)) -> None:
+def delete_station(
+    station_id: int,
+    session: Session = Depends(get_db_session),
+    registry: StationRegistry = Depends(get_station_registry),
+) -> None:
     station = session.get(Station, station_id)
     if not station:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Station not found")
+    network, code = station.network, station.code
     session.delete(station)
     session.commit()
+    registry.invalidate(network, code)
@@ -1,22 +1,114 @@
-from fastapi import APIRouter, Request, status
+import math
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, TypeVar
 
-from ...schemas.waveform import WaveformIngestRequest, WaveformIngestResponse
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response, status
+from pydantic import ValidationError
+
+from ...core.metrics import REGISTRY
+from ...schemas.waveform import (
+    WaveformBatchIngestRequest,
+    WaveformBatchIngestResponse,
+    WaveformBatchItemResult,
+    WaveformEnvelope,
+    WaveformIngestRequest,
+    WaveformIngestResponse,
+    WaveformPreviewResponse,
+)
 from ...services.pipeline.context import WaveformPayload
+from ...services.storage.pyramid import EnvelopePyramid
+from ...services.storage.reader import (
+    WaveformNotFoundError,
+    WaveformReader,
+    stream_to_mseed,
+    stream_to_npy,
+)
 from ...services.streaming.publisher import WaveformStreamPublisher
+from ...services.utils.binary import (
+    MSEED_CONTENT_TYPES,
+    WaveformDecodeError,
+    build_mseed_payload,
+    build_raw_payload,
+)
+from ...services.utils.executor import PersistenceExecutor, PersistenceSaturatedError
 from ...services.utils.persistence import WaveformPersistenceService
 
 router = APIRouter(prefix="/waveforms", tags=["waveforms"])
 
+T = TypeVar("T")
 
-@router.post("/ingest", response_model=WaveformIngestResponse, status_code=status.HTTP_202_ACCEPTED)
-async def ingest_waveform(request: Request, payload: WaveformIngestRequest) -> WaveformIngestResponse:
+INGEST_SECONDS = REGISTRY.histogram(
+    "nscs_waveform_ingest_seconds",
+    "Duration of waveform ingest requests, storage and publishing included.",
+    ["endpoint"],
+)
+INGEST_WINDOWS = REGISTRY.counter(
+    "nscs_waveform_ingest_windows_total",
+    "Waveform windows received by the ingest endpoints.",
+    ["endpoint", "result"],
+)
+
+
+async def _persist(request: Request, func: Callable[..., T], *args, timings=None) -> T:
+    executor: PersistenceExecutor = request.app.state.persistence_executor
+    try:
+        return await executor.run(func, *args, timings=timings)
+    except PersistenceSaturatedError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+            headers={"Retry-After": "1"},
+        ) from exc
+
+
+async def _ingest(
+    request: Request, waveform_payload: WaveformPayload, endpoint: str
+) -> WaveformIngestResponse:
     services = request.app.state
     persistence: WaveformPersistenceService = services.waveform_persistence
     publisher: WaveformStreamPublisher = services.waveform_stream_publisher
 
-    waveform_payload = WaveformPayload(
+    started = time.perf_counter()
+    timings = waveform_payload.stage_timings
+    try:
+        waveform_file = await _persist(
+            request, persistence.store_waveform, waveform_payload, timings=timings
+        )
+    except Exception:
+        INGEST_WINDOWS.labels(endpoint, "rejected").inc()
+        raise
+    # A duplicate is published again when its original never reached the
+    # stream (its publish failed), so retries repair the gap.
+    if not waveform_payload.duplicate or waveform_payload.stream_offset is None:
+        publish_result = await publisher.publish_waveform(waveform_payload)
+        waveform_payload.stream_offset = publish_result.offset
+        waveform_payload.stream_partition = publish_result.partition
+        persistence.mark_published(waveform_payload)
+    INGEST_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+    result = "duplicate" if waveform_payload.duplicate else "accepted"
+    INGEST_WINDOWS.labels(endpoint, result).inc()
+
+    return WaveformIngestResponse(
+        waveform_file_id=waveform_file.id,
+        file_path=waveform_file.file_path,
+        byte_offset=waveform_file.byte_offset,
+        byte_length=waveform_file.byte_length,
+        object_uri=waveform_payload.object_uri,
+        stream_topic=publisher.topics.raw_waveforms,
+        stream_partition=waveform_payload.stream_partition,
+        stream_offset=waveform_payload.stream_offset,
+        duplicate=waveform_payload.duplicate,
+        timings_ms={stage: seconds * 1e3 for stage, seconds in timings.items()},
+    )
+
+
+def _to_payload(payload: WaveformIngestRequest) -> WaveformPayload:
+    return WaveformPayload(
         station_code=payload.station_code,
         network=payload.network,
+        channel=payload.channel,
+        location=payload.location,
         start_time=payload.start_time,
         end_time=payload.end_time,
         samples=payload.samples,
@@ -24,16 +116,289 @@ async def ingest_waveform(request: Request, payload: WaveformIngestRequest) -> W
         metadata=payload.metadata or {},
     )
 
-    waveform_file = persistence.store_waveform(waveform_payload)
-    publish_result = await publisher.publish_waveform(waveform_payload)
-    waveform_payload.stream_offset = publish_result.offset
-    waveform_payload.stream_partition = publish_result.partition
 
-    return WaveformIngestResponse(
-        waveform_file_id=waveform_file.id,
-        file_path=waveform_file.file_path,
-        object_uri=waveform_payload.object_uri,
-        stream_topic=publish_result.topic,
-        stream_partition=publish_result.partition,
-        stream_offset=publish_result.offset,
+@router.post("/ingest", response_model=WaveformIngestResponse, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_waveform(request: Request, payload: WaveformIngestRequest) -> WaveformIngestResponse:
+    return await _ingest(request, _to_payload(payload), "json")
+
+
+@router.post(
+    "/ingest/batch",
+    response_model=WaveformBatchIngestResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def ingest_waveform_batch(
+    request: Request, payload: WaveformBatchIngestRequest
+) -> WaveformBatchIngestResponse:
+    """Ingest many windows, possibly from many stations, in one request.
+
+    Index rows for all valid windows are written in a single transaction and
+    published together. Failures are reported per window so clients only
+    need to resend the windows marked as not accepted.
+    """
+
+    services = request.app.state
+    persistence: WaveformPersistenceService = services.waveform_persistence
+    publisher: WaveformStreamPublisher = services.waveform_stream_publisher
+
+    started = time.perf_counter()
+    results: Dict[int, WaveformBatchItemResult] = {}
+    pending: List[tuple[int, WaveformPayload]] = []
+    for index, window in enumerate(payload.windows):
+        try:
+            pending.append((index, _to_payload(WaveformIngestRequest.parse_obj(window))))
+        except ValidationError as exc:
+            results[index] = WaveformBatchItemResult(index=index, accepted=False, error=str(exc))
+
+    waveform_payloads = [waveform_payload for _, waveform_payload in pending]
+    try:
+        stored = await _persist(request, persistence.store_waveforms, waveform_payloads)
+    except Exception:
+        INGEST_WINDOWS.labels("batch", "rejected").inc(len(payload.windows))
+        raise
+    publishable = [
+        (index, waveform_payload, waveform_file)
+        for (index, waveform_payload), waveform_file in zip(pending, stored)
+        if not isinstance(waveform_file, Exception)
+    ]
+    for (index, _), waveform_file in zip(pending, stored):
+        if isinstance(waveform_file, Exception):
+            results[index] = WaveformBatchItemResult(
+                index=index, accepted=False, error=str(waveform_file)
+            )
+
+    duplicates = [item for item in publishable if item[1].duplicate]
+    publishable = [item for item in publishable if not item[1].duplicate]
+    published = await publisher.publish_waveforms([item[1] for item in publishable])
+    for (index, waveform_payload, waveform_file), publish_result in zip(publishable, published):
+        item = WaveformBatchItemResult(
+            index=index,
+            accepted=False,
+            waveform_file_id=waveform_file.id,
+            file_path=waveform_file.file_path,
+            byte_offset=waveform_file.byte_offset,
+            byte_length=waveform_file.byte_length,
+            object_uri=waveform_payload.object_uri,
+        )
+        if isinstance(publish_result, BaseException):
+            item.error = f"publish failed: {publish_result}"
+        else:
+            waveform_payload.stream_offset = publish_result.offset
+            waveform_payload.stream_partition = publish_result.partition
+            persistence.mark_published(waveform_payload)
+            item.accepted = True
+            item.stream_partition = publish_result.partition
+            item.stream_offset = publish_result.offset
+        results[index] = item
+
+    # Resolved after publishing so repeats within this batch see the offset
+    # their first copy was just given. Windows whose original never reached
+    # the stream are published again, once per window.
+    unpublished: Dict[str, WaveformPayload] = {}
+    for _, waveform_payload, _ in duplicates:
+        persistence.resolve_stream_position(waveform_payload)
+        if waveform_payload.stream_offset is None:
+            unpublished.setdefault(waveform_payload.fingerprint or "", waveform_payload)
+    if unpublished:
+        republished = await publisher.publish_waveforms(list(unpublished.values()))
+        for waveform_payload, publish_result in zip(unpublished.values(), republished):
+            if not isinstance(publish_result, BaseException):
+                waveform_payload.stream_offset = publish_result.offset
+                waveform_payload.stream_partition = publish_result.partition
+                persistence.mark_published(waveform_payload)
+    for index, waveform_payload, waveform_file in duplicates:
+        persistence.resolve_stream_position(waveform_payload)
+        published_once = waveform_payload.stream_offset is not None
+        results[index] = WaveformBatchItemResult(
+            index=index,
+            accepted=published_once,
+            duplicate=True,
+            error=None if published_once else "publish failed",
+            waveform_file_id=waveform_file.id,
+            file_path=waveform_file.file_path,
+            byte_offset=waveform_file.byte_offset,
+            byte_length=waveform_file.byte_length,
+            object_uri=waveform_payload.object_uri,
+            stream_partition=waveform_payload.stream_partition,
+            stream_offset=waveform_payload.stream_offset,
+        )
+
+    ordered = [results[index] for index in sorted(results)]
+    accepted = sum(1 for item in ordered if item.accepted)
+    INGEST_SECONDS.labels("batch").observe(time.perf_counter() - started)
+    accepted_duplicates = sum(1 for item in ordered if item.accepted and item.duplicate)
+    INGEST_WINDOWS.labels("batch", "accepted").inc(accepted - accepted_duplicates)
+    INGEST_WINDOWS.labels("batch", "duplicate").inc(accepted_duplicates)
+    INGEST_WINDOWS.labels("batch", "rejected").inc(len(ordered) - accepted)
+    return WaveformBatchIngestResponse(
+        stream_topic=publisher.topics.raw_waveforms,
+        accepted=accepted,
+        failed=len(ordered) - accepted,
+        results=ordered,
+    )
+
+
+@router.post(
+    "/ingest/binary",
+    response_model=WaveformIngestResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def ingest_waveform_binary(
+    request: Request,
+    content_type: str = Header("application/octet-stream"),
+    x_sample_format: str = Header(
+        "int32", description="Sample encoding of raw bodies: int32 or float32 (little-endian)"
+    ),
+    x_station_code: str | None = Header(default=None),
+    x_network: str | None = Header(default=None),
+    x_channel: str | None = Header(default=None),
+    x_location: str | None = Header(default=None),
+    x_sampling_rate: float | None = Header(default=None),
+    x_start_time: datetime | None = Header(default=None),
+) -> WaveformIngestResponse:
+    """Ingest MiniSEED records or raw little-endian samples without JSON parsing.
+
+    MiniSEED bodies carry their own metadata. Raw ``application/octet-stream``
+    bodies describe the window through the ``X-Station-Code``, ``X-Network``,
+    ``X-Channel``, ``X-Location``, ``X-Sampling-Rate`` and ``X-Start-Time``
+    headers.
+    """
+
+    body = await request.body()
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    try:
+        if media_type in MSEED_CONTENT_TYPES:
+            waveform_payload = build_mseed_payload(body)
+        elif media_type == "application/octet-stream":
+            if not x_station_code or x_sampling_rate is None or x_start_time is None:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="X-Station-Code, X-Sampling-Rate and X-Start-Time headers are required",
+                )
+            waveform_payload = build_raw_payload(
+                body,
+                sample_format=x_sample_format,
+                station_code=x_station_code,
+                network=x_network,
+                channel=x_channel,
+                location=x_location,
+                sampling_rate=x_sampling_rate,
+                start_time=x_start_time,
+            )
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=f"Unsupported content type: {media_type}",
+            )
+    except WaveformDecodeError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    return await _ingest(request, waveform_payload, "binary")
+
+
+def _nullable(values) -> List[Optional[float]]:
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+@router.get("/{network}/{station}/preview", response_model=WaveformPreviewResponse)
+def preview_waveforms(
+    request: Request,
+    network: str,
+    station: str,
+    start: datetime = Query(...),
+    end: datetime = Query(...),
+    points: int = Query(1000, ge=1, le=20000, description="Number of min/max pairs per channel"),
+    channel: str | None = Query(default=None),
+    location: str | None = Query(default=None),
+) -> WaveformPreviewResponse:
+    """Min/max envelope of a span for plotting, served from the envelope pyramid.
+
+    Raw MiniSEED is never read; the finest precomputed level that still
+    yields ``points`` values is reduced to exactly ``points`` buckets.
+    Buckets without data are ``null``.
+    """
+
+    envelopes: EnvelopePyramid | None = request.app.state.envelope_pyramid
+    if envelopes is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Envelope pyramid is disabled"
+        )
+    try:
+        series = envelopes.preview(
+            network, station, start, end, points, channel=channel, location=location
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    if not series:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No data for {network}.{station} in the requested span",
+        )
+    returned = len(series[0].minimum)
+    return WaveformPreviewResponse(
+        network=network,
+        station=station,
+        start=start,
+        end=end,
+        points=returned,
+        step_seconds=(end - start).total_seconds() / returned,
+        resolution_seconds=series[0].resolution_seconds,
+        channels=[
+            WaveformEnvelope(
+                location=item.location,
+                channel=item.channel,
+                minimum=_nullable(item.minimum),
+                maximum=_nullable(item.maximum),
+            )
+            for item in series
+        ],
+    )
+
+
+@router.get("/{network}/{station}", response_class=Response)
+def read_waveforms(
+    request: Request,
+    network: str,
+    station: str,
+    start: datetime = Query(..., description="Start of the span (inclusive)"),
+    end: datetime = Query(..., description="End of the span (inclusive)"),
+    channel: str | None = Query(default=None),
+    location: str | None = Query(default=None),
+    format: str = Query("mseed", pattern="^(mseed|npy)$"),
+) -> Response:
+    """Return stored samples for one station between ``start`` and ``end``.
+
+    ``format=mseed`` returns MiniSEED records; ``format=npy`` returns a
+    single channel as a ``.npy`` array (gaps as NaN) described by the same
+    ``X-*`` headers the binary ingest endpoint accepts.
+    """
+
+    reader: WaveformReader = request.app.state.waveform_reader
+    try:
+        stream = reader.read(network, station, start, end, channel=channel, location=location)
+    except WaveformNotFoundError as exc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+
+    if format == "mseed":
+        return Response(
+            content=stream_to_mseed(stream, reader.storage.encoding.record_length),
+            media_type="application/vnd.fdsn.mseed",
+        )
+    try:
+        body = stream_to_npy(stream)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)) from exc
+    stats = stream[0].stats
+    return Response(
+        content=body,
+        media_type="application/x-npy",
+        headers={
+            "X-Network": stats.network,
+            "X-Station-Code": stats.station,
+            "X-Location": stats.location,
+            "X-Channel": stats.channel,
+            "X-Sampling-Rate": str(stats.sampling_rate),
+            "X-Start-Time": stats.starttime.isoformat(),
+        },
     )
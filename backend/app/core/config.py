@@ -1,3 +1,5 @@
+from typing import Dict, List
+
 from pydantic import BaseSettings, Field
 
 
@@ -12,6 +14,45 @@ class Settings(BaseSettings):
     data_root: str = Field(
         "./data", description="Root directory for transient waveform staging before upload."
     )
+    archive_max_open_files: int = Field(
+        256, description="Day files kept open by the SDS archive writer before LRU eviction."
+    )
+    archive_flush_interval_seconds: float = Field(
+        5.0, description="Interval between flushes of buffered SDS archive writes."
+    )
+    mseed_encoding: str = Field(
+        "auto",
+        description="MiniSEED encoding: auto, STEIM2, STEIM1, INT32 or FLOAT32.",
+    )
+    mseed_integer_encoding: str = Field(
+        "STEIM2", description="Encoding used by auto mode for integer-valued windows."
+    )
+    mseed_record_length: int = Field(
+        512, description="MiniSEED record length in bytes (power of two, >= 256)."
+    )
+    waveform_max_window_seconds: float = Field(
+        86400.0,
+        description="Longest window expected at ingest; bounds the index scan for range reads.",
+    )
+    segment_cache_max_bytes: int = Field(
+        256 * 1024 * 1024, description="Memory budget of the decoded waveform cache; 0 disables it."
+    )
+    segment_cache_block_seconds: int = Field(
+        600, description="Length of the time blocks the decoded waveform cache is keyed on."
+    )
+    envelope_pyramid_enabled: bool = Field(
+        True, description="Maintain min/max envelopes for waveform previews at ingest."
+    )
+    envelope_resolutions_seconds: List[int] = Field(
+        default_factory=lambda: [1, 10, 60],
+        description="Envelope pyramid levels in seconds; each must divide a day.",
+    )
+    waveform_dedup_enabled: bool = Field(
+        True, description="Skip windows whose content was already stored."
+    )
+    waveform_dedup_cache_size: int = Field(
+        100_000, description="Fingerprints kept in memory by the idempotency index."
+    )
     object_store_bucket: str = Field(
         "seismic-waveforms",
         description="Bucket used to archive waveform MiniSEED files.",
@@ -26,9 +67,56 @@ class Settings(BaseSettings):
     object_store_scheme: str = Field(
         "s3", description="URI scheme used when generating object storage links."
     )
+    object_store_region: str = Field("us-east-1", description="Region used to sign requests.")
+    object_store_access_key: str | None = Field(default=None)
+    object_store_secret_key: str | None = Field(default=None)
+    object_store_upload_concurrency: int = Field(
+        8, description="Maximum concurrent HTTP requests to the object store per node."
+    )
+    object_store_multipart_threshold_mb: int = Field(
+        16, description="Objects at or above this size are uploaded in parts."
+    )
+    object_store_part_size_mb: int = Field(8, description="Multipart upload part size.")
+    object_store_max_retries: int = Field(
+        3, description="Retries for failed object store requests."
+    )
+    persistence_workers: int = Field(
+        4, description="Worker threads that encode and store ingested waveform windows."
+    )
+    persistence_max_inflight: int = Field(
+        64,
+        description="Maximum queued plus running persistence jobs before ingest returns 503.",
+    )
     streaming_driver: str = Field(
         "inmemory",
-        description="Streaming driver identifier: inmemory (default) or kafka.",
+        description="Streaming driver identifier: inmemory (default), kafka or log.",
+    )
+    log_bus_root: str | None = Field(
+        default=None, description="Directory for the log driver; defaults to data_root/bus-log."
+    )
+    log_bus_partitions: int = Field(3, description="Partitions per topic for the log driver.")
+    log_bus_segment_mb: int = Field(64, description="Log driver segment size before rolling.")
+    log_bus_retention_mb: int | None = Field(
+        default=1024, description="Per-partition size kept by the log driver; empty keeps all."
+    )
+    log_bus_retention_hours: float | None = Field(
+        default=168, description="Age after which sealed log segments are deleted."
+    )
+    log_bus_fsync: str = Field(
+        "interval", description="Log driver durability: always, interval or never."
+    )
+    log_bus_fsync_interval_ms: int = Field(
+        1000, description="Flush interval for the log driver's interval fsync policy."
+    )
+    inmemory_bus_retention: int = Field(
+        10_000, description="Records kept per topic by the in-memory bus for replay."
+    )
+    inmemory_bus_queue_size: int = Field(
+        1_000, description="Queued records per in-memory subscriber before overflow applies."
+    )
+    inmemory_bus_overflow: str = Field(
+        "block",
+        description="In-memory subscriber overflow policy: block, drop-oldest or spill.",
     )
     kafka_bootstrap_servers: str = Field(
         "localhost:9092", description="Kafka bootstrap servers for realtime ingestion."
@@ -37,6 +125,42 @@ class Settings(BaseSettings):
     kafka_sasl_mechanism: str | None = Field(default=None)
     kafka_sasl_username: str | None = Field(default=None)
     kafka_sasl_password: str | None = Field(default=None)
+    kafka_linger_ms: int = Field(
+        5, description="How long the producer waits to fill a batch before sending it."
+    )
+    kafka_max_batch_bytes: int = Field(65536, description="Producer batch size per partition.")
+    kafka_compression: str | None = Field(
+        default=None, description="Producer batch compression: gzip, snappy, lz4 or zstd."
+    )
+    kafka_consumer_max_records: int = Field(
+        500, description="Records fetched per consumer getmany call."
+    )
+    kafka_consumer_concurrency: int = Field(
+        16, description="Concurrent handler calls per subscription; same-key records stay ordered."
+    )
+    kafka_consumer_max_in_flight: int = Field(
+        2000, description="Fetched but unprocessed records per subscription before fetching pauses."
+    )
+    kafka_consumer_commit_interval_ms: int = Field(
+        200, description="Minimum interval between background offset commits."
+    )
+    stream_partition_key: str = Field(
+        "station",
+        description="Bus key for waveform windows: station, cell (lat/lon grid) or window.",
+    )
+    stream_partition_cell_degrees: float = Field(
+        1.0, description="Grid size in degrees for the cell partition key."
+    )
+    bus_default_codec: str = Field(
+        "json", description="Codec for topics without an entry in bus_topic_codecs."
+    )
+    bus_topic_codecs: Dict[str, str] = Field(
+        default_factory=dict,
+        description=(
+            "Per-topic codec: json, orjson, msgpack or binary:<schema> "
+            "(waveform, phase_pick, association)."
+        ),
+    )
     topic_waveforms_raw: str = Field("waveforms.raw", description="Raw waveform topic name")
     topic_waveforms_phase_picks: str = Field(
         "waveforms.phase_picks", description="Phase pick stream topic"
@@ -1,17 +1,36 @@
+import logging
 from collections.abc import Generator
 
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateIndex
 from sqlmodel import Session, SQLModel, create_engine
 
 from ..core.config import get_settings
 
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
 engine = create_engine(settings.database_url, echo=False, future=True)
 
 
 def init_db() -> None:
-    """Create database tables if they do not exist."""
+    """Create database tables and any index missing from existing tables.
+
+    ``create_all`` only creates indexes together with their table, so indexes
+    added to a model later are created here for databases that predate them.
+    """
 
     SQLModel.metadata.create_all(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            # IF NOT EXISTS rather than ``checkfirst``: reflection cannot see
+            # expression indexes, so they would be created twice.
+            try:
+                with engine.begin() as connection:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+            except SQLAlchemyError as exc:
+                # E.g. a unique index over rows that already hold duplicates.
+                logger.error("Could not create index %s: %s", index.name, exc)
 
 
 def get_session() -> Generator[Session, None, None]:
@@ -2,19 +2,32 @@ from __future__ import annotations
 
 import logging
 from contextlib import asynccontextmanager
+from datetime import timedelta
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from .api.routers import events, stations, usgs, waveforms
+from .api.routers import availability, events, stations, usgs, waveforms
 from .core.config import get_settings
+from .core.metrics import CONTENT_TYPE, REGISTRY
 from .db.session import init_db, session_factory
-from .services.storage.mseed import MSeedStorage
+from .services.storage.availability import AvailabilityIndex
+from .services.storage.mseed import MSeedEncodingPolicy, MSeedStorage
 from .services.storage.object_store import ObjectStorageClient
+from .services.storage.pyramid import EnvelopePyramid
+from .services.storage.reader import WaveformReader
+from .services.storage.s3 import S3UploadEngine
+from .services.storage.segment_cache import SegmentCache
+from .services.streaming.codecs import CodecRegistry
+from .services.streaming.log_bus import LogMessageBus
 from .services.streaming.message_bus import InMemoryMessageBus, KafkaMessageBus, MessageBus
+from .services.streaming.partitioning import PartitionKeyBuilder
 from .services.streaming.publisher import WaveformStreamPublisher, WaveformStreamTopics
+from .services.utils.dedup import WaveformDedupIndex
+from .services.utils.executor import PersistenceExecutor
 from .services.utils.persistence import WaveformPersistenceService
+from .services.utils.station_registry import StationRegistry
 from .services.usgs import USGSLiveClient
 
 logger = logging.getLogger(__name__)
@@ -26,30 +39,136 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     init_db()
 
-    storage = MSeedStorage(Path(settings.data_root))
+    uploader: S3UploadEngine | None = None
+    if settings.object_store_endpoint:
+        uploader = S3UploadEngine(
+            settings.object_store_endpoint,
+            settings.object_store_bucket,
+            access_key=settings.object_store_access_key,
+            secret_key=settings.object_store_secret_key,
+            region=settings.object_store_region,
+            max_concurrency=settings.object_store_upload_concurrency,
+            multipart_threshold=settings.object_store_multipart_threshold_mb * 1024 * 1024,
+            part_size=settings.object_store_part_size_mb * 1024 * 1024,
+            max_retries=settings.object_store_max_retries,
+        )
+        await uploader.start()
     object_store = ObjectStorageClient(
         settings.object_store_bucket,
         base_path=settings.object_store_cache,
         endpoint=settings.object_store_endpoint,
         scheme=settings.object_store_scheme,
+        uploader=uploader,
+    )
+    storage = MSeedStorage(
+        Path(settings.data_root),
+        max_open_files=settings.archive_max_open_files,
+        flush_interval=settings.archive_flush_interval_seconds,
+        encoding=MSeedEncodingPolicy(
+            encoding=settings.mseed_encoding,
+            integer_encoding=settings.mseed_integer_encoding,
+            record_length=settings.mseed_record_length,
+        ),
+    )
+    storage.on_seal = lambda path: object_store.put_file(path, storage.build_object_key(path))
+    storage.start()
+    station_registry = StationRegistry(session_factory)
+    station_registry.warm()
+    dedup_index = (
+        WaveformDedupIndex(session_factory, capacity=settings.waveform_dedup_cache_size)
+        if settings.waveform_dedup_enabled
+        else None
+    )
+    segment_cache = (
+        SegmentCache(
+            settings.segment_cache_max_bytes,
+            block_seconds=settings.segment_cache_block_seconds,
+        )
+        if settings.segment_cache_max_bytes > 0
+        else None
     )
+    envelopes = (
+        EnvelopePyramid(
+            Path(settings.data_root) / "envelopes",
+            resolutions=settings.envelope_resolutions_seconds,
+        )
+        if settings.envelope_pyramid_enabled
+        else None
+    )
+    availability_index = AvailabilityIndex()
+    availability_index.warm(session_factory)
     waveform_persistence = WaveformPersistenceService(
         storage,
         session_factory,
         object_store=object_store,
+        station_registry=station_registry,
+        dedup_index=dedup_index,
+        segment_cache=segment_cache,
+        envelopes=envelopes,
+        availability=availability_index,
+    )
+    waveform_reader = WaveformReader(
+        storage,
+        session_factory,
+        station_registry,
+        object_store=object_store,
+        max_window=timedelta(seconds=settings.waveform_max_window_seconds),
+        cache=segment_cache,
+    )
+    persistence_executor = PersistenceExecutor(
+        max_workers=settings.persistence_workers,
+        max_inflight=settings.persistence_max_inflight,
     )
 
+    codecs = CodecRegistry(settings.bus_topic_codecs, default=settings.bus_default_codec)
     bus: MessageBus
-    if settings.streaming_driver.lower() == "kafka":
+    driver = settings.streaming_driver.lower()
+    if driver == "kafka":
         bus = KafkaMessageBus(
             settings.kafka_bootstrap_servers,
             security_protocol=settings.kafka_security_protocol,
             sasl_mechanism=settings.kafka_sasl_mechanism,
             sasl_username=settings.kafka_sasl_username,
             sasl_password=settings.kafka_sasl_password,
+            linger_ms=settings.kafka_linger_ms,
+            max_batch_size=settings.kafka_max_batch_bytes,
+            compression_type=settings.kafka_compression,
+            consumer_max_records=settings.kafka_consumer_max_records,
+            consumer_concurrency=settings.kafka_consumer_concurrency,
+            consumer_max_in_flight=settings.kafka_consumer_max_in_flight,
+            consumer_commit_interval_ms=settings.kafka_consumer_commit_interval_ms,
+            codecs=codecs,
+        )
+    elif driver == "log":
+        bus = LogMessageBus(
+            Path(settings.log_bus_root or Path(settings.data_root) / "bus-log"),
+            partitions=settings.log_bus_partitions,
+            segment_bytes=settings.log_bus_segment_mb * 1024 * 1024,
+            retention_bytes=(
+                settings.log_bus_retention_mb * 1024 * 1024
+                if settings.log_bus_retention_mb
+                else None
+            ),
+            retention_seconds=(
+                settings.log_bus_retention_hours * 3600
+                if settings.log_bus_retention_hours
+                else None
+            ),
+            fsync=settings.log_bus_fsync,
+            fsync_interval_ms=settings.log_bus_fsync_interval_ms,
+            consumer_max_records=settings.kafka_consumer_max_records,
+            consumer_concurrency=settings.kafka_consumer_concurrency,
+            consumer_max_in_flight=settings.kafka_consumer_max_in_flight,
+            consumer_commit_interval_ms=settings.kafka_consumer_commit_interval_ms,
+            codecs=codecs,
         )
     else:
-        bus = InMemoryMessageBus()
+        bus = InMemoryMessageBus(
+            retention=settings.inmemory_bus_retention,
+            queue_size=settings.inmemory_bus_queue_size,
+            overflow=settings.inmemory_bus_overflow,
+            spill_dir=Path(settings.data_root) / "bus-spill",
+        )
     await bus.start()
 
     topics = WaveformStreamTopics(
@@ -58,7 +177,15 @@ async def lifespan(app: FastAPI):
         associations=settings.topic_waveforms_associations,
         locations=settings.topic_waveforms_locations,
     )
-    stream_publisher = WaveformStreamPublisher(bus, topics)
+    stream_publisher = WaveformStreamPublisher(
+        bus,
+        topics,
+        partition_keys=PartitionKeyBuilder(
+            settings.stream_partition_key,
+            cell_degrees=settings.stream_partition_cell_degrees,
+            locate=station_registry.coordinates,
+        ),
+    )
 
     usgs_client = USGSLiveClient(
         base_url=settings.usgs_base_url,
@@ -68,6 +195,14 @@ async def lifespan(app: FastAPI):
     )
 
     app.state.waveform_persistence = waveform_persistence
+    app.state.persistence_executor = persistence_executor
+    app.state.station_registry = station_registry
+    app.state.object_uploader = uploader
+    app.state.waveform_dedup = dedup_index
+    app.state.waveform_reader = waveform_reader
+    app.state.segment_cache = segment_cache
+    app.state.envelope_pyramid = envelopes
+    app.state.availability_index = availability_index
     app.state.waveform_stream_publisher = stream_publisher
     app.state.message_bus = bus
     app.state.stream_topics = topics
@@ -77,6 +212,12 @@ async def lifespan(app: FastAPI):
     finally:
         await bus.stop()
         await usgs_client.aclose()
+        persistence_executor.shutdown()
+        storage.close()
+        if envelopes is not None:
+            envelopes.close()
+        if uploader is not None:
+            await uploader.stop()
 
 
 def create_application() -> FastAPI:
@@ -93,8 +234,15 @@ def create_application() -> FastAPI:
     async def health() -> dict[str, str]:
         return {"status": "ok"}
 
+    @app.get("/metrics", include_in_schema=False)
+    def metrics() -> Response:
+        """Prometheus scrape endpoint."""
+
+        return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
     app.include_router(stations.router)
     app.include_router(waveforms.router)
+    app.include_router(availability.router)
     app.include_router(events.router)
     app.include_router(usgs.router)
     return app
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Index, func
 from sqlmodel import Field, SQLModel
 
 
@@ -29,6 +30,16 @@ class Station(StationBase, TimeStampedModel, table=True):
     location: str | None = None
 
 
+# One station per (network, code). SQL treats NULLs as distinct, so a plain
+# unique constraint would admit any number of stations without a network.
+Index(
+    "ux_station_network_code",
+    func.coalesce(Station.__table__.c.network, ""),
+    Station.__table__.c.code,
+    unique=True,
+)
+
+
 class StationStatus(TimeStampedModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     station_id: int = Field(foreign_key="station.id")
@@ -38,13 +49,25 @@ class StationStatus(TimeStampedModel, table=True):
 
 
 class WaveformFile(TimeStampedModel, table=True):
+    __table_args__ = (
+        Index("ix_waveformfile_station_time", "station_id", "start_time", "end_time"),
+        # Unique so concurrent writers cannot index the same window twice.
+        Index("ux_waveformfile_fingerprint", "fingerprint", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     station_id: int = Field(foreign_key="station.id")
+    channel: str | None = None
+    location: str | None = None
     start_time: datetime
     end_time: datetime
+    sampling_rate: float | None = None
     file_path: str
+    byte_offset: int | None = None
+    byte_length: int | None = None
     object_uri: str | None = Field(default=None, index=True)
     checksum: str | None = None
+    fingerprint: str | None = None
 
 
 class PhasePick(TimeStampedModel, table=True):
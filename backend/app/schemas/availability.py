@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class AvailabilityChannel(BaseModel):
+    network: str
+    station: str
+    location: str
+    channel: str
+    samplerate: float | None = None
+
+
+class AvailabilityDatasource(AvailabilityChannel):
+    timespans: List[List[datetime]] = Field(
+        ..., description="Continuous [start, end] runs clipped to the query window"
+    )
+
+
+class AvailabilityQueryResponse(BaseModel):
+    created: datetime
+    datasources: List[AvailabilityDatasource]
+
+
+class AvailabilityExtent(AvailabilityChannel):
+    earliest: datetime
+    latest: datetime
+    timespan_count: int
+
+
+class AvailabilityExtentResponse(BaseModel):
+    created: datetime
+    datasources: List[AvailabilityExtent]
+
+
+class AvailabilityGaps(AvailabilityChannel):
+    covered_seconds: float
+    coverage: float = Field(..., description="Fraction of the query window with data")
+    gaps: List[List[datetime]]
+    overlaps: List[List[datetime]]
+
+
+class AvailabilityGapsResponse(BaseModel):
+    created: datetime
+    start: datetime
+    end: datetime
+    datasources: List[AvailabilityGaps]
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -7,6 +7,8 @@ from pydantic import BaseModel, Field
 class WaveformIngestRequest(BaseModel):
     station_code: str = Field(..., description="Station code that produced the waveform")
     network: str | None = Field(default=None, description="Network code")
+    channel: str | None = Field(default=None, description="SEED channel code, e.g. HHZ")
+    location: str | None = Field(default=None, description="SEED location code")
     sampling_rate: float = Field(..., description="Sampling rate in Hz")
     start_time: datetime
     end_time: datetime
@@ -17,7 +19,62 @@ class WaveformIngestRequest(BaseModel):
 class WaveformIngestResponse(BaseModel):
     waveform_file_id: int
     file_path: str
+    byte_offset: int | None = None
+    byte_length: int | None = None
     object_uri: str | None = None
     stream_topic: str
     stream_partition: int | None = None
     stream_offset: int | None = None
+    duplicate: bool = Field(
+        default=False, description="True when the window was already stored; ids refer to the original"
+    )
+    timings_ms: Dict[str, float] | None = Field(
+        default=None, description="Per-stage persistence timings in milliseconds"
+    )
+
+
+class WaveformBatchIngestRequest(BaseModel):
+    windows: List[Dict[str, Any]] = Field(
+        ...,
+        min_items=1,
+        description="Windows in WaveformIngestRequest form; each is validated independently",
+    )
+
+
+class WaveformBatchItemResult(BaseModel):
+    index: int
+    accepted: bool
+    waveform_file_id: int | None = None
+    file_path: str | None = None
+    byte_offset: int | None = None
+    byte_length: int | None = None
+    object_uri: str | None = None
+    stream_partition: int | None = None
+    stream_offset: int | None = None
+    duplicate: bool = False
+    error: str | None = None
+
+
+class WaveformBatchIngestResponse(BaseModel):
+    stream_topic: str
+    accepted: int
+    failed: int
+    results: List[WaveformBatchItemResult]
+
+
+class WaveformEnvelope(BaseModel):
+    location: str
+    channel: str
+    minimum: List[Optional[float]]
+    maximum: List[Optional[float]]
+
+
+class WaveformPreviewResponse(BaseModel):
+    network: str
+    station: str
+    start: datetime
+    end: datetime
+    points: int
+    step_seconds: float
+    resolution_seconds: int = Field(..., description="Pyramid level the envelope was built from")
+    channels: List[WaveformEnvelope]
@@ -0,0 +1,147 @@
+"""Dynamic micro-batching of calls that are cheaper in bulk, such as model inference."""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Generic, List, NamedTuple, Sequence, Set, TypeVar
+
+from .stats import LatencyStats
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _Pending(NamedTuple):
+    item: object
+    future: asyncio.Future
+    enqueued_at: float
+
+
+@dataclass
+class BatcherMetrics:
+    """Counters of a :class:`MicroBatcher`.
+
+    ``full`` batches were dispatched because ``max_batch`` items arrived,
+    ``timed_out`` ones because the oldest item waited ``max_wait``;
+    ``delay`` is the time items spent waiting for their batch.
+    """
+
+    max_batch: int
+    batches: int = 0
+    items: int = 0
+    full: int = 0
+    timed_out: int = 0
+    failed: int = 0
+    delay: LatencyStats = field(default_factory=LatencyStats)
+
+    @property
+    def fill_ratio(self) -> float:
+        """Mean batch size as a fraction of ``max_batch``."""
+
+        return self.items / (self.batches * self.max_batch) if self.batches else 0.0
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collects concurrent calls into batches for ``runner``.
+
+    Each ``submit`` waits until ``max_batch`` items are pending or the
+    oldest pending item has waited ``max_wait_ms``, whichever comes first,
+    then ``runner`` is called once with the batch and must return one result
+    per item in order; every caller gets its own result (or the batch's
+    exception). A runner can fail single items by returning an exception
+    in their slot, which is raised to that caller only. ``max_wait_ms`` is
+    therefore the most latency batching adds to a call. Batches run
+    concurrently with the collection of the next one.
+    """
+
+    def __init__(
+        self,
+        runner: Callable[[List[T]], Awaitable[Sequence[R]]],
+        *,
+        max_batch: int,
+        max_wait_ms: float,
+    ) -> None:
+        if max_batch <= 0 or max_wait_ms < 0:
+            raise ValueError("max_batch must be positive and max_wait_ms not negative")
+        self.runner = runner
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = BatcherMetrics(max_batch=max_batch)
+        self._pending: List[_Pending] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(_Pending(item, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._dispatch(timed_out=False)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch, True)
+        return await future
+
+    async def flush(self) -> None:
+        """Dispatch whatever is pending and wait for every running batch."""
+
+        while self._pending:
+            self._dispatch(timed_out=False)
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def _dispatch(self, timed_out: bool) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._pending[: self.max_batch]
+        del self._pending[: self.max_batch]
+        if batch:
+            if timed_out:
+                self.metrics.timed_out += 1
+            elif len(batch) == self.max_batch:
+                self.metrics.full += 1
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+        if self._pending:
+            if len(self._pending) >= self.max_batch:
+                self._dispatch(timed_out=False)
+                return
+            remaining = self.max_wait - (time.perf_counter() - self._pending[0].enqueued_at)
+            self._timer = asyncio.get_running_loop().call_later(
+                max(0.0, remaining), self._dispatch, True
+            )
+
+    async def _run(self, batch: List[_Pending]) -> None:
+        started = time.perf_counter()
+        for pending in batch:
+            self.metrics.delay.observe(started - pending.enqueued_at)
+        self.metrics.batches += 1
+        self.metrics.items += len(batch)
+        try:
+            results = await self.runner([pending.item for pending in batch])
+            if len(results) != len(batch):
+                raise ValueError(
+                    f"Batch runner returned {len(results)} results for {len(batch)} items"
+                )
+        except asyncio.CancelledError:
+            for pending in batch:
+                pending.future.cancel()
+            raise
+        except Exception as exc:
+            self.metrics.failed += 1
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            return
+        for pending, result in zip(batch, results):
+            if pending.future.done():
+                continue
+            if isinstance(result, Exception):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
+
+
+__all__ = ["BatcherMetrics", "MicroBatcher"]
@@ -5,6 +5,8 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
+from ..processing.pick_batch import PickBatch
+
 
 @dataclass
 class WaveformPayload:
@@ -17,18 +19,31 @@ class WaveformPayload:
     samples: Any  # numpy array or bytes depending on ingest source
     sampling_rate: float
     metadata: Dict[str, Any] = field(default_factory=dict)
+    channel: str | None = None
+    location: str | None = None
     file_path: Path | None = None
+    byte_offset: int | None = None
+    byte_length: int | None = None
     object_uri: str | None = None
     storage_key: str | None = None
     stream_offset: int | None = None
     stream_partition: int | None = None
+    fingerprint: str | None = None
+    duplicate: bool = False
+    stage_timings: Dict[str, float] = field(default_factory=dict)
 
 
 @dataclass
 class PhasePickResult:
-    picks: List[Dict[str, Any]]
+    batch: PickBatch
     raw_output: Dict[str, Any] | None = None
 
+    @property
+    def picks(self) -> List[Dict[str, Any]]:
+        """Row-wise dicts for persistence or publishing; built on each access."""
+
+        return self.batch.to_records()
+
 
 @dataclass
 class AssociationResult:
@@ -71,6 +86,8 @@ class ProcessingContext:
     magnitude: Optional[MagnitudeResult] = None
     mechanism: Optional[MechanismResult] = None
     errors: List[str] = field(default_factory=list)
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    critical_path: List[str] = field(default_factory=list)
 
     def add_error(self, message: str) -> None:
         self.errors.append(message)
@@ -0,0 +1,234 @@
+"""Execution backends for the CPU-bound pipeline stages."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Mapping, Protocol, Tuple
+
+import numpy as np
+
+from ..processing.pick_batch import PickBatch
+
+logger = logging.getLogger(__name__)
+
+STAGE_EXECUTOR_KINDS = ("thread", "process", "inline")
+ServicesFactory = Callable[[], Mapping[str, Any]]
+
+
+class StageExecutor(Protocol):
+    async def run(self, service: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Run ``func(*args)``; ``func`` is a method of the pipeline's ``service``."""
+
+    def shutdown(self, wait: bool = True) -> None:
+        ...
+
+
+class InlineStageExecutor:
+    """Calls the stage on the event loop, for stages cheaper than a thread hop."""
+
+    async def run(self, service: str, func: Callable[..., Any], *args: Any) -> Any:
+        return func(*args)
+
+    def shutdown(self, wait: bool = True) -> None:
+        return None
+
+
+class ThreadStageExecutor:
+    """Runs stages on a thread pool; suits code that releases the GIL."""
+
+    def __init__(self, max_workers: int | None = None) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+
+    async def run(self, service: str, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, lambda: func(*args))
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Describes a numpy array placed in a shared memory block."""
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: np.dtype
+
+
+@dataclass(frozen=True)
+class _SharedPickBatch:
+    data: SharedArray
+    stations: Tuple[str, ...]
+    phases: Tuple[str, ...]
+    polarities: Tuple[str, ...]
+    extras: Dict[int, Dict[str, Any]]
+
+
+_worker_services: Dict[str, Any] = {}
+
+
+def _initialize_worker(factory: ServicesFactory) -> None:
+    """Build the worker's services once and let them load models and tables."""
+
+    _worker_services.update(factory())
+    for service in _worker_services.values():
+        warm = getattr(service, "warm", None)
+        if callable(warm):
+            warm()
+
+
+def _attach(shared: SharedArray, blocks: List[SharedMemory]) -> np.ndarray:
+    # Workers share the parent's resource tracker, which unlinks the block
+    # only if the parent dies without doing so itself.
+    block = SharedMemory(name=shared.name)
+    blocks.append(block)
+    return np.ndarray(shared.shape, dtype=shared.dtype, buffer=block.buf)
+
+
+def _restore(argument: Any, blocks: List[SharedMemory]) -> Any:
+    if isinstance(argument, SharedArray):
+        return _attach(argument, blocks)
+    if isinstance(argument, _SharedPickBatch):
+        return PickBatch(
+            _attach(argument.data, blocks),
+            argument.stations,
+            argument.phases,
+            argument.polarities,
+            argument.extras,
+        )
+    return argument
+
+
+def _invoke(service: str, method: str, args: Tuple[Any, ...]) -> Any:
+    blocks: List[SharedMemory] = []
+    try:
+        restored = [_restore(argument, blocks) for argument in args]
+        result = getattr(_worker_services[service], method)(*restored)
+        del restored
+        return result
+    finally:
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:  # pragma: no cover - a view outlived the call
+                logger.warning("Shared memory block %s still referenced", block.name)
+
+
+class ProcessStageExecutor:
+    """Runs stages in worker processes so numeric Python code escapes the GIL.
+
+    Each worker calls ``services_factory()`` once at start-up and then
+    ``warm()`` on every service that defines one, which is where a service
+    should load model weights or lookup tables, so calls only ship their
+    arguments.
+    The call is dispatched to the worker's own instance of the pipeline
+    attribute ``service``, which means stage configuration comes from the
+    factory, not from the parent's service objects.
+
+    numpy arrays (and ``PickBatch`` data) of at least
+    ``shared_memory_threshold`` bytes are copied once into a shared memory
+    block that the worker maps, instead of being pickled through the pool's
+    pipe; the block is released when the call returns.
+    """
+
+    def __init__(
+        self,
+        services_factory: ServicesFactory,
+        *,
+        max_workers: int | None = None,
+        shared_memory_threshold: int = 256 * 1024,
+        start_method: str = "spawn",
+    ) -> None:
+        self.shared_memory_threshold = shared_memory_threshold
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_initialize_worker,
+            initargs=(services_factory,),
+        )
+
+    async def run(self, service: str, func: Callable[..., Any], *args: Any) -> Any:
+        blocks: List[SharedMemory] = []
+        try:
+            shipped = tuple(self._share(argument, blocks) for argument in args)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, _invoke, service, func.__name__, shipped)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def _share(self, argument: Any, blocks: List[SharedMemory]) -> Any:
+        if isinstance(argument, np.ndarray) and argument.nbytes >= self.shared_memory_threshold:
+            return self._place(argument, blocks)
+        if isinstance(argument, PickBatch) and argument.nbytes >= self.shared_memory_threshold:
+            return _SharedPickBatch(
+                self._place(argument.data, blocks),
+                argument.stations,
+                argument.phases,
+                argument.polarities,
+                argument.extras,
+            )
+        return argument
+
+    @staticmethod
+    def _place(array: np.ndarray, blocks: List[SharedMemory]) -> SharedArray:
+        block = SharedMemory(create=True, size=max(array.nbytes, 1))
+        blocks.append(block)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        return SharedArray(block.name, array.shape, array.dtype)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def build_stage_executors(
+    kinds: Mapping[str, str],
+    *,
+    services_factory: ServicesFactory | None = None,
+    thread_workers: int | None = None,
+    process_workers: int | None = None,
+    shared_memory_threshold: int = 256 * 1024,
+) -> Dict[str, StageExecutor]:
+    """Executors per stage from ``{"locate": "process", ...}``.
+
+    Stages of the same kind share one pool. ``services_factory`` is required
+    when any stage uses ``process``.
+    """
+
+    shared: Dict[str, StageExecutor] = {}
+    executors: Dict[str, StageExecutor] = {}
+    for stage, kind in kinds.items():
+        if kind not in STAGE_EXECUTOR_KINDS:
+            raise ValueError(f"Unsupported executor for stage {stage}: {kind}")
+        if kind not in shared:
+            if kind == "thread":
+                shared[kind] = ThreadStageExecutor(thread_workers)
+            elif kind == "process":
+                if services_factory is None:
+                    raise ValueError("Process executors need a services_factory")
+                shared[kind] = ProcessStageExecutor(
+                    services_factory,
+                    max_workers=process_workers,
+                    shared_memory_threshold=shared_memory_threshold,
+                )
+            else:
+                shared[kind] = InlineStageExecutor()
+        executors[stage] = shared[kind]
+    return executors
+
+
+__all__ = [
+    "InlineStageExecutor",
+    "ProcessStageExecutor",
+    "STAGE_EXECUTOR_KINDS",
+    "SharedArray",
+    "StageExecutor",
+    "ThreadStageExecutor",
+    "build_stage_executors",
+]
@@ -2,14 +2,20 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import Callable
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Tuple
 
+import numpy as np
+
+from ...core.metrics import REGISTRY
 from ..processing.associator import AssociatorConfig, AssociatorService
 from ..processing.locator import LocatorConfig, LocatorService
 from ..processing.magnitude import MagnitudeConfig, MagnitudeService
 from ..processing.mechanism import MechanismConfig, MechanismService
-from ..processing.phase_picker import PhasePickerConfig, PhasePickerService
-from ..processing.result_types import PhaseDetection
+from ..processing.phase_picker import PhasePickerConfig, PhasePickerService, stack_windows
+from ..processing.pick_batch import PickBatch
+from .batching import MicroBatcher
 from .context import (
     AssociationResult,
     LocationResult,
@@ -18,12 +24,100 @@ from .context import (
     PhasePickResult,
     ProcessingContext,
 )
+from .executors import StageExecutor, ThreadStageExecutor
 
 logger = logging.getLogger(__name__)
 
+STAGE_SECONDS = REGISTRY.histogram(
+    "nscs_pipeline_stage_seconds", "Duration of each processing pipeline stage.", ["stage"]
+)
+STAGES_TOTAL = REGISTRY.counter(
+    "nscs_pipeline_stages_total",
+    "Pipeline stages run; ``halted`` stages stopped their dependents.",
+    ["stage", "result"],
+)
+
+# Stage name -> pipeline attribute holding the service that runs it.
+STAGE_SERVICES = {
+    "pick": "phase_picker",
+    "associate": "associator",
+    "locate": "locator",
+    "magnitude": "magnitude",
+    "mechanism": "mechanism",
+}
+
+
+@dataclass(frozen=True)
+class PipelineStage:
+    """A node of the pipeline DAG.
+
+    ``run`` fills its part of the context and returns whether the stages
+    depending on it should run.
+    """
+
+    name: str
+    depends_on: Tuple[str, ...]
+    run: Callable[[ProcessingContext], Awaitable[bool]]
+
+
+def _topological_order(stages: List[PipelineStage]) -> List[PipelineStage]:
+    """Stages ordered so every dependency precedes its dependents."""
+
+    by_name = {stage.name: stage for stage in stages}
+    ordered: List[PipelineStage] = []
+    state: Dict[str, str] = {}
+
+    def visit(stage: PipelineStage) -> None:
+        if state.get(stage.name) == "done":
+            return
+        if state.get(stage.name) == "visiting":
+            raise ValueError(f"Pipeline stages form a cycle through {stage.name}")
+        state[stage.name] = "visiting"
+        for name in stage.depends_on:
+            if name not in by_name:
+                raise ValueError(f"Stage {stage.name} depends on unknown stage {name}")
+            visit(by_name[name])
+        state[stage.name] = "done"
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def _critical_path(
+    stages: List[PipelineStage], spans: Mapping[str, Tuple[float, float]]
+) -> List[str]:
+    """The chain of executed stages ending with the last one to finish."""
+
+    if not spans:
+        return []
+    dependencies = {stage.name: stage.depends_on for stage in stages}
+    current: str | None = max(spans, key=lambda name: spans[name][1])
+    path: List[str] = []
+    while current is not None:
+        path.append(current)
+        upstream = [name for name in dependencies[current] if name in spans]
+        current = max(upstream, key=lambda name: spans[name][1]) if upstream else None
+    path.reverse()
+    return path
+
 
 class ProcessingPipeline:
-    """Coordinates the end-to-end processing of incoming waveform data."""
+    """Coordinates the end-to-end processing of incoming waveform data.
+
+    The stages and their dependencies are declared in ``_declare_stages``
+    (pick -> associate -> locate / magnitude / mechanism) and kept in
+    ``stages`` in dependency order. ``executors`` maps stage names (see
+    ``STAGE_SERVICES``) to the backend that runs them; stages without an
+    entry share a thread pool.
+
+    With ``pick_max_wait_ms`` set, windows of contexts running at the same
+    time (e.g. under a multi-worker ``RealtimeQueue``) are gathered by
+    ``pick_batcher`` into batches of up to the picker's ``batch_size`` and
+    picked in one ``pick_stacked`` call, waiting at most that long for a
+    batch to fill.
+    """
 
     def __init__(
         self,
@@ -32,29 +126,134 @@ class ProcessingPipeline:
         locator: LocatorService,
         magnitude: MagnitudeService,
         mechanism: MechanismService,
+        executors: Mapping[str, StageExecutor] | None = None,
+        pick_max_wait_ms: float | None = None,
     ):
         self.phase_picker = phase_picker
         self.associator = associator
         self.locator = locator
         self.magnitude = magnitude
         self.mechanism = mechanism
+        unknown = set(executors or {}) - set(STAGE_SERVICES)
+        if unknown:
+            raise ValueError(f"Unknown pipeline stages: {sorted(unknown)}")
+        self.executors: Dict[str, StageExecutor] = dict(executors or {})
+        self._default_executor: StageExecutor | None = None
+        self.stages = _topological_order(self._declare_stages())
+        self.pick_batcher: MicroBatcher[Any, PickBatch] | None = None
+        if pick_max_wait_ms is not None:
+            self.pick_batcher = MicroBatcher(
+                self._pick_windows,
+                max_batch=phase_picker.config.batch_size,
+                max_wait_ms=pick_max_wait_ms,
+            )
 
     async def run(self, context: ProcessingContext) -> ProcessingContext:
-        try:
-            picks = await self._run_sync(self.phase_picker.pick_phases, context.waveform.samples)
-            context.phase_picks = PhasePickResult(
-                picks=[pick.__dict__ for pick in picks],
-                raw_output={"count": len(picks)},
+        """Run every stage once its dependencies have succeeded.
+
+        Stages whose dependencies all finished run concurrently, so after
+        association the location, magnitude and mechanism stages overlap
+        and a context costs its slowest branch rather than the sum. A stage
+        that fails, or reports there is nothing to do, skips its
+        dependents. Each stage's wall time lands in
+        ``context.stage_timings`` and the chain of stages that bounded the
+        total in ``context.critical_path``.
+        """
+
+        origin = time.perf_counter()
+        spans: Dict[str, Tuple[float, float]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        for stage in self.stages:
+            upstream = [tasks[name] for name in stage.depends_on]
+            tasks[stage.name] = asyncio.create_task(
+                self._execute(stage, upstream, context, spans, origin)
             )
+        await asyncio.gather(*tasks.values())
+        context.stage_timings.update(
+            {name: finished - began for name, (began, finished) in spans.items()}
+        )
+        context.critical_path = _critical_path(self.stages, spans)
+        return context
+
+    async def _execute(
+        self,
+        stage: PipelineStage,
+        upstream: List[asyncio.Task],
+        context: ProcessingContext,
+        spans: Dict[str, Tuple[float, float]],
+        origin: float,
+    ) -> bool:
+        if not all(await asyncio.gather(*upstream)):
+            return False
+        began = time.perf_counter() - origin
+        proceed = False
+        try:
+            proceed = await stage.run(context)
+            return proceed
+        finally:
+            ended = time.perf_counter() - origin
+            spans[stage.name] = (began, ended)
+            STAGE_SECONDS.labels(stage.name).observe(ended - began)
+            STAGES_TOTAL.labels(stage.name, "completed" if proceed else "halted").inc()
+
+    def _declare_stages(self) -> List[PipelineStage]:
+        return [
+            PipelineStage("pick", (), self._pick),
+            PipelineStage("associate", ("pick",), self._associate),
+            PipelineStage("locate", ("associate",), self._locate),
+            PipelineStage("magnitude", ("associate",), self._magnitude),
+            PipelineStage("mechanism", ("associate",), self._mechanism),
+        ]
+
+    async def _pick(self, context: ProcessingContext) -> bool:
+        try:
+            if self.pick_batcher is not None:
+                picks = await self.pick_batcher.submit(context.waveform.samples)
+            else:
+                picks = await self._run_stage(
+                    "pick", self.phase_picker.pick_batch, context.waveform.samples
+                )
+            context.phase_picks = PhasePickResult(batch=picks, raw_output={"count": len(picks)})
         except Exception as exc:  # pragma: no cover - protective
             logger.exception("Phase picking failed")
             context.add_error(f"phase_picking: {exc}")
-            return context
+            return False
+        return True
 
+    async def _pick_windows(self, windows: List[Any]) -> List[PickBatch | Exception]:
+        """Pick a micro-batch, stacking windows that share a channel layout.
+
+        Each layout is inferred as its own tensor, so a window with a
+        different channel count does not break the others; a group that
+        cannot be stacked or picked fails only its own windows.
+        """
+
+        arrays = [np.asarray(window) for window in windows]
+        groups: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        for index, array in enumerate(arrays):
+            groups.setdefault((array.ndim, array.shape[:-1]), []).append(index)
+
+        async def pick_group(rows: List[int]) -> List[PickBatch | Exception]:
+            try:
+                tensor, lengths = stack_windows([arrays[row] for row in rows])
+                return await self._run_stage(
+                    "pick", self.phase_picker.pick_stacked, tensor, lengths
+                )
+            except Exception as exc:
+                logger.warning("Phase picking failed for %s window(s): %s", len(rows), exc)
+                return [exc] * len(rows)
+
+        picked = await asyncio.gather(*(pick_group(rows) for rows in groups.values()))
+        results: List[PickBatch | Exception] = [None] * len(arrays)  # type: ignore[list-item]
+        for rows, picks in zip(groups.values(), picked):
+            for row, pick in zip(rows, picks):
+                results[row] = pick
+        return results
+
+    async def _associate(self, context: ProcessingContext) -> bool:
         try:
-            associations = await self._run_sync(
-                self.associator.associate,
-                [PhaseDetection(**pick) for pick in context.phase_picks.picks],
+            associations = await self._run_stage(
+                "associate", self.associator.associate, context.phase_picks.batch
             )
             context.association = AssociationResult(
                 candidate_events=[candidate.__dict__ for candidate in associations]
@@ -62,59 +261,93 @@ class ProcessingPipeline:
         except Exception as exc:  # pragma: no cover - protective
             logger.exception("Association failed")
             context.add_error(f"association: {exc}")
-            return context
+            return False
 
         if not context.association.candidate_events:
             logger.info("No association candidates produced")
-            return context
+            return False
+        return True
 
+    async def _locate(self, context: ProcessingContext) -> bool:
         try:
-            location_estimate = await self._run_sync(
-                self.locator.locate,
-                [PhaseDetection(**pick) for pick in context.phase_picks.picks],
+            location_estimate = await self._run_stage(
+                "locate", self.locator.locate, context.phase_picks.batch
             )
             if location_estimate:
                 context.location = LocationResult(**location_estimate.__dict__)
         except Exception as exc:  # pragma: no cover - protective
             logger.exception("Location failed")
             context.add_error(f"location: {exc}")
+            return False
+        return True
 
+    async def _magnitude(self, context: ProcessingContext) -> bool:
         try:
-            magnitude_estimate = await self._run_sync(
-                self.magnitude.estimate,
-                [PhaseDetection(**pick) for pick in context.phase_picks.picks],
+            magnitude_estimate = await self._run_stage(
+                "magnitude", self.magnitude.estimate, context.phase_picks.batch
             )
             if magnitude_estimate:
                 context.magnitude = MagnitudeResult(**magnitude_estimate.__dict__)
         except Exception as exc:  # pragma: no cover - protective
             logger.exception("Magnitude estimation failed")
             context.add_error(f"magnitude: {exc}")
+            return False
+        return True
 
+    async def _mechanism(self, context: ProcessingContext) -> bool:
         try:
-            mechanism_estimate = await self._run_sync(
-                self.mechanism.invert,
-                [PhaseDetection(**pick) for pick in context.phase_picks.picks],
+            mechanism_estimate = await self._run_stage(
+                "mechanism", self.mechanism.invert, context.phase_picks.batch
             )
             if mechanism_estimate:
                 context.mechanism = MechanismResult(**mechanism_estimate.__dict__)
         except Exception as exc:  # pragma: no cover - protective
             logger.exception("Mechanism inversion failed")
             context.add_error(f"mechanism: {exc}")
+            return False
+        return True
 
-        return context
+    def shutdown(self, wait: bool = True) -> None:
+        executors = {id(executor): executor for executor in self.executors.values()}
+        if self._default_executor is not None:
+            executors[id(self._default_executor)] = self._default_executor
+        for executor in executors.values():
+            executor.shutdown(wait=wait)
+
+    async def _run_stage(self, stage: str, func: Callable[..., Any], *args: Any) -> Any:
+        executor = self.executors.get(stage)
+        if executor is None:
+            if self._default_executor is None:
+                self._default_executor = ThreadStageExecutor()
+            executor = self._default_executor
+        return await executor.run(STAGE_SERVICES[stage], func, *args)
+
+
+def build_default_services() -> Dict[str, Any]:
+    """Services keyed by pipeline attribute; also the process-worker factory."""
 
-    async def _run_sync(self, func: Callable[..., object], *args, **kwargs):
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+    return {
+        "phase_picker": PhasePickerService(PhasePickerConfig()),
+        "associator": AssociatorService(AssociatorConfig()),
+        "locator": LocatorService(LocatorConfig()),
+        "magnitude": MagnitudeService(MagnitudeConfig()),
+        "mechanism": MechanismService(MechanismConfig()),
+    }
 
 
-def build_default_pipeline() -> ProcessingPipeline:
-    phase_picker = PhasePickerService(PhasePickerConfig())
-    associator = AssociatorService(AssociatorConfig())
-    locator = LocatorService(LocatorConfig())
-    magnitude = MagnitudeService(MagnitudeConfig())
-    mechanism = MechanismService(MechanismConfig())
-    return ProcessingPipeline(phase_picker, associator, locator, magnitude, mechanism)
+def build_default_pipeline(
+    executors: Mapping[str, StageExecutor] | None = None,
+    pick_max_wait_ms: float | None = None,
+) -> ProcessingPipeline:
+    return ProcessingPipeline(
+        **build_default_services(), executors=executors, pick_max_wait_ms=pick_max_wait_ms
+    )
 
 
-__all__ = ["ProcessingPipeline", "build_default_pipeline"]
+__all__ = [
+    "PipelineStage",
+    "ProcessingPipeline",
+    "STAGE_SERVICES",
+    "build_default_pipeline",
+    "build_default_services",
+]
@@ -2,58 +2,163 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from asyncio import Queue
 from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import List, Tuple
 
+from ...core.metrics import REGISTRY
 from .context import ProcessingContext
 from .orchestrator import ProcessingPipeline
+from .stats import LatencyStats
 
 logger = logging.getLogger(__name__)
 
 CompletionCallback = Callable[[ProcessingContext], Awaitable[None]]
 
+QUEUE_DEPTH = REGISTRY.gauge(
+    "nscs_pipeline_queue_depth", "Contexts waiting in realtime queues."
+)
+QUEUE_BUSY = REGISTRY.gauge(
+    "nscs_pipeline_queue_busy_workers", "Realtime queue workers running a pipeline."
+)
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "nscs_pipeline_queue_wait_seconds", "Time contexts spent queued before a worker took them."
+)
+QUEUE_SERVICE_SECONDS = REGISTRY.histogram(
+    "nscs_pipeline_queue_service_seconds",
+    "Time a worker spent on a context, completion callback included.",
+)
+CONTEXTS_TOTAL = REGISTRY.counter(
+    "nscs_pipeline_contexts_total", "Contexts taken off realtime queues.", ["outcome"]
+)
+
+
+@dataclass
+class QueueMetrics:
+    """Counters of a :class:`RealtimeQueue`.
+
+    ``wait`` is the time a context spent queued before a worker picked it
+    up, ``service`` the time the pipeline (and completion callback) took.
+    """
+
+    workers: int
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    dropped: int = 0
+    busy: int = 0
+    wait: LatencyStats = field(default_factory=LatencyStats)
+    service: LatencyStats = field(default_factory=LatencyStats)
+
+    @property
+    def utilization(self) -> float:
+        return self.busy / self.workers if self.workers else 0.0
+
 
 class RealtimeQueue:
-    """Async queue that drives waveform processing in the background."""
+    """Async queue that drives waveform processing in the background.
+
+    ``workers`` tasks take contexts off the queue and run the pipeline
+    concurrently; since every stage is offloaded to an executor, throughput
+    grows with the worker count until that executor is saturated. Contexts
+    complete in whatever order their pipelines finish.
+    """
 
     def __init__(
         self,
         pipeline: ProcessingPipeline,
         maxsize: int = 1000,
         on_complete: CompletionCallback | None = None,
+        *,
+        workers: int = 1,
     ):
+        if workers <= 0:
+            raise ValueError("workers must be positive")
         self.pipeline = pipeline
-        self.queue: Queue[ProcessingContext] = Queue(maxsize=maxsize)
-        self._task: asyncio.Task | None = None
-        self._stop_event = asyncio.Event()
+        self.queue: Queue[Tuple[ProcessingContext, float]] = Queue(maxsize=maxsize)
+        self.workers = workers
         self.on_complete = on_complete
+        self.metrics = QueueMetrics(workers=workers)
+        self._tasks: List[asyncio.Task] = []
+        self._closed = False
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
 
     async def start(self) -> None:
-        if self._task and not self._task.done():
+        if self._tasks:
             return
-        self._stop_event.clear()
-        self._task = asyncio.create_task(self._worker())
+        self._closed = False
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"realtime-queue-{index}")
+            for index in range(self.workers)
+        ]
+
+    async def stop(self, *, drain: bool = True, timeout: float | None = None) -> None:
+        """Stop accepting work and shut the workers down.
+
+        With ``drain`` the contexts already queued are processed first, for
+        at most ``timeout`` seconds; whatever is still queued afterwards is
+        dropped and counted in ``metrics.dropped``.
+        """
 
-    async def stop(self) -> None:
-        self._stop_event.set()
-        if self._task:
-            await self._task
+        self._closed = True
+        if drain and self._tasks:
+            joiner = asyncio.create_task(self.queue.join())
+            done, _ = await asyncio.wait([joiner], timeout=timeout)
+            if not done:
+                logger.warning("RealtimeQueue drain timed out with %s contexts queued", self.depth)
+                joiner.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.metrics.dropped += 1
+            QUEUE_DEPTH.dec()
+            CONTEXTS_TOTAL.labels("dropped").inc()
 
     async def submit(self, context: ProcessingContext) -> None:
-        await self.queue.put(context)
+        if self._closed:
+            raise RuntimeError("RealtimeQueue is stopped")
+        await self.queue.put((context, time.perf_counter()))
+        self.metrics.submitted += 1
+        QUEUE_DEPTH.inc()
 
     async def _worker(self) -> None:
-        while not self._stop_event.is_set():
-            context = await self.queue.get()
+        while True:
+            context, enqueued_at = await self.queue.get()
+            started = time.perf_counter()
+            QUEUE_DEPTH.dec()
+            QUEUE_BUSY.inc()
+            QUEUE_WAIT_SECONDS.observe(started - enqueued_at)
+            self.metrics.wait.observe(started - enqueued_at)
+            self.metrics.busy += 1
+            outcome = "cancelled"
             try:
                 processed = await self.pipeline.run(context)
                 logger.debug("Pipeline completed with errors=%s", processed.errors)
                 if self.on_complete:
                     await self.on_complete(processed)
-            except Exception:  # pragma: no cover - protective
+                self.metrics.completed += 1
+                outcome = "completed"
+            except Exception:
+                self.metrics.failed += 1
+                outcome = "failed"
                 logger.exception("Pipeline execution failed")
             finally:
+                elapsed = time.perf_counter() - started
+                self.metrics.busy -= 1
+                self.metrics.service.observe(elapsed)
+                QUEUE_BUSY.dec()
+                QUEUE_SERVICE_SECONDS.observe(elapsed)
+                CONTEXTS_TOTAL.labels(outcome).inc()
                 self.queue.task_done()
 
 
-__all__ = ["RealtimeQueue", "CompletionCallback"]
+__all__ = ["RealtimeQueue", "CompletionCallback", "LatencyStats", "QueueMetrics"]
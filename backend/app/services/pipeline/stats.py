@@ -0,0 +1,44 @@
+"""Latency accounting shared by the pipeline's queues and batchers."""
+from __future__ import annotations
+
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque
+
+
+@dataclass
+class LatencyStats:
+    """Running totals plus a window of recent samples for percentiles."""
+
+    window: int = 1024
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    recent: Deque[float] = field(default_factory=deque)
+
+    def __post_init__(self) -> None:
+        self.recent = deque(self.recent, maxlen=self.window)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Nearest-rank percentile (``q`` in 0..100) over the recent window."""
+
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        rank = max(1, math.ceil(q / 100 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+
+__all__ = ["LatencyStats"]
@@ -3,6 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Iterable, List
 
+from .pick_batch import PickBatch
 from .result_types import AssociationCandidate, PhaseDetection
 
 
@@ -18,12 +19,14 @@ class AssociatorService:
     def __init__(self, config: AssociatorConfig):
         self.config = config
 
-    def associate(self, picks: Iterable[PhaseDetection]) -> List[AssociationCandidate]:
+    def associate(self, picks: PickBatch | Iterable[PhaseDetection]) -> List[AssociationCandidate]:
         """Associate phase picks into candidate events.
 
         In the production system this should call REAL. The stub implementation
         simply returns an empty list but the surrounding infrastructure can handle
-        the results when integration happens.
+        the results when integration happens. ``picks`` is normally the
+        pipeline's ``PickBatch``; ``PickBatch.coerce`` also accepts a list of
+        ``PhaseDetection`` objects.
         """
 
         # TODO: integrate REAL associator
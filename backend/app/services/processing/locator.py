@@ -3,6 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Iterable
 
+from .pick_batch import PickBatch
 from .result_types import LocationEstimate, PhaseDetection
 
 
@@ -18,7 +19,7 @@ class LocatorService:
     def __init__(self, config: LocatorConfig):
         self.config = config
 
-    def locate(self, picks: Iterable[PhaseDetection]) -> LocationEstimate | None:
+    def locate(self, picks: PickBatch | Iterable[PhaseDetection]) -> LocationEstimate | None:
         """Return the location estimate for the event."""
 
         # TODO: integrate actual PINNLocation model.
@@ -3,6 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Iterable
 
+from .pick_batch import PickBatch
 from .result_types import MagnitudeEstimate, PhaseDetection
 
 
@@ -17,7 +18,7 @@ class MagnitudeService:
     def __init__(self, config: MagnitudeConfig):
         self.config = config
 
-    def estimate(self, picks: Iterable[PhaseDetection]) -> MagnitudeEstimate | None:
+    def estimate(self, picks: PickBatch | Iterable[PhaseDetection]) -> MagnitudeEstimate | None:
         # TODO: implement magnitude estimation (e.g., ML or empirical relations)
         return None
 
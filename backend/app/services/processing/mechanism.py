@@ -3,6 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Iterable
 
+from .pick_batch import PickBatch
 from .result_types import MechanismEstimate, PhaseDetection
 
 
@@ -17,7 +18,7 @@ class MechanismService:
     def __init__(self, config: MechanismConfig):
         self.config = config
 
-    def invert(self, picks: Iterable[PhaseDetection]) -> MechanismEstimate | None:
+    def invert(self, picks: PickBatch | Iterable[PhaseDetection]) -> MechanismEstimate | None:
         # TODO: integrate mechanism inversion workflow
         return None
 
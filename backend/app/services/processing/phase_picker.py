@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, List
+from typing import Any, List, Sequence, Tuple
 
+import numpy as np
+
+from .pick_batch import PickBatch
 from .result_types import PhaseDetection
 
 
@@ -13,22 +16,55 @@ class PhasePickerConfig:
     probability_threshold: float = 0.5
 
 
+def stack_windows(windows: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Stack waveform windows into one float32 tensor for batched inference.
+
+    Windows are ``(samples,)`` or ``(channels, samples)`` arrays with the
+    same leading shape; shorter ones are zero-padded at the end. Returns the
+    ``(batch, [channels,] samples)`` tensor and each window's sample count.
+    """
+
+    arrays = [np.asarray(window) for window in windows]
+    if not arrays:
+        raise ValueError("stack_windows needs at least one window")
+    leading = arrays[0].shape[:-1]
+    if any(array.shape[:-1] != leading for array in arrays):
+        raise ValueError("All windows must have the same channel layout")
+    lengths = np.array([array.shape[-1] for array in arrays], dtype=np.int64)
+    tensor = np.zeros((len(arrays), *leading, int(lengths.max())), dtype=np.float32)
+    for row, array in enumerate(arrays):
+        tensor[row, ..., : array.shape[-1]] = array
+    return tensor, lengths
+
+
 class PhasePickerService:
     """Interface to the neural network based phase picking system."""
 
     def __init__(self, config: PhasePickerConfig):
         self.config = config
 
-    def pick_phases(self, waveform: Any) -> List[PhaseDetection]:
-        """Run the neural network on the waveform samples.
+    def pick_stacked(self, tensor: np.ndarray, lengths: np.ndarray) -> List[PickBatch]:
+        """Run the neural network once over a ``stack_windows`` tensor.
 
         The implementation here is a stub that returns synthetic results but retains
         the interface required by the rest of the system. Integration with the
-        actual model should replace this method.
+        actual model should replace this method, splitting the model output by
+        row (ignoring the padding past ``lengths[row]``) and building each
+        window's result with ``PickBatch.from_arrays``.
         """
 
         # TODO: replace with real model inference
-        return []
+        return [PickBatch.empty() for _ in range(len(tensor))]
+
+    def pick_batch(self, waveform: Any) -> PickBatch:
+        """Picks of a single window; batch windows with ``pick_stacked`` where possible."""
+
+        return self.pick_stacked(*stack_windows([waveform]))[0]
+
+    def pick_phases(self, waveform: Any) -> List[PhaseDetection]:
+        """``pick_batch`` as ``PhaseDetection`` objects, for callers outside the pipeline."""
+
+        return self.pick_batch(waveform).to_detections()
 
 
-__all__ = ["PhasePickerService", "PhasePickerConfig"]
+__all__ = ["PhasePickerService", "PhasePickerConfig", "stack_windows"]
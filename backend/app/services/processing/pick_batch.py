@@ -0,0 +1,356 @@
+"""Columnar container for the phase picks exchanged between pipeline stages."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from .result_types import PhaseDetection
+
+PICK_DTYPE = np.dtype(
+    [
+        ("time", "datetime64[us]"),
+        ("probability", "<f4"),
+        ("station", "<u4"),
+        ("phase", "u1"),
+        ("polarity", "i1"),
+    ]
+)
+NO_POLARITY = -1
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_MAX_PHASES = 256
+_MAX_POLARITIES = 127
+
+_Row = Tuple[str, str, datetime, float, "str | None", "Dict[str, Any] | None"]
+
+
+def _as_utc(moment: datetime) -> datetime:
+    """Naive UTC; naive inputs are assumed to be UTC already."""
+
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _datetime64(moments: Sequence[datetime]) -> np.ndarray:
+    """``datetime64[us]`` column from datetimes.
+
+    Integer microseconds are an order of magnitude faster than letting numpy
+    convert datetime objects one by one.
+    """
+
+    return np.fromiter(
+        ((_as_utc(moment) - _EPOCH) // _MICROSECOND for moment in moments),
+        dtype=np.int64,
+        count=len(moments),
+    ).view("datetime64[us]")
+
+
+class _Categories:
+    """Interns strings into dense integer codes in first-seen order."""
+
+    def __init__(self, values: Iterable[str] = ()) -> None:
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def remap(self, values: Sequence[str]) -> np.ndarray:
+        """Codes in this table for another table's ``values``, by position."""
+
+        return np.fromiter((self.code(value) for value in values), dtype=np.int64, count=len(values))
+
+
+class PickBatch:
+    """Phase picks as one numpy structured array of ``PICK_DTYPE``.
+
+    Station, phase and polarity labels are categorical: the array stores a
+    small integer per row and ``stations``/``phases``/``polarities`` hold
+    the distinct labels (``NO_POLARITY`` marks a missing polarity). Times
+    are naive UTC ``datetime64[us]`` and probabilities ``float32``, so a
+    window of thousands of picks is a few dozen kilobytes and stages can
+    filter, sort and compute on whole columns. The rare per-pick ``extra``
+    dicts live in ``extras``, keyed by row.
+
+    Batches are treated as immutable; selections return new batches that
+    share the label tables. ``PhaseDetection`` objects and dicts are only
+    produced at the edges with :meth:`to_detections` and :meth:`to_records`.
+    """
+
+    __slots__ = ("data", "stations", "phases", "polarities", "extras")
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        stations: Sequence[str],
+        phases: Sequence[str],
+        polarities: Sequence[str] = (),
+        extras: Dict[int, Dict[str, Any]] | None = None,
+    ) -> None:
+        if data.dtype != PICK_DTYPE or data.ndim != 1:
+            raise ValueError("PickBatch data must be a 1-d array of PICK_DTYPE")
+        self.data = data
+        self.stations: Tuple[str, ...] = tuple(stations)
+        self.phases: Tuple[str, ...] = tuple(phases)
+        self.polarities: Tuple[str, ...] = tuple(polarities)
+        self.extras: Dict[int, Dict[str, Any]] = extras or {}
+
+    @classmethod
+    def empty(cls) -> "PickBatch":
+        return cls(np.empty(0, dtype=PICK_DTYPE), (), ())
+
+    @classmethod
+    def from_detections(cls, detections: Iterable[PhaseDetection]) -> "PickBatch":
+        return cls._build(
+            (
+                detection.station_code,
+                detection.phase_type,
+                detection.pick_time,
+                detection.probability,
+                detection.polarity,
+                detection.extra,
+            )
+            for detection in detections
+        )
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping[str, Any]]) -> "PickBatch":
+        """Build from dicts shaped like ``PhaseDetection`` (e.g. bus messages)."""
+
+        return cls._build(
+            (
+                record["station_code"],
+                record["phase_type"],
+                record["pick_time"],
+                record["probability"],
+                record.get("polarity"),
+                record.get("extra"),
+            )
+            for record in records
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        station_codes: Sequence[str] | np.ndarray,
+        phase_types: Sequence[str] | np.ndarray,
+        times: Sequence[datetime] | np.ndarray,
+        probabilities: Sequence[float] | np.ndarray,
+        polarities: Sequence[str | None] | np.ndarray | None = None,
+    ) -> "PickBatch":
+        """Build from parallel columns, as a picker's post-processing yields them.
+
+        ``times`` may be ``datetime64`` (taken as UTC) or naive UTC datetimes.
+        """
+
+        count = len(probabilities)
+        data = np.empty(count, dtype=PICK_DTYPE)
+        times = np.asarray(times)
+        if times.dtype.kind != "M":
+            times = _datetime64(times)
+        data["time"] = times
+        data["probability"] = probabilities
+        stations, station_codes = np.unique(np.asarray(station_codes, dtype=str), return_inverse=True)
+        phases, phase_codes = np.unique(np.asarray(phase_types, dtype=str), return_inverse=True)
+        if len(phases) > _MAX_PHASES:
+            raise ValueError(f"A PickBatch holds at most {_MAX_PHASES} phase types")
+        data["station"] = station_codes
+        data["phase"] = phase_codes
+        labels: List[str] = []
+        if polarities is None:
+            data["polarity"] = NO_POLARITY
+        else:
+            table = _Categories()
+            data["polarity"] = [
+                NO_POLARITY if value is None else table.code(value) for value in polarities
+            ]
+            labels = table.values
+        return cls(data, stations.tolist(), phases.tolist(), labels)
+
+    @classmethod
+    def _build(cls, rows: Iterable[_Row]) -> "PickBatch":
+        stations = _Categories()
+        phases = _Categories()
+        polarities = _Categories()
+        times: List[datetime] = []
+        probabilities: List[float] = []
+        station_codes: List[int] = []
+        phase_codes: List[int] = []
+        polarity_codes: List[int] = []
+        extras: Dict[int, Dict[str, Any]] = {}
+        for index, (station, phase, moment, probability, polarity, extra) in enumerate(rows):
+            station_codes.append(stations.code(station))
+            phase_codes.append(phases.code(phase))
+            polarity_codes.append(NO_POLARITY if polarity is None else polarities.code(polarity))
+            times.append(moment)
+            probabilities.append(probability)
+            if extra:
+                extras[index] = extra
+        if len(phases.values) > _MAX_PHASES or len(polarities.values) > _MAX_POLARITIES:
+            raise ValueError("Too many distinct phase types or polarities for a PickBatch")
+        data = np.empty(len(times), dtype=PICK_DTYPE)
+        data["time"] = _datetime64(times)
+        data["probability"] = probabilities
+        data["station"] = station_codes
+        data["phase"] = phase_codes
+        data["polarity"] = polarity_codes
+        return cls(data, stations.values, phases.values, polarities.values, extras)
+
+    @classmethod
+    def coerce(cls, picks: "PickBatch | Iterable[PhaseDetection]") -> "PickBatch":
+        """Pass batches through; wrap legacy ``PhaseDetection`` iterables."""
+
+        if isinstance(picks, PickBatch):
+            return picks
+        return cls.from_detections(picks)
+
+    @classmethod
+    def concatenate(cls, batches: Sequence["PickBatch"]) -> "PickBatch":
+        """Join batches, merging their label tables."""
+
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+        stations = _Categories()
+        phases = _Categories()
+        polarities = _Categories()
+        parts: List[np.ndarray] = []
+        extras: Dict[int, Dict[str, Any]] = {}
+        offset = 0
+        for batch in batches:
+            part = batch.data.copy()
+            part["station"] = stations.remap(batch.stations)[batch.data["station"]]
+            part["phase"] = phases.remap(batch.phases)[batch.data["phase"]]
+            if batch.polarities:
+                mapping = np.append(polarities.remap(batch.polarities), NO_POLARITY)
+                part["polarity"] = mapping[batch.data["polarity"]]
+            parts.append(part)
+            extras.update({offset + row: extra for row, extra in batch.extras.items()})
+            offset += len(batch)
+        if len(phases.values) > _MAX_PHASES or len(polarities.values) > _MAX_POLARITIES:
+            raise ValueError("Too many distinct phase types or polarities for a PickBatch")
+        return cls(np.concatenate(parts), stations.values, phases.values, polarities.values, extras)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        return f"PickBatch(picks={len(self)}, stations={len(self.stations)}, phases={self.phases})"
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    @property
+    def times(self) -> np.ndarray:
+        return self.data["time"]
+
+    @property
+    def probabilities(self) -> np.ndarray:
+        return self.data["probability"]
+
+    @property
+    def station_codes(self) -> np.ndarray:
+        """Station label of every row, as an object array."""
+
+        return np.asarray(self.stations, dtype=object)[self.data["station"]]
+
+    @property
+    def phase_types(self) -> np.ndarray:
+        return np.asarray(self.phases, dtype=object)[self.data["phase"]]
+
+    def epoch_seconds(self) -> np.ndarray:
+        """Pick times as float64 seconds since 1970, for numeric stages."""
+
+        return self.data["time"].astype(np.int64) / 1e6
+
+    def take(self, indices: np.ndarray) -> "PickBatch":
+        """Rows at ``indices`` (or where a boolean mask is true), in that order."""
+
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        extras: Dict[int, Dict[str, Any]] = {}
+        if self.extras:
+            for row, source in enumerate(indices.tolist()):
+                extra = self.extras.get(source)
+                if extra:
+                    extras[row] = extra
+        return PickBatch(self.data[indices], self.stations, self.phases, self.polarities, extras)
+
+    def sorted_by_time(self) -> "PickBatch":
+        return self.take(np.argsort(self.data["time"], kind="stable"))
+
+    def with_phase(self, phase: str) -> "PickBatch":
+        if phase not in self.phases:
+            return self.take(np.empty(0, dtype=np.int64))
+        return self.take(self.data["phase"] == self.phases.index(phase))
+
+    def above(self, probability: float) -> "PickBatch":
+        return self.take(self.data["probability"] >= probability)
+
+    def between(self, start: datetime, end: datetime) -> "PickBatch":
+        """Picks with ``start <= pick_time < end``."""
+
+        times = self.data["time"]
+        mask = (times >= np.datetime64(_as_utc(start), "us")) & (
+            times < np.datetime64(_as_utc(end), "us")
+        )
+        return self.take(mask)
+
+    def _rows(self):
+        stations = self.stations
+        phases = self.phases
+        polarities = self.polarities
+        extras = self.extras
+        times = self.data["time"].astype(object).tolist()
+        probabilities = self.data["probability"].tolist()
+        station_codes = self.data["station"].tolist()
+        phase_codes = self.data["phase"].tolist()
+        polarity_codes = self.data["polarity"].tolist()
+        for row in range(len(self.data)):
+            polarity = polarity_codes[row]
+            yield (
+                stations[station_codes[row]],
+                phases[phase_codes[row]],
+                times[row],
+                probabilities[row],
+                None if polarity == NO_POLARITY else polarities[polarity],
+                extras.get(row),
+            )
+
+    def to_detections(self) -> List[PhaseDetection]:
+        return [
+            PhaseDetection(station, phase, moment, probability, polarity, extra)
+            for station, phase, moment, probability, polarity, extra in self._rows()
+        ]
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Rows as ``PhaseDetection``-shaped dicts, e.g. for bus messages."""
+
+        return [
+            {
+                "station_code": station,
+                "phase_type": phase,
+                "pick_time": moment,
+                "probability": probability,
+                "polarity": polarity,
+                "extra": extra,
+            }
+            for station, phase, moment, probability, polarity, extra in self._rows()
+        ]
+
+
+__all__ = ["NO_POLARITY", "PICK_DTYPE", "PickBatch"]
@@ -0,0 +1,207 @@
+"""Per-channel data availability built from ingested windows."""
+from __future__ import annotations
+
+import fnmatch
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from obspy import UTCDateTime
+from sqlmodel import Session, select
+
+from ...models.base import Station, WaveformFile
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], Session]
+StreamId = Tuple[str, str, str, str]
+Span = Tuple[float, float]
+
+
+def _epoch(moment: datetime | float) -> float:
+    if isinstance(moment, (int, float)):
+        return float(moment)
+    return UTCDateTime(moment).timestamp
+
+
+class IntervalRuns:
+    """Sorted, disjoint ``[start, end]`` runs with a running length total.
+
+    Runs closer than ``slack`` seconds are merged on insert. ``starts`` and
+    ``ends`` are both sorted, so span lookups are two bisections, and the
+    prefix sums make covered-time queries O(log n). Inserting at the tail,
+    the usual case for realtime data, is O(log n) too; earlier inserts
+    rewrite the prefix sums after the insertion point.
+    """
+
+    def __init__(self) -> None:
+        self.starts: List[float] = []
+        self.ends: List[float] = []
+        self._cumulative: List[float] = [0.0]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def insert(self, start: float, end: float, slack: float = 0.0) -> List[Span]:
+        """Merge ``[start, end]`` in; returns the parts that overlapped existing runs."""
+
+        first = bisect_left(self.ends, start - slack)
+        last = bisect_right(self.starts, end + slack)
+        overlaps = [
+            (max(start, self.starts[index]), min(end, self.ends[index]))
+            for index in range(first, last)
+            if min(end, self.ends[index]) - max(start, self.starts[index]) > slack
+        ]
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+        del self._cumulative[first + 1 :]
+        total = self._cumulative[first]
+        for index in range(first, len(self.starts)):
+            total += self.ends[index] - self.starts[index]
+            self._cumulative.append(total)
+        return overlaps
+
+    def spans(self, start: float, end: float) -> List[Span]:
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+        return [
+            (max(start, self.starts[index]), min(end, self.ends[index]))
+            for index in range(first, last)
+        ]
+
+    def covered(self, start: float, end: float) -> float:
+        first = bisect_left(self.ends, start)
+        last = bisect_right(self.starts, end)
+        if first >= last:
+            return 0.0
+        total = self._cumulative[last] - self._cumulative[first]
+        total -= max(0.0, start - self.starts[first])
+        total -= max(0.0, self.ends[last - 1] - end)
+        return total
+
+    def gaps(self, start: float, end: float, min_gap: float = 0.0) -> List[Span]:
+        result: List[Span] = []
+        cursor = start
+        for span_start, span_end in self.spans(start, end):
+            if span_start - cursor > min_gap:
+                result.append((cursor, span_start))
+            cursor = max(cursor, span_end)
+        if end - cursor > min_gap:
+            result.append((cursor, end))
+        return result
+
+    def extent(self) -> Optional[Span]:
+        if not self.starts:
+            return None
+        return self.starts[0], self.ends[-1]
+
+
+@dataclass
+class ChannelAvailability:
+    runs: IntervalRuns
+    overlaps: IntervalRuns
+    sampling_rate: float | None = None
+
+
+class AvailabilityIndex:
+    """Merged data availability per ``(network, station, location, channel)``.
+
+    Windows are folded in as they are ingested; two windows are contiguous
+    when the second starts within one and a half sample periods of the end
+    of the first. Overlapping data is tracked separately so it can be
+    reported alongside the gaps.
+    """
+
+    def __init__(self, *, default_slack_seconds: float = 0.5) -> None:
+        self.default_slack_seconds = default_slack_seconds
+        self._channels: Dict[StreamId, ChannelAvailability] = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        network: str | None,
+        station: str,
+        location: str | None,
+        channel: str | None,
+        start: datetime | float,
+        end: datetime | float,
+        sampling_rate: float | None = None,
+    ) -> None:
+        stream_id = (network or "", station, location or "", channel or "")
+        slack = 1.5 / sampling_rate if sampling_rate else self.default_slack_seconds
+        with self._lock:
+            entry = self._channels.get(stream_id)
+            if entry is None:
+                entry = self._channels[stream_id] = ChannelAvailability(
+                    IntervalRuns(), IntervalRuns(), sampling_rate
+                )
+            elif sampling_rate:
+                entry.sampling_rate = sampling_rate
+            for overlap_start, overlap_end in entry.runs.insert(_epoch(start), _epoch(end), slack):
+                entry.overlaps.insert(overlap_start, overlap_end)
+
+    def warm(self, session_factory: SessionFactory, batch_size: int = 10_000) -> int:
+        """Rebuild the index from ``WaveformFile`` rows; returns rows read."""
+
+        statement = (
+            select(
+                Station.network,
+                Station.code,
+                WaveformFile.location,
+                WaveformFile.channel,
+                WaveformFile.start_time,
+                WaveformFile.end_time,
+                WaveformFile.sampling_rate,
+            )
+            .join(Station, Station.id == WaveformFile.station_id)
+            .order_by(WaveformFile.start_time)
+            .execution_options(yield_per=batch_size)
+        )
+        count = 0
+        with session_factory() as session:
+            for row in session.exec(statement):
+                self.add(*row)
+                count += 1
+        logger.info("Availability index warmed from %s waveform rows", count)
+        return count
+
+    def select(
+        self,
+        network: str | None = None,
+        station: str | None = None,
+        location: str | None = None,
+        channel: str | None = None,
+    ) -> List[Tuple[StreamId, ChannelAvailability]]:
+        """Channels matching FDSN-style comma lists with ``*``/``?`` wildcards."""
+
+        patterns = [_patterns(value) for value in (network, station, location, channel)]
+        with self._lock:
+            items = list(self._channels.items())
+        return sorted(
+            (stream_id, entry)
+            for stream_id, entry in items
+            if all(_matches(part, allowed) for part, allowed in zip(stream_id, patterns))
+        )
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+
+def _patterns(value: str | None) -> Sequence[str] | None:
+    if value is None or value in ("", "*"):
+        return None
+    # FDSN writes an empty location code as "--".
+    return [item.strip().replace("--", "") for item in value.split(",")]
+
+
+def _matches(value: str, patterns: Iterable[str] | None) -> bool:
+    return patterns is None or any(fnmatch.fnmatchcase(value, pattern) for pattern in patterns)
+
+
+__all__ = ["AvailabilityIndex", "ChannelAvailability", "IntervalRuns"]
@@ -0,0 +1,132 @@
+"""File-system backed stand-in for an S3-compatible object store.
+
+It implements the subset of the S3 REST API used by :class:`S3UploadEngine`
+(path-style PUT/GET/HEAD objects and multipart uploads) so uploads can be
+exercised offline. Signatures are not verified. Run it standalone with::
+
+    python -m app.services.storage.fake_s3 --root ./fake_s3 --port 9000
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import shutil
+import uuid
+from pathlib import Path
+from xml.etree import ElementTree
+
+from fastapi import FastAPI, Request, Response
+
+_XMLNS = "http://s3.amazonaws.com/doc/2006-03-01/"
+
+
+def _xml(tag: str, **fields: str) -> Response:
+    body = "".join(f"<{name}>{value}</{name}>" for name, value in fields.items())
+    return Response(
+        content=f'<?xml version="1.0" encoding="UTF-8"?><{tag} xmlns="{_XMLNS}">{body}</{tag}>',
+        media_type="application/xml",
+    )
+
+
+def _error(status_code: int, code: str) -> Response:
+    response = _xml("Error", Code=code)
+    response.status_code = status_code
+    return response
+
+
+def create_fake_s3_app(root: str | Path) -> FastAPI:
+    root = Path(root)
+    objects = root / "objects"
+    uploads = root / "uploads"
+    objects.mkdir(parents=True, exist_ok=True)
+    uploads.mkdir(parents=True, exist_ok=True)
+    app = FastAPI(title="Fake S3")
+
+    def object_path(bucket: str, key: str) -> Path:
+        path = (objects / bucket / key).resolve()
+        if objects.resolve() not in path.parents:
+            raise ValueError("Object key escapes the bucket")
+        return path
+
+    @app.put("/{bucket}/{key:path}")
+    async def put_object(bucket: str, key: str, request: Request) -> Response:
+        body = await request.body()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        upload_id = request.query_params.get("uploadId")
+        if upload_id is not None:
+            part_dir = uploads / upload_id
+            if not part_dir.is_dir():
+                return _error(404, "NoSuchUpload")
+            number = int(request.query_params["partNumber"])
+            (part_dir / f"{number:05d}").write_bytes(body)
+            return Response(status_code=200, headers={"ETag": etag})
+        destination = object_path(bucket, key)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.write_bytes(body)
+        return Response(status_code=200, headers={"ETag": etag})
+
+    @app.post("/{bucket}/{key:path}")
+    async def multipart(bucket: str, key: str, request: Request) -> Response:
+        if "uploads" in request.query_params:
+            upload_id = uuid.uuid4().hex
+            (uploads / upload_id).mkdir()
+            return _xml("InitiateMultipartUploadResult", Bucket=bucket, Key=key, UploadId=upload_id)
+        upload_id = request.query_params.get("uploadId")
+        part_dir = uploads / (upload_id or "")
+        if not upload_id or not part_dir.is_dir():
+            return _error(404, "NoSuchUpload")
+        manifest = ElementTree.fromstring(await request.body())
+        numbers = [
+            int(element.text or 0)
+            for element in manifest.iter()
+            if element.tag.endswith("PartNumber")
+        ]
+        destination = object_path(bucket, key)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        with destination.open("wb") as handle:
+            for number in numbers:
+                with (part_dir / f"{number:05d}").open("rb") as part:
+                    shutil.copyfileobj(part, handle)
+        shutil.rmtree(part_dir)
+        etag = f'"{uuid.uuid4().hex}-{len(numbers)}"'
+        return _xml("CompleteMultipartUploadResult", Bucket=bucket, Key=key, ETag=etag)
+
+    @app.delete("/{bucket}/{key:path}")
+    async def abort(bucket: str, key: str, request: Request) -> Response:
+        upload_id = request.query_params.get("uploadId")
+        if upload_id:
+            shutil.rmtree(uploads / upload_id, ignore_errors=True)
+        else:
+            object_path(bucket, key).unlink(missing_ok=True)
+        return Response(status_code=204)
+
+    @app.api_route("/{bucket}/{key:path}", methods=["GET", "HEAD"])
+    async def get_object(bucket: str, key: str, request: Request) -> Response:
+        path = object_path(bucket, key)
+        if not path.is_file():
+            return _error(404, "NoSuchKey")
+        body = path.read_bytes()
+        headers = {"Content-Length": str(len(body))}
+        if request.method == "HEAD":
+            return Response(status_code=200, headers=headers)
+        return Response(content=body, media_type="application/octet-stream")
+
+    return app
+
+
+def main() -> None:  # pragma: no cover - manual entry point
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the file-system backed fake S3 server")
+    parser.add_argument("--root", default="./fake_s3")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    uvicorn.run(create_fake_s3_app(args.root), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
+
+
+__all__ = ["create_fake_s3_app"]
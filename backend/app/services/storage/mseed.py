@@ -1,38 +1,340 @@
 from __future__ import annotations
 
 import hashlib
-from datetime import datetime
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
 from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Tuple
 
+import numpy as np
 from obspy import Stream
+from obspy.io.mseed import InternalMSEEDError
+from obspy.io.mseed.core import _write_mseed
 
 from ...core.config import get_settings
 
+logger = logging.getLogger(__name__)
+
 settings = get_settings()
 
+ChannelId = Tuple[str, str, str, str]
+SealCallback = Callable[[Path], None]
+
+INTEGER_ENCODINGS = ("STEIM2", "STEIM1", "INT32")
+_INT32_MIN, _INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+@dataclass
+class MSeedEncodingPolicy:
+    """Chooses the MiniSEED data encoding and record length for each window.
+
+    ``encoding="auto"`` writes integer-valued windows (integer dtypes, or
+    floats that hold whole counts within the int32 range) as
+    ``integer_encoding`` and everything else as FLOAT32. Naming an encoding
+    explicitly forces it; integer encodings then round the samples.
+    """
+
+    encoding: str = "auto"
+    integer_encoding: str = "STEIM2"
+    record_length: int = 512
+
+    def __post_init__(self) -> None:
+        self.encoding = self.encoding.upper() if self.encoding.lower() != "auto" else "auto"
+        self.integer_encoding = self.integer_encoding.upper()
+        if self.encoding not in ("auto", "FLOAT32", *INTEGER_ENCODINGS):
+            raise ValueError(f"Unsupported MiniSEED encoding: {self.encoding}")
+        if self.integer_encoding not in INTEGER_ENCODINGS:
+            raise ValueError(f"Unsupported integer encoding: {self.integer_encoding}")
+        length = self.record_length
+        if length < 256 or length & (length - 1):
+            raise ValueError("MiniSEED record length must be a power of two >= 256")
+
+    def prepare(self, samples) -> np.ndarray:
+        """Return samples as int32 or float32 according to the policy."""
+
+        data = np.asarray(samples)
+        if self.encoding == "FLOAT32":
+            return data.astype("float32", copy=False)
+        if self.encoding in INTEGER_ENCODINGS:
+            if data.dtype.kind == "f":
+                data = np.rint(data)
+            return data.astype("int32", copy=False)
+        if _is_int32_valued(data):
+            return data.astype("int32", copy=False)
+        return data.astype("float32", copy=False)
+
+    def encoding_for(self, data: np.ndarray) -> str:
+        if data.dtype == np.int32:
+            return self.integer_encoding if self.encoding == "auto" else self.encoding
+        return "FLOAT32"
+
+
+def _is_int32_valued(data: np.ndarray) -> bool:
+    if data.size == 0:
+        return False
+    if data.dtype.kind in "iu":
+        return bool(data.min() >= _INT32_MIN and data.max() <= _INT32_MAX)
+    if data.dtype.kind != "f" or not np.isfinite(data).all():
+        return False
+    if data.min() < _INT32_MIN or data.max() > _INT32_MAX:
+        return False
+    return bool(np.array_equal(data, np.trunc(data)))
+
+
+class _HashingBuffer(io.BytesIO):
+    """In-memory sink that hashes MiniSEED records as the encoder emits them.
+
+    ``hash_seconds`` accumulates the time spent hashing, which is otherwise
+    indistinguishable from encoding.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.digest = hashlib.sha256()
+        self.hash_seconds = 0.0
+
+    def write(self, data) -> int:  # type: ignore[override]
+        started = time.perf_counter()
+        self.digest.update(data)
+        self.hash_seconds += time.perf_counter() - started
+        return super().write(data)
+
+
+@dataclass
+class EncodedRecords:
+    """MiniSEED records for one window together with their SHA-256 checksum."""
+
+    data: memoryview
+    checksum: str
+    checksum_seconds: float = 0.0
+
+
+@dataclass
+class ArchiveSegment:
+    """Location of one appended window inside an SDS day file."""
+
+    path: Path
+    offset: int
+    length: int
+
+
+@dataclass
+class _OpenDayFile:
+    path: Path
+    channel: ChannelId
+    day: date
+    handle: BinaryIO
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
 
 class MSeedStorage:
-    """Persists waveform data to MiniSEED files on disk."""
+    """Persists waveform data into a SeisComP SDS MiniSEED archive.
+
+    Windows are appended to rolling day files laid out as
+    ``YEAR/NET/STA/CHA.D/NET.STA.LOC.CHA.D.YEAR.DOY``. Open handles are kept
+    in an LRU of at most ``max_open_files`` entries and buffered writes are
+    flushed every ``flush_interval`` seconds by a background thread once
+    :meth:`start` has been called. Day files that are closed after their
+    channel has moved on to a newer day are handed to ``on_seal``, which is
+    how completed days reach the object store. :meth:`close` also seals each
+    channel's current day, so every archived window is uploaded before
+    shutdown; appending to that day after a restart seals it again.
+    """
 
-    def __init__(self, root: Path | None = None):
+    def __init__(
+        self,
+        root: Path | None = None,
+        *,
+        max_open_files: int = 256,
+        flush_interval: float = 5.0,
+        on_seal: SealCallback | None = None,
+        encoding: MSeedEncodingPolicy | None = None,
+    ):
         self.root = Path(root or settings.data_root)
+        self.encoding = encoding or MSeedEncodingPolicy()
         self.root.mkdir(parents=True, exist_ok=True)
+        self.max_open_files = max(1, max_open_files)
+        self.flush_interval = flush_interval
+        self.on_seal = on_seal
+        self._handles: "OrderedDict[Path, _OpenDayFile]" = OrderedDict()
+        self._latest_day: Dict[ChannelId, date] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flusher: threading.Thread | None = None
+
+    @staticmethod
+    def channel_id(stream: Stream) -> ChannelId:
+        stats = stream[0].stats
+        return (stats.network, stats.station, stats.location, stats.channel)
+
+    def sds_path(self, channel: ChannelId, day: date) -> Path:
+        network, station, location, channel_code = channel
+        year = day.year
+        doy = day.timetuple().tm_yday
+        directory = self.root / f"{year}" / network / station / f"{channel_code}.D"
+        return directory / f"{network}.{station}.{location}.{channel_code}.D.{year}.{doy:03d}"
+
+    def prepare_samples(self, samples) -> np.ndarray:
+        return self.encoding.prepare(samples)
+
+    def encode_stream(self, stream: Stream) -> EncodedRecords:
+        """Encode ``stream`` once, hashing each record while it is written.
+
+        Steim2 cannot represent sample differences wider than 30 bits; such
+        windows fall back to Steim1, which wraps 32-bit differences losslessly.
+        """
+
+        encoding = self.encoding.encoding_for(stream[0].data)
+        try:
+            return self._encode(stream, encoding)
+        except InternalMSEEDError:
+            if encoding != "STEIM2":
+                raise
+            logger.debug("Steim2 overflow for %s, using Steim1", stream[0].id)
+            return self._encode(stream, "STEIM1")
+
+    def _encode(self, stream: Stream, encoding: str) -> EncodedRecords:
+        buffer = _HashingBuffer()
+        # Call the MiniSEED writer directly: Stream.write resolves the format
+        # plugin through package metadata on every call, which costs file reads.
+        _write_mseed(stream, buffer, encoding=encoding, reclen=self.encoding.record_length)
+        return EncodedRecords(
+            data=buffer.getbuffer(),
+            checksum=buffer.digest.hexdigest(),
+            checksum_seconds=buffer.hash_seconds,
+        )
+
+    def append_stream(
+        self, stream: Stream, data: bytes | memoryview | None = None
+    ) -> ArchiveSegment:
+        """Append ``stream``'s MiniSEED records to the matching day file.
+
+        ``data`` may carry records already produced by :meth:`encode_stream`.
+        The stream must hold a single channel; the window is filed under the
+        day of its first sample.
+        """
 
-    def _build_path(self, station_code: str, start_time: datetime) -> Path:
-        date_path = start_time.strftime("%Y/%m/%d")
-        directory = self.root / station_code / date_path
-        directory.mkdir(parents=True, exist_ok=True)
-        filename = f"{station_code}_{start_time.strftime('%H%M%S')}.mseed"
-        return directory / filename
+        if data is None:
+            data = self.encode_stream(stream).data
+        channel = self.channel_id(stream)
+        day = stream[0].stats.starttime.datetime.date()
+        path = self.sds_path(channel, day)
+        while True:
+            entry = self._acquire(channel, path, day)
+            with entry.lock:
+                # The handle may have been evicted or sealed by another thread
+                # between acquiring and locking it; reopen in that case.
+                if entry.handle.closed:
+                    continue
+                offset = entry.handle.tell()
+                entry.handle.write(data)
+            return ArchiveSegment(path=path, offset=offset, length=len(data))
 
-    def save_stream(self, station_code: str, start_time: datetime, stream: Stream) -> Path:
-        path = self._build_path(station_code, start_time)
-        stream.write(path, format="MSEED")
-        return path
+    def _acquire(self, channel: ChannelId, path: Path, day: date) -> _OpenDayFile:
+        closed: List[_OpenDayFile] = []
+        completed: Path | None = None
+        with self._lock:
+            entry = self._handles.get(path)
+            if entry is not None:
+                self._handles.move_to_end(path)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                entry = _OpenDayFile(path=path, channel=channel, day=day, handle=path.open("ab"))
+                self._handles[path] = entry
+                while len(self._handles) > self.max_open_files:
+                    closed.append(self._handles.popitem(last=False)[1])
+
+            previous = self._latest_day.get(channel)
+            if previous is None or day > previous:
+                self._latest_day[channel] = day
+                if previous is not None:
+                    completed = self.sds_path(channel, previous)
+                    stale = self._handles.pop(completed, None)
+                    if stale is not None:
+                        closed.append(stale)
+                        completed = None
+        self._close_and_seal(closed)
+        if completed is not None:
+            self._seal(completed)
+        return entry
+
+    def _close_and_seal(self, entries: List[_OpenDayFile]) -> None:
+        """Close handles and seal the ones whose day is already complete."""
+
+        for entry in entries:
+            with entry.lock:
+                entry.handle.close()
+            latest = self._latest_day.get(entry.channel)
+            if latest is not None and entry.day < latest:
+                self._seal(entry.path)
+
+    def _seal(self, path: Path) -> None:
+        if self.on_seal is None or not path.exists():
+            return
+        try:
+            self.on_seal(path)
+        except Exception:  # pragma: no cover - protective
+            logger.exception("Failed to seal day file %s", path)
+
+    def flush(self, path: Path | None = None) -> None:
+        """Flush buffered records for ``path`` or for every open day file."""
+
+        with self._lock:
+            entries = list(self._handles.values())
+        for entry in entries:
+            if path is not None and entry.path != path:
+                continue
+            with entry.lock:
+                if not entry.handle.closed:
+                    entry.handle.flush()
+
+    def start(self) -> None:
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        self._stop_event.clear()
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="mseed-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:  # pragma: no cover - protective
+                logger.exception("Periodic archive flush failed")
+
+    def close(self) -> None:
+        self._stop_event.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        with self._lock:
+            entries = list(self._handles.values())
+            self._handles.clear()
+            current = [self.sds_path(channel, day) for channel, day in self._latest_day.items()]
+        self._close_and_seal(entries)
+        # Completed days were sealed above; seal the days still being written,
+        # whether their handle was open or already evicted.
+        for path in dict.fromkeys(current):
+            self._seal(path)
 
     def build_object_key(self, path: Path) -> str:
         return path.relative_to(self.root).as_posix()
 
+    def read_segment(self, path: Path, offset: int, length: int) -> bytes:
+        """Read one window's records, flushing pending writes to ``path`` first."""
+
+        self.flush(path)
+        with path.open("rb") as handle:
+            handle.seek(offset)
+            return handle.read(length)
+
     @staticmethod
     def compute_checksum(path: Path) -> str:
         digest = hashlib.sha256()
@@ -42,4 +344,4 @@ class MSeedStorage:
         return digest.hexdigest()
 
 
-__all__ = ["MSeedStorage"]
+__all__ = ["ArchiveSegment", "EncodedRecords", "MSeedEncodingPolicy", "MSeedStorage"]
@@ -1,11 +1,66 @@
 from __future__ import annotations
 
+import logging
+import os
 import shutil
+import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .s3 import S3UploadEngine
+
+logger = logging.getLogger(__name__)
+
+# ioctl request number for FICLONE (copy-on-write clone) on Linux.
+_FICLONE = 0x40049409
+
+
+def _reflink(source: Path, destination: Path) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+
+    try:
+        with source.open("rb") as src, destination.open("wb") as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+    except OSError:
+        destination.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def stage_file(source: Path, destination: Path) -> str:
+    """Place ``source`` at ``destination`` without copying bytes when possible.
+
+    Tries a hard link first, then a copy-on-write reflink, and only falls
+    back to a byte copy when the two paths live on different file systems.
+    Returns the method used.
+    """
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    staging = destination.with_name(f".{destination.name}.staging")
+    staging.unlink(missing_ok=True)
+    try:
+        os.link(source, staging)
+        method = "hardlink"
+    except OSError:
+        if _reflink(source, staging):
+            method = "reflink"
+        else:
+            shutil.copy2(source, staging)
+            method = "copy"
+    os.replace(staging, destination)
+    return method
 
 
 class ObjectStorageClient:
-    """Lightweight object storage client used to push artifacts to S3/OSS/OBS."""
+    """Lightweight object storage client used to push artifacts to S3/OSS/OBS.
+
+    Files are always staged into the local cache directory. When an
+    ``uploader`` is configured they are also queued for upload to the remote
+    bucket; :meth:`put_file` returns without waiting for the transfer.
+    """
 
     def __init__(
         self,
@@ -14,8 +69,10 @@ class ObjectStorageClient:
         base_path: str | Path | None = None,
         endpoint: str | None = None,
         scheme: str = "s3",
+        uploader: "S3UploadEngine | None" = None,
     ) -> None:
         self.bucket = bucket
+        self.uploader = uploader
         self.endpoint = endpoint
         self.scheme = scheme
         self.base_path = Path(base_path or "./object_store_cache")
@@ -23,8 +80,14 @@ class ObjectStorageClient:
 
     def put_file(self, local_path: Path, object_key: str) -> str:
         destination = self.base_path / object_key
-        destination.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(local_path, destination)
+        if not (destination.exists() and destination.samefile(local_path)):
+            method = stage_file(local_path, destination)
+            logger.debug("Staged %s into object store cache via %s", object_key, method)
+        if self.uploader is not None:
+            self.uploader.enqueue(destination, object_key)
+        return self.build_uri(object_key)
+
+    def build_uri(self, object_key: str) -> str:
         if self.endpoint:
             return f"{self.scheme}://{self.bucket}/{object_key}?endpoint={self.endpoint}"
         return f"{self.scheme}://{self.bucket}/{object_key}"
@@ -33,4 +96,4 @@ class ObjectStorageClient:
         return self.base_path / object_key
 
 
-__all__ = ["ObjectStorageClient"]
+__all__ = ["ObjectStorageClient", "stage_file"]
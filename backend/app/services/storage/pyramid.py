@@ -0,0 +1,267 @@
+"""Precomputed min/max envelopes for plotting long spans quickly."""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+StreamId = Tuple[str, str, str, str]
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _as_utc(moment: datetime) -> datetime:
+    """Naive UTC; naive inputs are assumed to be UTC already."""
+
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _epoch_seconds(moment: datetime) -> float:
+    return (moment - _EPOCH).total_seconds()
+
+
+@dataclass
+class EnvelopeSeries:
+    """Min/max envelope of one channel sampled on a regular grid."""
+
+    network: str
+    station: str
+    location: str
+    channel: str
+    resolution_seconds: int
+    minimum: np.ndarray
+    maximum: np.ndarray
+
+
+class EnvelopePyramid:
+    """Min/max envelopes per channel-day at several resolutions.
+
+    Each channel-day lives in one ``.npy`` file holding a ``(bins, 2)``
+    float32 array: the 1 s bins of the day, followed by the 10 s bins and so
+    on, with NaN marking bins without data. Files are memory mapped and
+    updated in place as windows are ingested, so a day costs about 750 KiB
+    per channel regardless of the sampling rate.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        resolutions: Sequence[int] = (1, 10, 60),
+        max_open_files: int = 64,
+    ) -> None:
+        if not resolutions or any(SECONDS_PER_DAY % res for res in resolutions):
+            raise ValueError("Resolutions must be whole seconds that divide a day")
+        self.root = Path(root)
+        self.resolutions = tuple(sorted(resolutions))
+        self.max_open_files = max(1, max_open_files)
+        self._offsets: List[int] = []
+        total = 0
+        for resolution in self.resolutions:
+            self._offsets.append(total)
+            total += SECONDS_PER_DAY // resolution
+        self._bins = total
+        self._maps: "OrderedDict[Path, np.memmap]" = OrderedDict()
+        self._locks: Dict[Path, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, stream_id: StreamId, day: date) -> Path:
+        network, station, location, channel = stream_id
+        year, doy = day.year, day.timetuple().tm_yday
+        return (
+            self.root
+            / f"{year}"
+            / network
+            / station
+            / f"{network}.{station}.{location}.{channel}.{year}.{doy:03d}.npy"
+        )
+
+    def update(
+        self,
+        network: str | None,
+        station: str,
+        location: str | None,
+        channel: str | None,
+        start_time: datetime,
+        sampling_rate: float,
+        samples: np.ndarray,
+    ) -> None:
+        """Fold a window into the envelopes of every day it touches."""
+
+        data = np.asarray(samples)
+        if data.size == 0:
+            return
+        stream_id = (network or "", station, location or "", channel or "")
+        start_time = _as_utc(start_time)
+        day_start = datetime.combine(start_time.date(), datetime.min.time())
+        offset = (start_time - day_start).total_seconds()
+        index = 0
+        while index < data.size:
+            # Samples of this day: those with offset + i / rate < one day.
+            remaining = math.ceil((SECONDS_PER_DAY - offset) * sampling_rate - 1e-9)
+            chunk = data[index : index + max(remaining, 1)]
+            self._fold(self.path_for(stream_id, day_start.date()), offset, sampling_rate, chunk)
+            index += chunk.size
+            day_start += timedelta(days=1)
+            offset = offset + chunk.size / sampling_rate - SECONDS_PER_DAY
+
+    def _fold(self, path: Path, offset: float, sampling_rate: float, data: np.ndarray) -> None:
+        seconds = offset + np.arange(data.size) / sampling_rate
+        values = data.astype("float32", copy=False)
+        envelope, lock = self._open(path)
+        with lock:
+            for resolution, base in zip(self.resolutions, self._offsets):
+                bins = (seconds // resolution).astype(np.int64)
+                starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+                rows = base + bins[starts]
+                envelope[rows, 0] = np.fmin(envelope[rows, 0], np.minimum.reduceat(values, starts))
+                envelope[rows, 1] = np.fmax(envelope[rows, 1], np.maximum.reduceat(values, starts))
+
+    def _open(self, path: Path) -> Tuple[np.memmap, threading.Lock]:
+        evicted: List[np.memmap] = []
+        with self._lock:
+            envelope = self._maps.get(path)
+            if envelope is not None:
+                self._maps.move_to_end(path)
+            else:
+                if path.exists():
+                    envelope = np.load(path, mmap_mode="r+")
+                else:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    envelope = np.lib.format.open_memmap(
+                        path, mode="w+", dtype="float32", shape=(self._bins, 2)
+                    )
+                    envelope[:] = np.nan
+                self._maps[path] = envelope
+                while len(self._maps) > self.max_open_files:
+                    stale_path, stale = self._maps.popitem(last=False)
+                    self._locks.pop(stale_path, None)
+                    evicted.append(stale)
+            lock = self._locks.setdefault(path, threading.Lock())
+        for stale in evicted:
+            stale.flush()
+        return envelope, lock
+
+    def choose_resolution(self, span_seconds: float, points: int) -> int:
+        """Coarsest stored resolution that still yields at least ``points`` bins."""
+
+        target = span_seconds / max(points, 1)
+        usable = [res for res in self.resolutions if res <= target]
+        return usable[-1] if usable else self.resolutions[0]
+
+    def preview(
+        self,
+        network: str,
+        station: str,
+        start: datetime,
+        end: datetime,
+        points: int,
+        *,
+        channel: str | None = None,
+        location: str | None = None,
+    ) -> List[EnvelopeSeries]:
+        """Return ``points`` min/max pairs per channel covering ``[start, end)``.
+
+        Spans finer than the 1 s level return one point per second instead.
+        """
+
+        start, end = _as_utc(start), _as_utc(end)
+        if end <= start:
+            raise ValueError("end must be after start")
+        span = (end - start).total_seconds()
+        resolution = self.choose_resolution(span, points)
+        points = min(points, max(1, math.ceil(span / resolution)))
+        level = self.resolutions.index(resolution)
+
+        series = []
+        for stream_id in self._streams(network, station, start, end, channel, location):
+            times, minimum, maximum = self._level_slice(stream_id, level, start, end)
+            buckets = ((times - _epoch_seconds(start)) * points // span).astype(np.int64)
+            np.clip(buckets, 0, points - 1, out=buckets)
+            out_min = np.full(points, np.nan, dtype="float32")
+            out_max = np.full(points, np.nan, dtype="float32")
+            if buckets.size:
+                starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+                out_min[buckets[starts]] = np.fmin.reduceat(minimum, starts)
+                out_max[buckets[starts]] = np.fmax.reduceat(maximum, starts)
+            series.append(
+                EnvelopeSeries(*stream_id, resolution, minimum=out_min, maximum=out_max)
+            )
+        return series
+
+    def _level_slice(
+        self, stream_id: StreamId, level: int, start: datetime, end: datetime
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        resolution, base = self.resolutions[level], self._offsets[level]
+        times: List[np.ndarray] = []
+        minima: List[np.ndarray] = []
+        maxima: List[np.ndarray] = []
+        day = start.date()
+        while day <= end.date():
+            path = self.path_for(stream_id, day)
+            if path.exists():
+                envelope = np.load(path, mmap_mode="r")
+                day_epoch = float((day - _EPOCH.date()).days * SECONDS_PER_DAY)
+                first = max(0, int((_epoch_seconds(start) - day_epoch) // resolution))
+                last = min(
+                    SECONDS_PER_DAY // resolution,
+                    math.ceil((_epoch_seconds(end) - day_epoch) / resolution),
+                )
+                if last > first:
+                    block = envelope[base + first : base + last]
+                    times.append(day_epoch + np.arange(first, last) * resolution)
+                    minima.append(block[:, 0])
+                    maxima.append(block[:, 1])
+            day += timedelta(days=1)
+        if not times:
+            empty = np.empty(0, dtype="float32")
+            return np.empty(0), empty, empty
+        return np.concatenate(times), np.concatenate(minima), np.concatenate(maxima)
+
+    def _streams(
+        self,
+        network: str,
+        station: str,
+        start: datetime,
+        end: datetime,
+        channel: str | None,
+        location: str | None,
+    ) -> List[StreamId]:
+        found = set()
+        day = start.date()
+        while day <= end.date():
+            folder = self.root / f"{day.year}" / network / station
+            pattern = f"{network}.{station}.*.*.{day.year}.{day.timetuple().tm_yday:03d}.npy"
+            for path in folder.glob(pattern):
+                _, _, loc, cha, *_ = path.name.split(".")
+                if (channel is None or cha == channel) and (location is None or loc == location):
+                    found.add((network, station, loc, cha))
+            day += timedelta(days=1)
+        return sorted(found)
+
+    def flush(self) -> None:
+        with self._lock:
+            maps = list(self._maps.values())
+        for envelope in maps:
+            envelope.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            maps = list(self._maps.values())
+            self._maps.clear()
+        for envelope in maps:
+            envelope.flush()
+
+
+__all__ = ["EnvelopePyramid", "EnvelopeSeries"]
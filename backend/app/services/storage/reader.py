@@ -0,0 +1,286 @@
+"""Time-range reads from the SDS archive."""
+from __future__ import annotations
+
+import io
+import logging
+import mmap
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+from obspy.io.mseed.core import _read_mseed, _write_mseed
+from sqlmodel import Session, select
+
+from ...models.base import WaveformFile
+from ..utils.station_registry import StationRegistry
+from .mseed import MSeedStorage
+from .object_store import ObjectStorageClient
+from .segment_cache import DecodedSegment, SegmentCache, SegmentKey
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], Session]
+
+
+class WaveformNotFoundError(LookupError):
+    """Raised when no stored data overlaps the requested span."""
+
+
+@dataclass
+class _ByteRange:
+    offset: int
+    length: int
+
+
+class WaveformReader:
+    """Reads stored windows back for a station and time span.
+
+    Overlapping windows are found through the ``(station_id, start_time,
+    end_time)`` index; the scan is bounded below by ``max_window`` so it
+    only touches rows near the requested span. Adjacent windows in the same
+    day file are coalesced into one byte range, each day file is memory
+    mapped, and only the mapped ranges are decoded, with record selection
+    by time left to libmseed.
+
+    With a :class:`SegmentCache` the reader decodes whole cache blocks
+    instead and serves the requested span as views into the cached arrays;
+    a span inside one contiguous block is returned without copying samples.
+    """
+
+    def __init__(
+        self,
+        storage: MSeedStorage,
+        session_factory: SessionFactory,
+        station_registry: StationRegistry,
+        *,
+        object_store: Optional[ObjectStorageClient] = None,
+        max_window: timedelta = timedelta(days=1),
+        cache: Optional[SegmentCache] = None,
+    ) -> None:
+        self.storage = storage
+        self.session_factory = session_factory
+        self.stations = station_registry
+        self.object_store = object_store
+        self.max_window = max_window
+        self.cache = cache
+
+    def find_files(
+        self,
+        station_id: int,
+        start: datetime,
+        end: datetime,
+        *,
+        channel: str | None = None,
+        location: str | None = None,
+    ) -> List[WaveformFile]:
+        statement = (
+            select(WaveformFile)
+            .where(
+                WaveformFile.station_id == station_id,
+                WaveformFile.start_time >= start - self.max_window,
+                WaveformFile.start_time <= end,
+                WaveformFile.end_time >= start,
+            )
+            .order_by(WaveformFile.start_time)
+        )
+        if channel is not None:
+            statement = statement.where(WaveformFile.channel == channel)
+        if location is not None:
+            statement = statement.where(WaveformFile.location == location)
+        with self.session_factory() as session:
+            return list(session.exec(statement).all())
+
+    def read(
+        self,
+        network: str,
+        station: str,
+        start: datetime,
+        end: datetime,
+        *,
+        channel: str | None = None,
+        location: str | None = None,
+    ) -> Stream:
+        """Return the merged and trimmed stream for ``[start, end]``.
+
+        Gaps are left as masked samples.
+        """
+
+        if end <= start:
+            raise ValueError("end must be after start")
+        station_id = self.stations.lookup(network, station)
+        if station_id is None:
+            raise WaveformNotFoundError(f"Unknown station {network}.{station}")
+        files = self.find_files(station_id, start, end, channel=channel, location=location)
+        if not files:
+            raise WaveformNotFoundError(f"No data for {network}.{station} in the requested span")
+
+        starttime, endtime = UTCDateTime(start), UTCDateTime(end)
+        if self.cache is None:
+            stream = self._decode(files, starttime, endtime)
+        else:
+            stream = self._read_cached(network, station, station_id, files, starttime, endtime)
+        if len({trace.data.dtype for trace in stream}) > 1:
+            for trace in stream:
+                trace.data = trace.data.astype("float64")
+        stream.merge(method=1)
+        stream.trim(starttime, endtime)
+        stream.traces = [trace for trace in stream if trace.stats.npts]
+        if not stream:
+            raise WaveformNotFoundError(f"No data for {network}.{station} in the requested span")
+        return stream
+
+    def _decode(
+        self, files: Sequence[WaveformFile], starttime: UTCDateTime, endtime: UTCDateTime
+    ) -> Stream:
+        stream = Stream()
+        for path, ranges in self._group_ranges(files).items():
+            stream += self._read_ranges(path, ranges, starttime, endtime)
+        return stream
+
+    def _read_cached(
+        self,
+        network: str,
+        station: str,
+        station_id: int,
+        files: Sequence[WaveformFile],
+        starttime: UTCDateTime,
+        endtime: UTCDateTime,
+    ) -> Stream:
+        assert self.cache is not None
+        stream = Stream()
+        channels = sorted({(row.location or "", row.channel or "") for row in files})
+        for location, channel in channels:
+            for block in self.cache.blocks(starttime, endtime):
+                key = SegmentKey(network, station, location, channel, block)
+                segments, version = self.cache.get(key)
+                if segments is None:
+                    segments = self._load_block(station_id, key)
+                    self.cache.put(key, segments, version)
+                for segment in segments:
+                    first, data = segment.slice(starttime, endtime)
+                    if not data.size:
+                        continue
+                    header = {
+                        "network": network,
+                        "station": station,
+                        "location": location,
+                        "channel": channel,
+                        "starttime": first,
+                        "sampling_rate": segment.sampling_rate,
+                    }
+                    stream.append(Trace(data=data, header=header))
+        return stream
+
+    def _load_block(self, station_id: int, key: SegmentKey) -> List[DecodedSegment]:
+        """Decode one cache block into contiguous, block-clipped segments."""
+
+        assert self.cache is not None
+        block_start, block_end = self.cache.block_span(key.block)
+        files = [
+            row
+            for row in self.find_files(station_id, block_start.datetime, block_end.datetime)
+            if (row.location or "", row.channel or "") == (key.location, key.channel)
+        ]
+        if not files:
+            return []
+        decoded = self._decode(files, block_start, block_end)
+        if len({trace.data.dtype for trace in decoded}) > 1:
+            for trace in decoded:
+                trace.data = trace.data.astype("float64")
+        decoded.merge(method=1)
+        segments: List[DecodedSegment] = []
+        for trace in decoded.split():
+            # Blocks are half-open so a sample on the boundary is cached once.
+            first, data = DecodedSegment(
+                trace.stats.starttime, trace.stats.sampling_rate, trace.data
+            ).slice(block_start, block_end - 1e-6)
+            if data.size:
+                segments.append(
+                    DecodedSegment(first, trace.stats.sampling_rate, np.ascontiguousarray(data))
+                )
+        return segments
+
+    def _group_ranges(self, files: Sequence[WaveformFile]) -> Dict[Path, List[_ByteRange]]:
+        grouped: Dict[Path, List[_ByteRange]] = {}
+        for waveform_file in files:
+            path = self._local_path(Path(waveform_file.file_path))
+            if waveform_file.byte_offset is None or waveform_file.byte_length is None:
+                # Rows written before day-file archiving own their whole file.
+                ranges = grouped.setdefault(path, [])
+                ranges.append(_ByteRange(0, path.stat().st_size))
+                continue
+            grouped.setdefault(path, []).append(
+                _ByteRange(waveform_file.byte_offset, waveform_file.byte_length)
+            )
+        for path, ranges in grouped.items():
+            ranges.sort(key=lambda item: item.offset)
+            merged: List[_ByteRange] = []
+            for item in ranges:
+                last = merged[-1] if merged else None
+                if last is not None and item.offset <= last.offset + last.length:
+                    last.length = max(last.length, item.offset + item.length - last.offset)
+                else:
+                    merged.append(_ByteRange(item.offset, item.length))
+            grouped[path] = merged
+        return grouped
+
+    def _local_path(self, path: Path) -> Path:
+        if path.exists() or self.object_store is None:
+            return path
+        # Fall back to the object store cache when the archive copy is gone.
+        try:
+            return self.object_store.resolve_local_path(self.storage.build_object_key(path))
+        except ValueError:
+            return path
+
+    def _read_ranges(
+        self,
+        path: Path,
+        ranges: Sequence[_ByteRange],
+        starttime: UTCDateTime,
+        endtime: UTCDateTime,
+    ) -> Stream:
+        # Records still sitting in the writer's buffer must reach the file
+        # before it is mapped.
+        self.storage.flush(path)
+        stream = Stream()
+        with path.open("rb") as handle, mmap.mmap(
+            handle.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for item in ranges:
+                    chunk = view[item.offset : item.offset + item.length]
+                    try:
+                        stream += _read_mseed(chunk, starttime=starttime, endtime=endtime)
+                    finally:
+                        chunk.release()
+            finally:
+                view.release()
+        return stream
+
+
+def stream_to_mseed(stream: Stream, record_length: int = 512) -> bytes:
+    buffer = io.BytesIO()
+    # Masked gaps cannot be encoded; write each contiguous piece separately.
+    _write_mseed(stream.split(), buffer, reclen=record_length)
+    return buffer.getvalue()
+
+
+def stream_to_npy(stream: Stream) -> bytes:
+    """Serialise a single-channel stream as ``.npy``; gaps become NaN."""
+
+    if len(stream) != 1:
+        raise ValueError("Binary output requires exactly one channel; pass channel=")
+    data = stream[0].data
+    if np.ma.isMaskedArray(data):
+        data = data.astype("float64").filled(np.nan)
+    buffer = io.BytesIO()
+    np.save(buffer, np.ascontiguousarray(data), allow_pickle=False)
+    return buffer.getvalue()
+
+
+__all__ = ["WaveformNotFoundError", "WaveformReader", "stream_to_mseed", "stream_to_npy"]
@@ -0,0 +1,308 @@
+"""Concurrent S3-compatible upload engine used by the object store client."""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Set
+from urllib.parse import quote
+from xml.etree import ElementTree
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class S3UploadError(RuntimeError):
+    """Raised when an object cannot be uploaded after all retries."""
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def sign_request(
+    request: httpx.Request,
+    *,
+    access_key: str,
+    secret_key: str,
+    region: str,
+    service: str = "s3",
+    now: datetime | None = None,
+) -> None:
+    """Add AWS Signature Version 4 headers to ``request`` in place.
+
+    Payloads are sent as ``UNSIGNED-PAYLOAD`` so large parts are not hashed a
+    second time just to sign them; transport integrity relies on TLS.
+    """
+
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    datestamp = now.strftime("%Y%m%d")
+    request.headers["x-amz-date"] = amz_date
+    request.headers["x-amz-content-sha256"] = UNSIGNED_PAYLOAD
+
+    url = request.url
+    query = sorted(
+        (quote(name, safe="-_.~"), quote(value, safe="-_.~"))
+        for name, value in url.params.multi_items()
+    )
+    canonical_query = "&".join(f"{name}={value}" for name, value in query)
+    signed = {
+        "host": url.netloc.decode("ascii"),
+        "x-amz-content-sha256": UNSIGNED_PAYLOAD,
+        "x-amz-date": amz_date,
+    }
+    canonical_headers = "".join(f"{name}:{value}\n" for name, value in signed.items())
+    signed_headers = ";".join(signed)
+    canonical_request = "\n".join(
+        [
+            request.method,
+            url.raw_path.split(b"?", 1)[0].decode("ascii"),
+            canonical_query,
+            canonical_headers,
+            signed_headers,
+            UNSIGNED_PAYLOAD,
+        ]
+    )
+    scope = f"{datestamp}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join(
+        [
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+        ]
+    )
+    key = _hmac(f"AWS4{secret_key}".encode("utf-8"), datestamp)
+    for part in (region, service, "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    request.headers["Authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+
+
+@dataclass
+class UploadMetrics:
+    objects_uploaded: int = 0
+    parts_uploaded: int = 0
+    bytes_uploaded: int = 0
+    retries: int = 0
+    failures: int = 0
+    busy_seconds: float = 0.0
+    in_flight: int = 0
+
+    @property
+    def throughput_bytes_per_second(self) -> float:
+        return self.bytes_uploaded / self.busy_seconds if self.busy_seconds else 0.0
+
+
+class S3UploadEngine:
+    """Uploads files to an S3-compatible endpoint over a pooled HTTP client.
+
+    Objects at or above ``multipart_threshold`` bytes are sent as multipart
+    uploads whose parts are transferred concurrently. ``max_concurrency``
+    bounds the number of HTTP requests in flight across all uploads, and
+    failed requests are retried with exponential backoff. :meth:`enqueue`
+    may be called from worker threads; the upload then runs on the loop that
+    called :meth:`start`.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        bucket: str,
+        *,
+        access_key: str | None = None,
+        secret_key: str | None = None,
+        region: str = "us-east-1",
+        max_concurrency: int = 8,
+        multipart_threshold: int = 16 * 1024 * 1024,
+        part_size: int = 8 * 1024 * 1024,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.2,
+        timeout: float = 60.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.max_concurrency = max(1, max_concurrency)
+        self.multipart_threshold = multipart_threshold
+        self.part_size = max(1, part_size)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.metrics = UploadMetrics()
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+        )
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def stop(self) -> None:
+        """Wait for queued uploads to finish and close the connection pool."""
+
+        # Let uploads scheduled via ``call_soon_threadsafe`` become tasks first.
+        await asyncio.sleep(0)
+        while self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+        await self._client.aclose()
+        self._loop = None
+
+    def enqueue(self, path: Path, object_key: str) -> None:
+        """Schedule an upload from any thread without waiting for it."""
+
+        if self._loop is None:
+            raise RuntimeError("S3UploadEngine has not been started")
+        self._loop.call_soon_threadsafe(self._spawn, Path(path), object_key)
+
+    def _spawn(self, path: Path, object_key: str) -> None:
+        task = asyncio.create_task(self._upload_logged(path, object_key))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _upload_logged(self, path: Path, object_key: str) -> None:
+        try:
+            await self.upload_file(path, object_key)
+        except Exception:
+            logger.exception("Upload of %s failed", object_key)
+
+    async def upload_file(self, path: Path, object_key: str) -> str:
+        """Upload ``path`` as ``object_key``; returns the object's ETag."""
+
+        if self._semaphore is None:
+            await self.start()
+        size = os.stat(path).st_size
+        started = time.perf_counter()
+        self.metrics.in_flight += 1
+        try:
+            if size >= self.multipart_threshold:
+                etag = await self._multipart_upload(path, object_key, size)
+            else:
+                body = await asyncio.to_thread(Path(path).read_bytes)
+                response = await self._send("PUT", object_key, content=body)
+                etag = response.headers.get("ETag", "")
+                self.metrics.bytes_uploaded += size
+        except Exception:
+            self.metrics.failures += 1
+            raise
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.busy_seconds += time.perf_counter() - started
+        self.metrics.objects_uploaded += 1
+        return etag
+
+    async def _multipart_upload(self, path: Path, object_key: str, size: int) -> str:
+        response = await self._send("POST", object_key, params={"uploads": ""})
+        upload_id = _find_text(response.content, "UploadId")
+        offsets = list(range(0, size, self.part_size))
+
+        async def _part(number: int, offset: int) -> str:
+            length = min(self.part_size, size - offset)
+            chunk = await asyncio.to_thread(_read_range, path, offset, length)
+            part = await self._send(
+                "PUT",
+                object_key,
+                params={"partNumber": str(number), "uploadId": upload_id},
+                content=chunk,
+            )
+            self.metrics.parts_uploaded += 1
+            self.metrics.bytes_uploaded += length
+            return part.headers["ETag"]
+
+        try:
+            etags = await asyncio.gather(
+                *[_part(number, offset) for number, offset in enumerate(offsets, start=1)]
+            )
+        except Exception:
+            await self._send("DELETE", object_key, params={"uploadId": upload_id}, retry=False)
+            raise
+        manifest = "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+            for number, etag in enumerate(etags, start=1)
+        )
+        completed = await self._send(
+            "POST",
+            object_key,
+            params={"uploadId": upload_id},
+            content=f"<CompleteMultipartUpload>{manifest}</CompleteMultipartUpload>".encode(),
+        )
+        return _find_text(completed.content, "ETag")
+
+    async def _send(
+        self,
+        method: str,
+        object_key: str,
+        *,
+        params: Dict[str, str] | None = None,
+        content: bytes | None = None,
+        retry: bool = True,
+    ) -> httpx.Response:
+        assert self._semaphore is not None
+        url = f"{self.endpoint}/{self.bucket}/{quote(object_key, safe='/-_.~')}"
+        attempts = self.max_retries + 1 if retry else 1
+        for attempt in range(attempts):
+            request = self._client.build_request(method, url, params=params, content=content)
+            if self.access_key and self.secret_key:
+                sign_request(
+                    request,
+                    access_key=self.access_key,
+                    secret_key=self.secret_key,
+                    region=self.region,
+                )
+            try:
+                async with self._semaphore:
+                    response = await self._client.send(request)
+                if response.status_code not in _RETRYABLE_STATUS:
+                    response.raise_for_status()
+                    return response
+                error: Exception = S3UploadError(
+                    f"{method} {object_key} returned {response.status_code}"
+                )
+            except httpx.TransportError as exc:
+                error = exc
+            except httpx.HTTPStatusError as exc:
+                raise S3UploadError(f"{method} {object_key} failed: {exc}") from exc
+            if attempt + 1 < attempts:
+                self.metrics.retries += 1
+                await asyncio.sleep(self.backoff_seconds * 2**attempt)
+        raise S3UploadError(f"{method} {object_key} failed after {attempts} attempts") from error
+
+
+def _read_range(path: Path, offset: int, length: int) -> bytes:
+    with open(path, "rb") as handle:
+        return os.pread(handle.fileno(), length, offset)
+
+
+def _find_text(document: bytes, tag: str) -> str:
+    root = ElementTree.fromstring(document)
+    for element in root.iter():
+        if element.tag == tag or element.tag.endswith("}" + tag):
+            return element.text or ""
+    raise S3UploadError(f"Response is missing <{tag}>")
+
+
+__all__ = ["S3UploadEngine", "S3UploadError", "UploadMetrics", "sign_request"]
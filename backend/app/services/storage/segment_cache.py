@@ -0,0 +1,172 @@
+"""Shared cache of decoded waveform samples."""
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from obspy import UTCDateTime
+
+StreamId = Tuple[str, str, str, str]
+
+
+class SegmentKey(NamedTuple):
+    network: str
+    station: str
+    location: str
+    channel: str
+    block: int
+
+    @property
+    def stream_id(self) -> StreamId:
+        return (self.network, self.station, self.location, self.channel)
+
+
+@dataclass(frozen=True)
+class DecodedSegment:
+    """A contiguous run of samples; ``data`` is read-only."""
+
+    starttime: UTCDateTime
+    sampling_rate: float
+    data: np.ndarray
+
+    def slice(self, start: UTCDateTime, end: UTCDateTime) -> Tuple[UTCDateTime, np.ndarray]:
+        """Return the samples within ``[start, end]`` as a view of ``data``."""
+
+        delta = 1.0 / self.sampling_rate
+        first = max(0, math.ceil((start - self.starttime) / delta - 1e-6))
+        last = min(len(self.data), math.floor((end - self.starttime) / delta + 1e-6) + 1)
+        if last <= first:
+            return self.starttime, self.data[:0]
+        return self.starttime + first * delta, self.data[first:last]
+
+
+@dataclass
+class SegmentCacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    bytes_used: int
+    max_bytes: int
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class SegmentCache:
+    """Byte-budgeted LRU of decoded samples per channel and time block.
+
+    Blocks are ``block_seconds`` long and aligned to the epoch, so every
+    reader asking about the same hour lands on the same keys. Ingest calls
+    :meth:`invalidate` for the blocks a new window touches; a block decoded
+    concurrently with such a write is discarded instead of cached, which is
+    what the ``version`` returned by :meth:`get` is for.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, *, block_seconds: int = 600) -> None:
+        if block_seconds <= 0:
+            raise ValueError("block_seconds must be positive")
+        self.max_bytes = max_bytes
+        self.block_seconds = block_seconds
+        self._entries: "OrderedDict[SegmentKey, List[DecodedSegment]]" = OrderedDict()
+        self._sizes: Dict[SegmentKey, int] = {}
+        self._versions: Dict[StreamId, int] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def block_of(self, moment: datetime | UTCDateTime) -> int:
+        return math.floor(UTCDateTime(moment).timestamp / self.block_seconds)
+
+    def block_span(self, block: int) -> Tuple[UTCDateTime, UTCDateTime]:
+        start = UTCDateTime(block * self.block_seconds)
+        return start, start + self.block_seconds
+
+    def blocks(self, start: datetime | UTCDateTime, end: datetime | UTCDateTime) -> Iterator[int]:
+        return iter(range(self.block_of(start), self.block_of(end) + 1))
+
+    def get(self, key: SegmentKey) -> Tuple[Optional[List[DecodedSegment]], int]:
+        """Return ``(segments, version)``; segments is ``None`` on a miss."""
+
+        with self._lock:
+            version = self._versions.get(key.stream_id, 0)
+            segments = self._entries.get(key)
+            if segments is None:
+                self._misses += 1
+                return None, version
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return segments, version
+
+    def put(self, key: SegmentKey, segments: List[DecodedSegment], version: int) -> None:
+        for segment in segments:
+            segment.data.flags.writeable = False
+        size = sum(segment.data.nbytes for segment in segments)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._versions.get(key.stream_id, 0) != version:
+                return
+            previous = self._sizes.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous
+            self._entries[key] = segments
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                self._bytes -= self._sizes.pop(evicted)
+                self._evictions += 1
+
+    def invalidate(
+        self,
+        network: str | None,
+        station: str,
+        location: str | None,
+        channel: str | None,
+        start: datetime,
+        end: datetime,
+    ) -> None:
+        stream_id = (network or "", station, location or "", channel or "")
+        with self._lock:
+            self._versions[stream_id] = self._versions.get(stream_id, 0) + 1
+            for block in self.blocks(start, end):
+                key = SegmentKey(*stream_id, block)
+                if key in self._entries:
+                    del self._entries[key]
+                    self._bytes -= self._sizes.pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def stats(self) -> SegmentCacheStats:
+        with self._lock:
+            return SegmentCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                bytes_used=self._bytes,
+                max_bytes=self.max_bytes,
+            )
+
+
+__all__ = [
+    "DecodedSegment",
+    "SegmentCache",
+    "SegmentCacheStats",
+    "SegmentKey",
+]
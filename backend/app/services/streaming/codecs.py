@@ -0,0 +1,433 @@
+"""Message codecs for the streaming bus.
+
+Kafka records carry the codec name in a ``content-type`` header so each
+topic can move to a more compact encoding without breaking consumers of
+older records; records without the header are treated as JSON.
+"""
+from __future__ import annotations
+
+import json
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Protocol, Sequence, Tuple
+
+import numpy as np
+
+CONTENT_TYPE_HEADER = "content-type"
+_EPOCH = datetime(1970, 1, 1)
+
+
+class CodecError(ValueError):
+    """Raised when a message cannot be encoded or decoded."""
+
+
+class Codec(Protocol):
+    name: str
+
+    def encode(self, value: Mapping[str, Any]) -> bytes: ...
+
+    def decode(self, data: bytes) -> Dict[str, Any]: ...
+
+
+def _utc_naive(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JsonCodec:
+    """Standard library JSON; datetimes become ISO strings."""
+
+    name = "json"
+
+    def encode(self, value: Mapping[str, Any]) -> bytes:
+        return json.dumps(value, default=_json_default).encode("utf-8")
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """JSON through orjson, which serialises datetimes and numpy natively."""
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson  # type: ignore
+
+        self._orjson = orjson
+        self._options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+    def encode(self, value: Mapping[str, Any]) -> bytes:
+        return self._orjson.dumps(value, option=self._options)
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        return self._orjson.loads(data)
+
+
+class MsgpackCodec:
+    """MessagePack with datetimes as native timestamps."""
+
+    name = "msgpack"
+
+    def __init__(self) -> None:
+        import msgpack  # type: ignore
+
+        self._msgpack = msgpack
+
+    def _default(self, value: Any) -> Any:
+        if isinstance(value, datetime):
+            moment = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+            return self._msgpack.Timestamp.from_datetime(moment)
+        return _json_default(value)
+
+    def encode(self, value: Mapping[str, Any]) -> bytes:
+        return self._msgpack.packb(value, default=self._default, datetime=False)
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        return self._msgpack.unpackb(data, timestamp=3)
+
+
+# -- schema-versioned compact binary -------------------------------------------------
+
+_HEADER = struct.Struct(">BHH")
+_STR_LEN = struct.Struct(">H")
+_MAP_LEN = struct.Struct(">I")
+_MAGIC = 0xC5
+_FIXED_FORMATS = {"i64": "q", "f64": "d", "f32": "f", "time": "q"}
+FIELD_TYPES = tuple(_FIXED_FORMATS) + ("str", "map")
+
+
+def _micros(moment: datetime) -> int:
+    delta = _utc_naive(moment) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+try:  # map fields are plain JSON, so orjson is a drop-in when installed
+    import orjson as _orjson  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    _orjson = None
+
+
+def _dump_map(value: Any) -> bytes:
+    if _orjson is not None:
+        return _orjson.dumps(value, default=_json_default, option=_orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def _load_map(data: bytes) -> Any:
+    return _orjson.loads(data) if _orjson is not None else json.loads(data)
+
+
+@dataclass(frozen=True)
+class MessageSchema:
+    """Field layout of one message type at one version.
+
+    ``time`` fields are microseconds since the epoch (naive datetimes are
+    taken as UTC) and decode to naive UTC datetimes; ``map`` fields are
+    compact JSON. Keys not in the schema travel in a JSON tail so producers
+    may add fields before the schema is revised.
+    """
+
+    schema_id: int
+    version: int
+    name: str
+    fields: Tuple[Tuple[str, str], ...]
+
+    def __post_init__(self) -> None:
+        unknown = {kind for _, kind in self.fields} - set(FIELD_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown field types: {sorted(unknown)}")
+
+
+class _Layout:
+    """Wire plan for a schema: header, presence bitmap, one struct holding
+    every fixed-width field, then length-prefixed strings and maps."""
+
+    def __init__(self, schema: MessageSchema) -> None:
+        self.schema = schema
+        self.header = _HEADER.pack(_MAGIC, schema.schema_id, schema.version)
+        self.names = [name for name, _ in schema.fields]
+        self.name_set = frozenset(self.names)
+        self.bitmap_size = (len(schema.fields) + 7) // 8
+        indexed = [(index, name, kind) for index, (name, kind) in enumerate(schema.fields)]
+        self.fixed = [entry for entry in indexed if entry[2] in _FIXED_FORMATS]
+        self.variable = [entry for entry in indexed if entry[2] not in _FIXED_FORMATS]
+        self.fixed_struct = struct.Struct(
+            ">" + "".join(_FIXED_FORMATS[kind] for _, _, kind in self.fixed)
+        )
+
+    def encode(self, value: Mapping[str, Any]) -> bytes:
+        present = 0
+        fixed: List[Any] = []
+        for bit, name, kind in self.fixed:
+            item = value.get(name)
+            if item is None:
+                fixed.append(0)
+                continue
+            present |= 1 << bit
+            fixed.append(_micros(item) if kind == "time" else item)
+        parts = [self.header, b"", self.fixed_struct.pack(*fixed)]
+        for bit, name, kind in self.variable:
+            item = value.get(name)
+            if item is None:
+                continue
+            present |= 1 << bit
+            if kind == "str":
+                data = str(item).encode("utf-8")
+                parts.append(_STR_LEN.pack(len(data)))
+            else:
+                data = _dump_map(item)
+                parts.append(_MAP_LEN.pack(len(data)))
+            parts.append(data)
+        parts[1] = present.to_bytes(self.bitmap_size, "little")
+        if value.keys() - self.name_set:
+            extras = {key: item for key, item in value.items() if key not in self.name_set}
+            data = _dump_map(extras)
+            parts.append(_MAP_LEN.pack(len(data)))
+            parts.append(data)
+        return b"".join(parts)
+
+    def decode(self, data: bytes, offset: int) -> Dict[str, Any]:
+        present = int.from_bytes(data[offset : offset + self.bitmap_size], "little")
+        offset += self.bitmap_size
+        result: Dict[str, Any] = dict.fromkeys(self.names)
+        fixed = self.fixed_struct.unpack_from(data, offset)
+        offset += self.fixed_struct.size
+        for (bit, name, kind), item in zip(self.fixed, fixed):
+            if present >> bit & 1:
+                result[name] = _EPOCH + timedelta(microseconds=item) if kind == "time" else item
+        for bit, name, kind in self.variable:
+            if not present >> bit & 1:
+                continue
+            if kind == "str":
+                (length,) = _STR_LEN.unpack_from(data, offset)
+                offset += _STR_LEN.size
+                result[name] = data[offset : offset + length].decode("utf-8")
+            else:
+                (length,) = _MAP_LEN.unpack_from(data, offset)
+                offset += _MAP_LEN.size
+                result[name] = _load_map(data[offset : offset + length])
+            offset += length
+        if offset < len(data):
+            (length,) = _MAP_LEN.unpack_from(data, offset)
+            offset += _MAP_LEN.size
+            result.update(_load_map(data[offset : offset + length]))
+        return result
+
+
+class BinaryCodec:
+    """Compact binary encoding driven by a registry of :class:`MessageSchema`.
+
+    Every record starts with the schema id and version, so a consumer can
+    decode any version it knows about regardless of which one the producer
+    currently writes.
+    """
+
+    name = "binary"
+
+    def __init__(self, schemas: Sequence[MessageSchema], *, default: MessageSchema | None = None):
+        self._layouts: Dict[Tuple[int, int], _Layout] = {}
+        self._latest: Dict[str, MessageSchema] = {}
+        for schema in schemas:
+            self._layouts[(schema.schema_id, schema.version)] = _Layout(schema)
+            current = self._latest.get(schema.name)
+            if current is None or schema.version > current.version:
+                self._latest[schema.name] = schema
+        self.default = default
+
+    def for_schema(self, name: str) -> "BoundBinaryCodec":
+        if name not in self._latest:
+            raise ValueError(f"Unknown message schema {name!r}")
+        return BoundBinaryCodec(self, self._latest[name])
+
+    def encode(self, value: Mapping[str, Any], schema: MessageSchema | None = None) -> bytes:
+        schema = schema or self.default
+        if schema is None:
+            raise CodecError("No message schema selected for binary encoding")
+        layout = self._layouts.get((schema.schema_id, schema.version))
+        if layout is None:
+            raise CodecError(f"Schema {schema.name} v{schema.version} is not registered")
+        try:
+            return layout.encode(value)
+        except (TypeError, ValueError, AttributeError, OverflowError, struct.error) as exc:
+            raise CodecError(f"Cannot encode {schema.name} v{schema.version}: {exc}") from exc
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        data = bytes(data)
+        if len(data) < _HEADER.size:
+            raise CodecError("Binary message is truncated")
+        magic, schema_id, version = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            raise CodecError("Not a binary bus message")
+        layout = self._layouts.get((schema_id, version))
+        if layout is None:
+            raise CodecError(f"Unknown message schema {schema_id} v{version}")
+        try:
+            return layout.decode(data, _HEADER.size)
+        except (ValueError, struct.error) as exc:
+            raise CodecError(f"Corrupt {layout.schema.name} v{version} message: {exc}") from exc
+
+
+class BoundBinaryCodec:
+    """A :class:`BinaryCodec` pinned to the latest version of one schema."""
+
+    name = BinaryCodec.name
+
+    def __init__(self, codec: BinaryCodec, schema: MessageSchema) -> None:
+        self.codec = codec
+        self.schema = schema
+
+    def encode(self, value: Mapping[str, Any]) -> bytes:
+        return self.codec.encode(value, self.schema)
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        return self.codec.decode(data)
+
+
+WAVEFORM_V1 = MessageSchema(
+    schema_id=1,
+    version=1,
+    name="waveform",
+    fields=(
+        ("station_code", "str"),
+        ("network", "str"),
+        ("location", "str"),
+        ("channel", "str"),
+        ("start_time", "time"),
+        ("end_time", "time"),
+        ("sampling_rate", "f64"),
+        ("sample_count", "i64"),
+        ("window_seconds", "f64"),
+        ("object_uri", "str"),
+        ("object_key", "str"),
+        ("byte_offset", "i64"),
+        ("byte_length", "i64"),
+        ("fingerprint", "str"),
+        ("metadata", "map"),
+        ("ingested_at", "time"),
+    ),
+)
+PHASE_PICK_V1 = MessageSchema(
+    schema_id=2,
+    version=1,
+    name="phase_pick",
+    fields=(
+        ("station_code", "str"),
+        ("phase_type", "str"),
+        ("pick_time", "time"),
+        ("probability", "f32"),
+        ("polarity", "str"),
+        ("extra", "map"),
+    ),
+)
+ASSOCIATION_V1 = MessageSchema(
+    schema_id=3,
+    version=1,
+    name="association",
+    fields=(
+        ("origin_time", "time"),
+        ("latitude", "f64"),
+        ("longitude", "f64"),
+        ("depth_km", "f64"),
+        ("score", "f64"),
+        ("method", "str"),
+    ),
+)
+DEFAULT_SCHEMAS = (WAVEFORM_V1, PHASE_PICK_V1, ASSOCIATION_V1)
+
+
+class CodecRegistry:
+    """Resolves the codec used to write each topic and to read each record.
+
+    ``topic_codecs`` maps topic names to a codec name; ``binary`` entries
+    may name a schema as ``binary:<schema>``. Reading always follows the
+    record's ``content-type`` header, so a topic can switch codecs while
+    older records are still being consumed.
+    """
+
+    def __init__(
+        self,
+        topic_codecs: Mapping[str, str] | None = None,
+        *,
+        default: str = "json",
+        schemas: Sequence[MessageSchema] = DEFAULT_SCHEMAS,
+    ) -> None:
+        self.binary = BinaryCodec(schemas)
+        self._codecs: Dict[str, Codec] = {"json": JsonCodec(), "binary": self.binary}
+        for factory in (OrjsonCodec, MsgpackCodec):
+            try:
+                codec = factory()
+            except ImportError:
+                continue
+            self._codecs[codec.name] = codec
+        self._writers: Dict[str, Codec] = {}
+        self.default = self._resolve(default)
+        for topic, spec in (topic_codecs or {}).items():
+            self._writers[topic] = self._resolve(spec)
+
+    def _resolve(self, spec: str) -> Codec:
+        name, _, schema = spec.partition(":")
+        if name == "binary":
+            if not schema:
+                raise ValueError("Binary topics must name a schema, e.g. binary:phase_pick")
+            return self.binary.for_schema(schema)
+        codec = self._codecs.get(name)
+        if codec is None:
+            raise ValueError(f"Codec {name!r} is not available")
+        return codec
+
+    def for_topic(self, topic: str) -> Codec:
+        return self._writers.get(topic, self.default)
+
+    def for_content_type(self, content_type: str | bytes | None) -> Codec:
+        if content_type is None:
+            return self._codecs["json"]
+        if isinstance(content_type, bytes):
+            content_type = content_type.decode("ascii")
+        codec = self._codecs.get(content_type)
+        if codec is None:
+            raise CodecError(f"No codec for content type {content_type!r}")
+        return codec
+
+    def decode(
+        self, data: bytes, headers: Sequence[Tuple[str, bytes]] | None = None
+    ) -> Dict[str, Any]:
+        """Decode a record value using its ``content-type`` header, if any."""
+
+        content_type = None
+        for name, value in headers or ():
+            if name == CONTENT_TYPE_HEADER:
+                content_type = value
+        return self.for_content_type(content_type).decode(data)
+
+    @property
+    def available(self) -> List[str]:
+        return sorted(self._codecs)
+
+
+__all__ = [
+    "ASSOCIATION_V1",
+    "BinaryCodec",
+    "CONTENT_TYPE_HEADER",
+    "Codec",
+    "CodecError",
+    "CodecRegistry",
+    "JsonCodec",
+    "MessageSchema",
+    "MsgpackCodec",
+    "OrjsonCodec",
+    "PHASE_PICK_V1",
+    "WAVEFORM_V1",
+]
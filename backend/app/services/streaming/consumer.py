@@ -0,0 +1,325 @@
+"""Batched Kafka consumption with ordered concurrent handlers."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Collection,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Set,
+)
+
+from .codecs import CodecError, CodecRegistry
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class TopicPartition(NamedTuple):
+    topic: str
+    partition: int
+
+
+@dataclass
+class ConsumerMetrics:
+    """Counters for one subscription; ``lag`` is per partition."""
+
+    topic: str
+    group_id: str
+    fetched: int = 0
+    processed: int = 0
+    failed: int = 0
+    decode_errors: int = 0
+    commits: int = 0
+    commit_failures: int = 0
+    in_flight: int = 0
+    lag: Dict[int, int] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def total_lag(self) -> int:
+        return sum(self.lag.values())
+
+    @property
+    def throughput(self) -> float:
+        """Processed records per second since the subscription started."""
+
+        elapsed = time.monotonic() - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+
+class _PartitionProgress:
+    """Tracks which fetched offsets are done and the contiguous watermark."""
+
+    def __init__(self) -> None:
+        self.outstanding: Deque[int] = deque()
+        self.done: Set[int] = set()
+        self.watermark: int | None = None
+        self.committed: int | None = None
+
+    def fetched(self, offset: int) -> None:
+        self.outstanding.append(offset)
+
+    def complete(self, offset: int) -> bool:
+        """Mark ``offset`` done; returns True when the watermark advanced."""
+
+        self.done.add(offset)
+        advanced = False
+        while self.outstanding and self.outstanding[0] in self.done:
+            finished = self.outstanding.popleft()
+            self.done.discard(finished)
+            self.watermark = finished + 1
+            advanced = True
+        return advanced
+
+
+class BatchConsumer:
+    """Drives one ``AIOKafkaConsumer`` subscription.
+
+    Records are pulled with ``getmany`` in batches of up to ``max_records``
+    and handed to at most ``concurrency`` concurrent handler calls. Records
+    sharing a key (per partition) run one after another in offset order,
+    including across batches, while different keys proceed in parallel;
+    records without a key are ordered by partition. Up to
+    ``max_in_flight`` records may be fetched ahead of processing.
+
+    Offsets are committed in the background, at most every
+    ``commit_interval_ms``, up to the first record of each partition that
+    has not finished yet, so a restart resumes after the last contiguous
+    processed record. Only partitions in the consumer's current
+    ``assignment()`` are committed. When the group takes partitions away,
+    :meth:`on_partitions_revoked` commits their processed prefix and
+    forgets them; records of theirs still running are redelivered to the
+    new owner. Handler failures are logged and counted; the record still
+    counts as processed so one bad message cannot stall the group.
+    """
+
+    def __init__(
+        self,
+        consumer: Any,
+        handler: Handler,
+        codecs: CodecRegistry,
+        *,
+        topic: str,
+        group_id: str,
+        max_records: int = 500,
+        fetch_timeout_ms: int = 200,
+        concurrency: int = 16,
+        max_in_flight: int = 2000,
+        commit_interval_ms: int = 200,
+    ) -> None:
+        if concurrency <= 0 or max_records <= 0 or max_in_flight <= 0:
+            raise ValueError("concurrency, max_records and max_in_flight must be positive")
+        self.consumer = consumer
+        self.handler = handler
+        self.codecs = codecs
+        self.max_records = max_records
+        self.fetch_timeout_ms = fetch_timeout_ms
+        self.max_in_flight = max_in_flight
+        self.commit_interval = commit_interval_ms / 1000
+        self.metrics = ConsumerMetrics(topic=topic, group_id=group_id)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._progress: Dict[Any, _PartitionProgress] = {}
+        self._tails: Dict[Hashable, asyncio.Task] = {}
+        self._room = asyncio.Event()
+        self._room.set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._commit_wanted = asyncio.Event()
+        self._fetch_task: asyncio.Task | None = None
+        self._commit_task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        await self.consumer.start()
+        self._fetch_task = asyncio.create_task(self._fetch_loop())
+        self._commit_task = asyncio.create_task(self._commit_loop())
+
+    async def stop(self) -> None:
+        """Stop fetching, finish in-flight records, commit and close."""
+
+        for task in (self._fetch_task, self._commit_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        await self._idle.wait()
+        await self._commit()
+        await self.consumer.stop()
+
+    async def drain(self) -> None:
+        """Wait until every fetched record has been handled."""
+
+        await self._idle.wait()
+
+    async def on_partitions_revoked(self, revoked: Collection[Any]) -> None:
+        """Commit what the revoked partitions finished, then drop their progress.
+
+        Runs before the group rebalances, while the partitions are still
+        assigned, so the commit is accepted and the next owner resumes
+        right after the processed prefix. Stale watermarks are never
+        committed later, where they could rewind the new owner.
+        """
+
+        revoked = set(revoked)
+        await self._commit(only=revoked)
+        for tp in revoked:
+            self._progress.pop(tp, None)
+            self.metrics.lag.pop(tp.partition, None)
+
+    async def on_partitions_assigned(self, assigned: Collection[Any]) -> None:
+        """Nothing to prepare: progress starts with a partition's first fetch."""
+
+    async def _fetch_loop(self) -> None:
+        while True:
+            await self._room.wait()
+            budget = min(self.max_records, self.max_in_flight - self.metrics.in_flight)
+            batches = await self.consumer.getmany(
+                timeout_ms=self.fetch_timeout_ms, max_records=budget
+            )
+            for tp, records in batches.items():
+                self._dispatch(tp, records)
+            self._update_lag()
+
+    def _dispatch(self, tp: Any, records: List[Any]) -> None:
+        progress = self._progress.setdefault(tp, _PartitionProgress())
+        lanes: Dict[Hashable, List[Any]] = {}
+        for record in records:
+            progress.fetched(record.offset)
+            lanes.setdefault((tp, record.key), []).append(record)
+        self.metrics.fetched += len(records)
+        self._track(len(records))
+        for lane, lane_records in lanes.items():
+            previous = self._tails.get(lane)
+            task = asyncio.create_task(self._run_lane(tp, progress, lane_records, previous))
+            self._tails[lane] = task
+            task.add_done_callback(lambda done, lane=lane: self._forget(lane, done))
+
+    def _forget(self, lane: Hashable, task: asyncio.Task) -> None:
+        if self._tails.get(lane) is task:
+            del self._tails[lane]
+
+    def _track(self, delta: int) -> None:
+        self.metrics.in_flight += delta
+        if self.metrics.in_flight >= self.max_in_flight:
+            self._room.clear()
+        else:
+            self._room.set()
+        if self.metrics.in_flight:
+            self._idle.clear()
+        else:
+            self._idle.set()
+
+    async def _run_lane(
+        self,
+        tp: Any,
+        progress: _PartitionProgress,
+        records: List[Any],
+        previous: asyncio.Task | None,
+    ) -> None:
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        for record in records:
+            async with self._slots:
+                await self._handle(record)
+            # Progress of a revoked partition is detached and no longer commits.
+            if progress.complete(record.offset) and self._progress.get(tp) is progress:
+                self._commit_wanted.set()
+            self.metrics.processed += 1
+            self._track(-1)
+
+    async def _handle(self, record: Any) -> None:
+        try:
+            payload = self.codecs.decode(record.value, record.headers)
+        except (CodecError, ValueError):
+            self.metrics.decode_errors += 1
+            logger.exception("Failed to decode Kafka message at offset %s", record.offset)
+            return
+        try:
+            await self.handler(payload)
+        except Exception:
+            self.metrics.failed += 1
+            logger.exception("Handler failed on Kafka message at offset %s", record.offset)
+
+    async def _commit_loop(self) -> None:
+        while True:
+            await self._commit_wanted.wait()
+            await self._commit()
+            await asyncio.sleep(self.commit_interval)
+
+    async def _commit(self, only: Set[Any] | None = None) -> None:
+        if only is None:
+            self._commit_wanted.clear()
+        assigned = set(self.consumer.assignment())
+        offsets = {
+            tp: progress.watermark
+            for tp, progress in self._progress.items()
+            if tp in assigned
+            and (only is None or tp in only)
+            and progress.watermark is not None
+            and progress.watermark != progress.committed
+        }
+        if not offsets:
+            return
+        try:
+            await self.consumer.commit(offsets)
+        except Exception:  # pragma: no cover - protective
+            self.metrics.commit_failures += 1
+            if only is None:
+                self._commit_wanted.set()
+            logger.exception("Failed to commit offsets for %s", self.metrics.topic)
+            return
+        self.metrics.commits += 1
+        for tp, offset in offsets.items():
+            self._progress[tp].committed = offset
+        self._update_lag()
+
+    def _update_lag(self) -> None:
+        for tp in self.consumer.assignment():
+            progress = self._progress.get(tp)
+            highwater = self.consumer.highwater(tp)
+            if highwater is None:
+                continue
+            if progress is None:
+                continue
+            if progress.outstanding:
+                position = progress.outstanding[0]
+            elif progress.watermark is not None:
+                position = progress.watermark
+            else:
+                continue
+            self.metrics.lag[tp.partition] = max(0, highwater - position)
+
+
+def rebalance_listener(consumer: BatchConsumer) -> Any:
+    """A ``ConsumerRebalanceListener`` forwarding to ``consumer``'s hooks.
+
+    aiokafka only accepts subclasses of its listener class; without aiokafka
+    (e.g. with the in-process fake) a plain object is enough.
+    """
+
+    try:
+        from aiokafka.abc import ConsumerRebalanceListener  # type: ignore
+    except ImportError:  # pragma: no cover - optional dependency
+        ConsumerRebalanceListener = object
+
+    class _Listener(ConsumerRebalanceListener):  # type: ignore[misc, valid-type]
+        async def on_partitions_revoked(self, revoked):
+            await consumer.on_partitions_revoked(revoked)
+
+        async def on_partitions_assigned(self, assigned):
+            await consumer.on_partitions_assigned(assigned)
+
+    return _Listener()
+
+
+__all__ = ["BatchConsumer", "ConsumerMetrics", "TopicPartition", "rebalance_listener"]
@@ -0,0 +1,385 @@
+"""In-process stand-in for a Kafka broker and the aiokafka producer and consumer.
+
+:class:`FakeKafkaProducer` follows the ``AIOKafkaProducer`` calling
+convention (``send`` returns a delivery future, ``send_and_wait`` awaits it)
+and batches records per partition by ``linger_ms`` and ``max_batch_size``
+before issuing one produce request per batch to :class:`FakeKafkaBroker`.
+The broker can add a simulated round trip so batching effects show up in
+tests and benchmarks without a cluster::
+
+    broker = FakeKafkaBroker(partitions=3, round_trip_ms=2)
+    bus = KafkaMessageBus(
+        "fake:9092", producer_factory=broker.producer, consumer_factory=broker.consumer
+    )
+
+:class:`FakeKafkaConsumer` covers the ``AIOKafkaConsumer`` calls the bus
+makes: ``subscribe``, ``getmany``, ``commit``, ``highwater`` and
+``assignment``. A single consumer is assigned every partition of its
+topics, starting from the group's committed offset or
+``auto_offset_reset``; :meth:`FakeKafkaConsumer.rebalance` simulates the
+group moving partitions, calling the subscription's rebalance listener.
+Like aiokafka, commits for partitions that are not assigned are rejected.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import gzip
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+from .consumer import TopicPartition
+from .partitioning import partition_for
+
+Headers = List[Tuple[str, bytes]]
+
+
+@dataclass
+class RecordMetadata:
+    topic: str
+    partition: int
+    offset: int
+
+
+@dataclass
+class StoredRecord:
+    offset: int
+    key: bytes | None
+    value: bytes
+    headers: Headers = field(default_factory=list)
+
+
+@dataclass
+class ConsumerRecord:
+    topic: str
+    partition: int
+    offset: int
+    key: bytes | None
+    value: bytes
+    headers: Headers = field(default_factory=list)
+
+
+def _compress(codec: str | None, payload: bytes) -> bytes:
+    if codec is None:
+        return payload
+    if codec == "gzip":
+        return gzip.compress(payload)
+    if codec == "lz4":
+        try:
+            import lz4.frame  # type: ignore
+        except ImportError as exc:
+            raise RuntimeError("Compression library for lz4 not found") from exc
+        return lz4.frame.compress(payload)
+    if codec == "zstd":
+        try:
+            import zstandard  # type: ignore
+        except ImportError as exc:
+            raise RuntimeError("Compression library for zstd not found") from exc
+        return zstandard.ZstdCompressor().compress(payload)
+    raise RuntimeError(f"Compression library for {codec} not found")
+
+
+class FakeKafkaBroker:
+    """Append-only partition logs that count produce requests and bytes."""
+
+    def __init__(self, *, partitions: int = 1, round_trip_ms: float = 0.0) -> None:
+        self.partitions = max(1, partitions)
+        self.round_trip_ms = round_trip_ms
+        self.logs: Dict[TopicPartition, List[StoredRecord]] = {}
+        self.produce_requests = 0
+        self.bytes_received = 0
+        self.commit_requests = 0
+        self.group_offsets: Dict[Tuple[str, TopicPartition], int] = {}
+        self._waiters: List[asyncio.Future] = []
+
+    def producer(self, **config: Any) -> "FakeKafkaProducer":
+        """Producer factory compatible with ``KafkaMessageBus(producer_factory=...)``."""
+
+        return FakeKafkaProducer(self, **config)
+
+    def consumer(self, *topics: str, **config: Any) -> "FakeKafkaConsumer":
+        """Consumer factory compatible with ``KafkaMessageBus(consumer_factory=...)``."""
+
+        return FakeKafkaConsumer(self, *topics, **config)
+
+    async def produce(
+        self,
+        topic: str,
+        partition: int,
+        records: List[Tuple[bytes | None, bytes, Headers]],
+        wire_bytes: int,
+    ) -> int:
+        self.produce_requests += 1
+        self.bytes_received += wire_bytes
+        if self.round_trip_ms:
+            await asyncio.sleep(self.round_trip_ms / 1000)
+        log = self.logs.setdefault(TopicPartition(topic, partition), [])
+        base = len(log)
+        log.extend(
+            StoredRecord(offset=base + index, key=key, value=value, headers=headers)
+            for index, (key, value, headers) in enumerate(records)
+        )
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        return base
+
+    async def wait_for_records(self, timeout: float) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait([waiter], timeout=timeout)
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    async def commit(self, group_id: str, offsets: Dict[TopicPartition, int]) -> None:
+        self.commit_requests += 1
+        if self.round_trip_ms:
+            await asyncio.sleep(self.round_trip_ms / 1000)
+        for tp, offset in offsets.items():
+            self.group_offsets[(group_id, TopicPartition(*tp))] = offset
+
+    def committed(self, group_id: str, topic: str, partition: int = 0) -> int | None:
+        return self.group_offsets.get((group_id, TopicPartition(topic, partition)))
+
+    def records(self, topic: str, partition: int = 0) -> List[StoredRecord]:
+        return list(self.logs.get(TopicPartition(topic, partition), []))
+
+
+@dataclass
+class _Batch:
+    records: List[Tuple[bytes | None, bytes, Headers]]
+    futures: List[asyncio.Future]
+    size: int = 0
+    timer: asyncio.TimerHandle | None = None
+
+
+class FakeKafkaProducer:
+    def __init__(
+        self,
+        broker: FakeKafkaBroker,
+        *,
+        linger_ms: int = 0,
+        max_batch_size: int = 16384,
+        compression_type: str | None = None,
+        **_: Any,
+    ) -> None:
+        self.broker = broker
+        self.linger_ms = linger_ms
+        self.max_batch_size = max_batch_size
+        self.compression_type = compression_type
+        self._batches: Dict[TopicPartition, _Batch] = {}
+        self._inflight: Dict[TopicPartition, asyncio.Task] = {}
+        self._round_robin = 0
+
+    async def start(self) -> None:
+        _compress(self.compression_type, b"")
+
+    async def stop(self) -> None:
+        await self.flush()
+
+    async def send(
+        self,
+        topic: str,
+        value: bytes,
+        key: bytes | None = None,
+        partition: int | None = None,
+        timestamp_ms: int | None = None,
+        headers: Sequence[Tuple[str, bytes]] | None = None,
+    ) -> asyncio.Future:
+        if partition is None:
+            partition = self._partition_for(key)
+        tp = TopicPartition(topic, partition)
+        batch = self._batches.get(tp)
+        if batch is None:
+            batch = self._batches[tp] = _Batch(records=[], futures=[])
+            loop = asyncio.get_running_loop()
+            batch.timer = loop.call_later(self.linger_ms / 1000, self._dispatch, tp)
+        future = asyncio.get_running_loop().create_future()
+        record_headers = list(headers or [])
+        batch.records.append((key, value, record_headers))
+        batch.futures.append(future)
+        batch.size += (
+            len(value)
+            + len(key or b"")
+            + sum(len(name) + len(data) for name, data in record_headers)
+        )
+        if batch.size >= self.max_batch_size:
+            self._dispatch(tp)
+        return future
+
+    async def send_and_wait(
+        self,
+        topic: str,
+        value: bytes,
+        key: bytes | None = None,
+        partition: int | None = None,
+        timestamp_ms: int | None = None,
+        headers: Sequence[Tuple[str, bytes]] | None = None,
+    ) -> RecordMetadata:
+        delivery = await self.send(
+            topic, value, key=key, partition=partition, timestamp_ms=timestamp_ms, headers=headers
+        )
+        return await delivery
+
+    async def flush(self) -> None:
+        for tp in list(self._batches):
+            self._dispatch(tp)
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight.values()), return_exceptions=True)
+
+    def _partition_for(self, key: bytes | None) -> int:
+        if key is None:
+            self._round_robin += 1
+            return self._round_robin % self.broker.partitions
+        return partition_for(key, self.broker.partitions)
+
+    def _dispatch(self, tp: TopicPartition) -> None:
+        batch = self._batches.pop(tp, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        previous = self._inflight.get(tp)
+        task = asyncio.get_running_loop().create_task(self._deliver(tp, batch, previous))
+        self._inflight[tp] = task
+        task.add_done_callback(functools.partial(self._forget, tp))
+
+    def _forget(self, tp: TopicPartition, task: asyncio.Task) -> None:
+        if self._inflight.get(tp) is task:
+            del self._inflight[tp]
+
+    async def _deliver(
+        self, tp: TopicPartition, batch: _Batch, previous: asyncio.Task | None
+    ) -> None:
+        if previous is not None:
+            # Keep per-partition ordering across in-flight batches.
+            await asyncio.gather(previous, return_exceptions=True)
+        topic, partition = tp
+        try:
+            wire = _compress(
+                self.compression_type,
+                b"".join(
+                    (key or b"") + value + b"".join(name.encode() + data for name, data in headers)
+                    for key, value, headers in batch.records
+                ),
+            )
+            base = await self.broker.produce(topic, partition, batch.records, len(wire))
+        except Exception as exc:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for index, future in enumerate(batch.futures):
+            if not future.done():
+                future.set_result(RecordMetadata(topic, partition, base + index))
+
+
+class FakeKafkaConsumer:
+    def __init__(
+        self,
+        broker: FakeKafkaBroker,
+        *topics: str,
+        group_id: str | None = None,
+        auto_offset_reset: str = "latest",
+        **_: Any,
+    ) -> None:
+        self.broker = broker
+        self.topics = topics
+        self.group_id = group_id
+        self.auto_offset_reset = auto_offset_reset
+        self.listener: Any = None
+        self._positions: Dict[TopicPartition, int] = {}
+
+    def subscribe(self, topics: Sequence[str], listener: Any = None) -> None:
+        self.topics = tuple(topics)
+        self.listener = listener
+
+    async def start(self) -> None:
+        await self._assign(
+            TopicPartition(topic, partition)
+            for topic in self.topics
+            for partition in range(self.broker.partitions)
+        )
+
+    async def rebalance(self, partitions: Iterable[TopicPartition]) -> None:
+        """Simulate a group rebalance: revoke everything, then assign ``partitions``."""
+
+        if self.listener is not None:
+            await self.listener.on_partitions_revoked(set(self._positions))
+        self._positions.clear()
+        await self._assign(partitions)
+
+    async def _assign(self, partitions: Iterable[TopicPartition]) -> None:
+        for tp in partitions:
+            committed = (
+                self.broker.committed(self.group_id, tp.topic, tp.partition)
+                if self.group_id
+                else None
+            )
+            if committed is None:
+                committed = 0 if self.auto_offset_reset == "earliest" else self.highwater(tp)
+            self._positions[tp] = committed
+        if self.listener is not None:
+            await self.listener.on_partitions_assigned(set(self._positions))
+
+    async def stop(self) -> None:
+        self._positions.clear()
+
+    def assignment(self) -> Set[TopicPartition]:
+        return set(self._positions)
+
+    def highwater(self, tp: TopicPartition) -> int:
+        return len(self.broker.logs.get(TopicPartition(*tp), []))
+
+    async def getmany(
+        self, *partitions: TopicPartition, timeout_ms: int = 0, max_records: int | None = None
+    ) -> Dict[TopicPartition, List[ConsumerRecord]]:
+        batch = self._collect(partitions, max_records)
+        if not batch and timeout_ms:
+            await self.broker.wait_for_records(timeout_ms / 1000)
+            batch = self._collect(partitions, max_records)
+        return batch
+
+    def _collect(
+        self, partitions: Sequence[TopicPartition], max_records: int | None
+    ) -> Dict[TopicPartition, List[ConsumerRecord]]:
+        budget = max_records if max_records is not None else 1 << 30
+        batch: Dict[TopicPartition, List[ConsumerRecord]] = {}
+        for tp in partitions or sorted(self._positions):
+            if budget <= 0:
+                break
+            position = self._positions[tp]
+            stored = self.broker.logs.get(tp, [])[position : position + budget]
+            if not stored:
+                continue
+            batch[tp] = [
+                ConsumerRecord(
+                    tp.topic, tp.partition, item.offset, item.key, item.value, item.headers
+                )
+                for item in stored
+            ]
+            self._positions[tp] = position + len(stored)
+            budget -= len(stored)
+        return batch
+
+    async def commit(self, offsets: Dict[TopicPartition, int] | None = None) -> None:
+        if self.group_id is None:
+            raise RuntimeError("Commits require a group_id")
+        for tp in offsets or ():
+            if tp not in self._positions:
+                raise RuntimeError(f"Partition {tp} is not assigned to this consumer")
+        await self.broker.commit(self.group_id, offsets or dict(self._positions))
+
+
+__all__ = [
+    "ConsumerRecord",
+    "FakeKafkaBroker",
+    "FakeKafkaConsumer",
+    "FakeKafkaProducer",
+    "RecordMetadata",
+    "StoredRecord",
+    "TopicPartition",
+]
@@ -0,0 +1,675 @@
+"""Durable message bus on append-only log segments for nodes without Kafka.
+
+Layout under ``root``::
+
+    <topic>-<partition>/
+        00000000000000000000.log     records, memory mapped
+        00000000000000000000.index   sparse (relative offset, position) pairs
+        consumer-offsets.json        committed offset per consumer group
+
+A record is ``length u32 | crc32 u32 | offset u64 | timestamp_ms i64 |
+key_length u16 | key | content_type_length u8 | content_type | value``;
+``length`` counts everything after itself and the CRC covers everything
+after the CRC. The active segment is preallocated to ``segment_bytes`` and
+written through a shared memory map, so a zero length marks the end of the
+written data and a torn tail fails its CRC; both are cut off on recovery.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Set, Tuple
+
+from .codecs import CONTENT_TYPE_HEADER, CodecRegistry
+from .consumer import BatchConsumer, ConsumerMetrics, TopicPartition
+from .message_bus import Message, PublishResult, instrument_publish
+from .partitioning import partition_for
+
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ("always", "interval", "never")
+_PREFIX = struct.Struct(">II")
+_BODY = struct.Struct(">QqH")
+_INDEX_ENTRY = struct.Struct(">II")
+_NO_KEY = 0xFFFF
+_OFFSETS_FILE = "consumer-offsets.json"
+
+
+@dataclass
+class LogEntry:
+    """A stored record, shaped like an aiokafka ``ConsumerRecord``."""
+
+    topic: str
+    partition: int
+    offset: int
+    timestamp: int
+    key: bytes | None
+    value: bytes
+    headers: List[Tuple[str, bytes]] = field(default_factory=list)
+
+
+def _encode_record(
+    offset: int, timestamp_ms: int, key: bytes | None, content_type: bytes, value: bytes
+) -> bytes:
+    if key is not None and len(key) >= _NO_KEY:
+        raise ValueError("Record keys are limited to 65534 bytes")
+    body = b"".join(
+        (
+            _BODY.pack(offset, timestamp_ms, _NO_KEY if key is None else len(key)),
+            key or b"",
+            bytes((len(content_type),)),
+            content_type,
+            value,
+        )
+    )
+    return _PREFIX.pack(len(body) + 4, zlib.crc32(body)) + body
+
+
+def _decode_record(buffer: Any, position: int, limit: int) -> Tuple[Any, int] | None:
+    """Return ``(fields, next_position)`` or ``None`` at the end of valid data."""
+
+    if position + _PREFIX.size > limit:
+        return None
+    length, crc = _PREFIX.unpack_from(buffer, position)
+    end = position + 4 + length
+    if length < 4 + _BODY.size or end > limit:
+        return None
+    body = buffer[position + _PREFIX.size : end]
+    if zlib.crc32(body) != crc:
+        return None
+    offset, timestamp, key_length = _BODY.unpack_from(body, 0)
+    cursor = _BODY.size
+    key = None
+    if key_length != _NO_KEY:
+        key = bytes(body[cursor : cursor + key_length])
+        cursor += key_length
+    type_length = body[cursor]
+    content_type = bytes(body[cursor + 1 : cursor + 1 + type_length])
+    value = bytes(body[cursor + 1 + type_length :])
+    return (offset, timestamp, key, content_type, value), end
+
+
+class _Segment:
+    """One ``.log``/``.index`` pair starting at ``base_offset``."""
+
+    def __init__(
+        self, directory: Path, base_offset: int, *, capacity: int, index_interval: int
+    ) -> None:
+        self.base_offset = base_offset
+        self.log_path = directory / f"{base_offset:020d}.log"
+        self.index_path = directory / f"{base_offset:020d}.index"
+        self.capacity = capacity
+        self.index_interval = index_interval
+        self.index_offsets: List[int] = []
+        self.index_positions: List[int] = []
+        self.size = 0
+        self.next_offset = base_offset
+        self.sealed = False
+        self._since_index = 0
+        self._file = None
+        self._map: mmap.mmap | None = None
+        self._index_file = None
+
+    # -- lifecycle ---------------------------------------------------------------------
+
+    def open(self, *, active: bool) -> None:
+        """Map the segment, recovering its end from the last index entry."""
+
+        exists = self.log_path.exists()
+        self._file = open(self.log_path, "r+b" if exists else "w+b")
+        length = os.fstat(self._file.fileno()).st_size
+        if self.index_path.exists():
+            raw = self.index_path.read_bytes()
+            for start in range(0, len(raw) - len(raw) % _INDEX_ENTRY.size, _INDEX_ENTRY.size):
+                relative, position = _INDEX_ENTRY.unpack_from(raw, start)
+                if position < length:
+                    self.index_offsets.append(self.base_offset + relative)
+                    self.index_positions.append(position)
+        if active and length < self.capacity:
+            self._file.truncate(self.capacity)
+            length = self.capacity
+        self.sealed = not active
+        if length:
+            access = mmap.ACCESS_WRITE if active else mmap.ACCESS_READ
+            self._map = mmap.mmap(self._file.fileno(), length, access=access)
+        self._recover(length)
+        if active:
+            self._rewrite_index()
+            self._index_file = open(self.index_path, "ab")
+
+    def _recover(self, limit: int) -> None:
+        position = self.index_positions[-1] if self.index_positions else 0
+        self.next_offset = self.index_offsets[-1] if self.index_offsets else self.base_offset
+        while self._map is not None:
+            decoded = _decode_record(self._map, position, limit)
+            if decoded is None:
+                break
+            (offset, *_), position = decoded
+            self.next_offset = offset + 1
+        self.size = position
+        if self._map is not None and not self.sealed and position < limit:
+            # Zero the torn tail so the next record starts on clean bytes.
+            tail = min(limit, position + _PREFIX.size)
+            self._map[position:tail] = bytes(tail - position)
+
+    def _rewrite_index(self) -> None:
+        with open(self.index_path, "wb") as index:
+            for offset, position in zip(self.index_offsets, self.index_positions):
+                index.write(_INDEX_ENTRY.pack(offset - self.base_offset, position))
+
+    def seal(self) -> None:
+        """Stop writing: flush, trim the preallocated tail and remap read-only."""
+
+        self.sync()
+        if self._index_file is not None:
+            self._index_file.close()
+            self._index_file = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.truncate(self.size)
+        if self.size:
+            self._map = mmap.mmap(self._file.fileno(), self.size, access=mmap.ACCESS_READ)
+        self.sealed = True
+
+    def close(self) -> None:
+        if not self.sealed:
+            self.seal()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def delete(self) -> None:
+        self.close()
+        self.log_path.unlink(missing_ok=True)
+        self.index_path.unlink(missing_ok=True)
+
+    # -- data --------------------------------------------------------------------------
+
+    def append(
+        self, offset: int, timestamp_ms: int, key: bytes | None, content_type: bytes, value: bytes
+    ) -> bool:
+        record = _encode_record(offset, timestamp_ms, key, content_type, value)
+        if self.size + len(record) > self.capacity:
+            if self.size == 0:
+                raise ValueError("Record is larger than the segment size")
+            return False
+        assert self._map is not None and self._index_file is not None
+        if not self.index_offsets or self._since_index >= self.index_interval:
+            self.index_offsets.append(offset)
+            self.index_positions.append(self.size)
+            self._index_file.write(_INDEX_ENTRY.pack(offset - self.base_offset, self.size))
+            self._since_index = 0
+        self._map[self.size : self.size + len(record)] = record
+        self.size += len(record)
+        self._since_index += len(record)
+        self.next_offset = offset + 1
+        return True
+
+    def read(self, topic: str, partition: int, offset: int, max_records: int) -> List[LogEntry]:
+        if self._map is None or offset >= self.next_offset:
+            return []
+        slot = bisect_right(self.index_offsets, offset) - 1
+        position = self.index_positions[slot] if slot >= 0 else 0
+        entries: List[LogEntry] = []
+        while len(entries) < max_records:
+            decoded = _decode_record(self._map, position, self.size)
+            if decoded is None:
+                break
+            (record_offset, timestamp, key, content_type, value), position = decoded
+            if record_offset >= offset:
+                entries.append(
+                    LogEntry(
+                        topic,
+                        partition,
+                        record_offset,
+                        timestamp,
+                        key,
+                        value,
+                        [(CONTENT_TYPE_HEADER, content_type)],
+                    )
+                )
+        return entries
+
+    def sync(self) -> None:
+        if self._map is not None and not self.sealed:
+            self._map.flush()
+        if self._index_file is not None:
+            self._index_file.flush()
+            os.fsync(self._index_file.fileno())
+
+
+class _Partition:
+    def __init__(
+        self,
+        topic: str,
+        number: int,
+        directory: Path,
+        *,
+        segment_bytes: int,
+        index_interval: int,
+        retention_bytes: int | None,
+        retention_seconds: float | None,
+    ) -> None:
+        self.topic = topic
+        self.number = number
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.index_interval = index_interval
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.lock = threading.Lock()
+        directory.mkdir(parents=True, exist_ok=True)
+        bases = sorted(int(path.stem) for path in directory.glob("*.log")) or [0]
+        self.segments: List[_Segment] = []
+        for base in bases:
+            segment = self._segment(base)
+            segment.open(active=base == bases[-1])
+            self.segments.append(segment)
+        self.offsets_path = directory / _OFFSETS_FILE
+        self.group_offsets: Dict[str, int] = {}
+        if self.offsets_path.exists():
+            self.group_offsets = json.loads(self.offsets_path.read_text())
+
+    def _segment(self, base: int) -> _Segment:
+        return _Segment(
+            self.directory, base, capacity=self.segment_bytes, index_interval=self.index_interval
+        )
+
+    @property
+    def active(self) -> _Segment:
+        return self.segments[-1]
+
+    @property
+    def first_offset(self) -> int:
+        return self.segments[0].base_offset
+
+    @property
+    def next_offset(self) -> int:
+        return self.active.next_offset
+
+    def append(self, key: bytes | None, content_type: bytes, value: bytes, timestamp_ms: int) -> int:
+        offset = self.next_offset
+        if not self.active.append(offset, timestamp_ms, key, content_type, value):
+            self.roll()
+            self.active.append(offset, timestamp_ms, key, content_type, value)
+        return offset
+
+    def roll(self) -> None:
+        with self.lock:
+            self.active.seal()
+            segment = self._segment(self.next_offset)
+            segment.open(active=True)
+            self.segments.append(segment)
+        self.apply_retention()
+
+    def apply_retention(self) -> None:
+        now = time.time()
+        while len(self.segments) > 1:
+            oldest = self.segments[0]
+            total = sum(segment.size for segment in self.segments)
+            too_big = self.retention_bytes is not None and total > self.retention_bytes
+            too_old = (
+                self.retention_seconds is not None
+                and now - oldest.log_path.stat().st_mtime > self.retention_seconds
+            )
+            if not (too_big or too_old):
+                break
+            self.segments.pop(0)
+            oldest.delete()
+
+    def read(self, offset: int, max_records: int) -> List[LogEntry]:
+        offset = max(offset, self.first_offset)
+        bases = [segment.base_offset for segment in self.segments]
+        slot = max(0, bisect_right(bases, offset) - 1)
+        entries: List[LogEntry] = []
+        for segment in self.segments[slot:]:
+            if len(entries) >= max_records:
+                break
+            chunk = segment.read(self.topic, self.number, offset, max_records - len(entries))
+            if chunk:
+                entries.extend(chunk)
+                offset = chunk[-1].offset + 1
+        return entries
+
+    def commit(self, group_id: str, offset: int, *, durable: bool) -> None:
+        self.group_offsets[group_id] = offset
+        temporary = self.offsets_path.with_suffix(".tmp")
+        with open(temporary, "w") as handle:
+            json.dump(self.group_offsets, handle)
+            if durable:
+                handle.flush()
+                os.fsync(handle.fileno())
+        os.replace(temporary, self.offsets_path)
+
+    def sync(self) -> None:
+        with self.lock:
+            self.active.sync()
+
+    def close(self) -> None:
+        with self.lock:
+            for segment in self.segments:
+                segment.close()
+
+
+class _LogConsumer:
+    """The subset of ``AIOKafkaConsumer`` that :class:`BatchConsumer` uses."""
+
+    def __init__(self, bus: "LogMessageBus", topic: str, group_id: str) -> None:
+        self.bus = bus
+        self.topic = topic
+        self.group_id = group_id
+        self._positions: Dict[TopicPartition, int] = {}
+
+    async def start(self) -> None:
+        for number, partition in enumerate(self.bus._partitions(self.topic)):
+            committed = partition.group_offsets.get(self.group_id)
+            if committed is None:
+                earliest = self.bus.auto_offset_reset == "earliest"
+                committed = partition.first_offset if earliest else partition.next_offset
+            self._positions[TopicPartition(self.topic, number)] = committed
+
+    async def stop(self) -> None:
+        self._positions.clear()
+
+    def assignment(self) -> Set[TopicPartition]:
+        return set(self._positions)
+
+    def highwater(self, tp: TopicPartition) -> int:
+        return self.bus._partitions(tp.topic)[tp.partition].next_offset
+
+    async def getmany(
+        self, *partitions: TopicPartition, timeout_ms: int = 0, max_records: int | None = None
+    ) -> Dict[TopicPartition, List[LogEntry]]:
+        batch = self._collect(partitions, max_records or 500)
+        if not batch and timeout_ms:
+            await self.bus._wait_for_records(self.topic, timeout_ms / 1000)
+            batch = self._collect(partitions, max_records or 500)
+        return batch
+
+    def _collect(
+        self, partitions: Sequence[TopicPartition], budget: int
+    ) -> Dict[TopicPartition, List[LogEntry]]:
+        batch: Dict[TopicPartition, List[LogEntry]] = {}
+        for tp in partitions or sorted(self._positions):
+            if budget <= 0:
+                break
+            entries = self.bus._partitions(tp.topic)[tp.partition].read(
+                self._positions[tp], budget
+            )
+            if entries:
+                batch[tp] = entries
+                self._positions[tp] = entries[-1].offset + 1
+                budget -= len(entries)
+        return batch
+
+    async def commit(self, offsets: Dict[TopicPartition, int] | None = None) -> None:
+        durable = self.bus.fsync != "never"
+        for tp, offset in (offsets or self._positions).items():
+            self.bus._partitions(tp.topic)[tp.partition].commit(
+                self.group_id, offset, durable=durable
+            )
+
+
+class LogMessageBus:
+    """File-backed :class:`~.message_bus.MessageBus` for single-node deployments.
+
+    Each topic has ``partitions`` partitions, chosen by Kafka's murmur2
+    partitioner (round robin without a key), stored as rolling segments of
+    ``segment_bytes``. Sealed segments are deleted oldest first once a
+    partition exceeds ``retention_bytes`` or a segment is older than
+    ``retention_seconds``.
+
+    ``fsync`` controls durability: ``always`` flushes before ``publish``
+    returns, with concurrent publishes sharing one flush (group commit);
+    ``interval`` flushes in the background every ``fsync_interval_ms``;
+    ``never`` leaves it to the operating system. Subscribers use the same
+    :class:`~.consumer.BatchConsumer` as Kafka, with group offsets stored
+    next to each partition.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        partitions: int = 1,
+        segment_bytes: int = 64 * 1024 * 1024,
+        index_interval_bytes: int = 4096,
+        retention_bytes: int | None = None,
+        retention_seconds: float | None = None,
+        fsync: str = "interval",
+        fsync_interval_ms: int = 1000,
+        auto_offset_reset: str = "latest",
+        consumer_max_records: int = 500,
+        consumer_concurrency: int = 16,
+        consumer_max_in_flight: int = 2000,
+        consumer_commit_interval_ms: int = 200,
+        codecs: CodecRegistry | None = None,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy: {fsync}")
+        if not 0 < segment_bytes < 1 << 32:
+            raise ValueError("segment_bytes must be positive and below 4 GiB")
+        self.root = Path(root)
+        self.partitions = max(1, partitions)
+        self.segment_bytes = segment_bytes
+        self.index_interval_bytes = index_interval_bytes
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.auto_offset_reset = auto_offset_reset
+        self.consumer_max_records = consumer_max_records
+        self.consumer_concurrency = consumer_concurrency
+        self.consumer_max_in_flight = consumer_max_in_flight
+        self.consumer_commit_interval_ms = consumer_commit_interval_ms
+        self.codecs = codecs or CodecRegistry()
+        self._topics: Dict[str, List[_Partition]] = {}
+        self._dirty: Set[_Partition] = set()
+        self._sync_waiters: List[asyncio.Future] = []
+        self._sync_task: asyncio.Task | None = None
+        self._interval_task: asyncio.Task | None = None
+        self._record_waiters: Dict[str, List[asyncio.Future]] = {}
+        self._consumers: List[BatchConsumer] = []
+        self._round_robin = 0
+        self._started = False
+
+    async def start(self) -> None:
+        if self._started:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self.fsync == "interval":
+            self._interval_task = asyncio.create_task(self._sync_periodically())
+        self._started = True
+
+    async def stop(self) -> None:
+        await asyncio.gather(*[consumer.stop() for consumer in self._consumers])
+        self._consumers.clear()
+        if self._interval_task is not None:
+            self._interval_task.cancel()
+            await asyncio.gather(self._interval_task, return_exceptions=True)
+            self._interval_task = None
+        if self._sync_task is not None:
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+        for partitions in self._topics.values():
+            for partition in partitions:
+                partition.close()
+        self._topics.clear()
+        self._dirty.clear()
+        self._started = False
+
+    def _partitions(self, topic: str) -> List[_Partition]:
+        partitions = self._topics.get(topic)
+        if partitions is None:
+            partitions = self._topics[topic] = [
+                _Partition(
+                    topic,
+                    number,
+                    self.root / f"{topic}-{number}",
+                    segment_bytes=self.segment_bytes,
+                    index_interval=self.index_interval_bytes,
+                    retention_bytes=self.retention_bytes,
+                    retention_seconds=self.retention_seconds,
+                )
+                for number in range(self.partitions)
+            ]
+        return partitions
+
+    def _partition_for(self, key: bytes | None) -> int:
+        if key is None:
+            self._round_robin += 1
+            return self._round_robin % self.partitions
+        return partition_for(key, self.partitions)
+
+    async def publish(self, topic: str, key: str | None, value: Dict[str, Any]) -> PublishResult:
+        (result,) = await self.publish_many(topic, [(key, value)])
+        return result
+
+    @instrument_publish("log")
+    async def publish_many(
+        self, topic: str, messages: Sequence[Message], *, return_exceptions: bool = False
+    ) -> List[PublishResult | BaseException]:
+        if not self._started:
+            await self.start()
+        codec = self.codecs.for_topic(topic)
+        content_type = codec.name.encode("ascii")
+        partitions = self._partitions(topic)
+        timestamp_ms = int(time.time() * 1000)
+        results: List[PublishResult | BaseException] = []
+        for key, value in messages:
+            try:
+                encoded_key = key.encode("utf-8") if key else None
+                number = self._partition_for(encoded_key)
+                partition = partitions[number]
+                offset = partition.append(
+                    encoded_key, content_type, codec.encode(value), timestamp_ms
+                )
+            except Exception as exc:
+                if not return_exceptions:
+                    raise
+                results.append(exc)
+                continue
+            self._dirty.add(partition)
+            results.append(
+                PublishResult(
+                    topic=topic,
+                    partition=number,
+                    offset=offset,
+                    headers={CONTENT_TYPE_HEADER: codec.name},
+                )
+            )
+        self._notify(topic)
+        if self.fsync == "always":
+            await self._sync()
+        return results
+
+    async def subscribe(
+        self,
+        topic: str,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        *,
+        group_id: str | None = None,
+    ) -> None:
+        if not self._started:
+            await self.start()
+        group_id = group_id or "catalog-consumer"
+        consumer = BatchConsumer(
+            _LogConsumer(self, topic, group_id),
+            handler,
+            self.codecs,
+            topic=topic,
+            group_id=group_id,
+            max_records=self.consumer_max_records,
+            concurrency=self.consumer_concurrency,
+            max_in_flight=self.consumer_max_in_flight,
+            commit_interval_ms=self.consumer_commit_interval_ms,
+        )
+        await consumer.start()
+        self._consumers.append(consumer)
+
+    def consumer_metrics(self) -> List[ConsumerMetrics]:
+        return [consumer.metrics for consumer in self._consumers]
+
+    def offsets(self, topic: str, partition: int = 0) -> Tuple[int, int]:
+        """``(first retained offset, next offset)`` of a partition."""
+
+        target = self._partitions(topic)[partition]
+        return target.first_offset, target.next_offset
+
+    # -- notifications and durability --------------------------------------------------
+
+    def _notify(self, topic: str) -> None:
+        for waiter in self._record_waiters.pop(topic, []):
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def _wait_for_records(self, topic: str, timeout: float) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        waiters = self._record_waiters.setdefault(topic, [])
+        waiters.append(waiter)
+        try:
+            # ``asyncio.wait`` rather than ``wait_for``: the latter can swallow
+            # a cancellation that races with the waiter being resolved.
+            await asyncio.wait([waiter], timeout=timeout)
+        finally:
+            if waiter in waiters:
+                waiters.remove(waiter)
+
+    async def _sync(self) -> None:
+        """Wait for a flush that covers everything appended so far.
+
+        Callers arriving while a flush runs are served together by the next
+        one, so concurrent publishers share the cost of ``msync``/``fsync``.
+        """
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._sync_waiters.append(waiter)
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._flush_waiters())
+        await waiter
+
+    async def _flush_waiters(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._sync_waiters:
+            waiters, self._sync_waiters = self._sync_waiters, []
+            dirty, self._dirty = self._dirty, set()
+            try:
+                await loop.run_in_executor(None, _sync_all, dirty)
+            except Exception as exc:  # pragma: no cover - protective
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(exc)
+                continue
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    async def _sync_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            if self._dirty:
+                try:
+                    await self._sync()
+                except Exception:  # pragma: no cover - protective
+                    logger.exception("Failed to flush log bus segments")
+
+
+def _sync_all(partitions: Set[_Partition]) -> None:
+    for partition in partitions:
+        partition.sync()
+
+
+__all__ = ["FSYNC_POLICIES", "LogEntry", "LogMessageBus"]
@@ -1,13 +1,64 @@
 from __future__ import annotations
 
 import asyncio
+import functools
+import itertools
 import logging
-from collections import defaultdict
+import pickle
+import struct
+import tempfile
+import time
+from collections import defaultdict, deque
 from dataclasses import dataclass
-from typing import Any, Awaitable, Callable, Dict, List, Protocol
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Protocol, Sequence, Tuple
+
+from ...core.metrics import REGISTRY
+from .codecs import CONTENT_TYPE_HEADER, CodecRegistry
+from .consumer import BatchConsumer, ConsumerMetrics, rebalance_listener
 
 logger = logging.getLogger(__name__)
 
+Message = Tuple[str | None, Dict[str, Any]]
+ProducerFactory = Callable[..., Any]
+ConsumerFactory = Callable[..., Any]
+
+PUBLISH_SECONDS = REGISTRY.histogram(
+    "nscs_bus_publish_seconds",
+    "Duration of publish_many calls until every message is acknowledged.",
+    ["driver", "topic"],
+)
+MESSAGES_TOTAL = REGISTRY.counter(
+    "nscs_bus_messages_total",
+    "Messages published to the bus.",
+    ["driver", "topic", "result"],
+)
+
+
+def instrument_publish(driver: str):
+    """Record latency and outcomes of a bus's ``publish_many`` method."""
+
+    def decorate(publish_many):
+        @functools.wraps(publish_many)
+        async def wrapper(self, topic: str, messages: Sequence[Message], **options: Any):
+            started = time.perf_counter()
+            try:
+                results = await publish_many(self, topic, messages, **options)
+            except Exception:
+                MESSAGES_TOTAL.labels(driver, topic, "failed").inc(len(messages))
+                raise
+            finally:
+                PUBLISH_SECONDS.labels(driver, topic).observe(time.perf_counter() - started)
+            failed = sum(1 for result in results if isinstance(result, BaseException))
+            MESSAGES_TOTAL.labels(driver, topic, "published").inc(len(results) - failed)
+            if failed:
+                MESSAGES_TOTAL.labels(driver, topic, "failed").inc(failed)
+            return results
+
+        return wrapper
+
+    return decorate
+
 
 @dataclass
 class PublishResult:
@@ -28,6 +79,16 @@ class MessageBus(Protocol):
 
     async def publish(self, topic: str, key: str | None, value: Dict[str, Any]) -> PublishResult: ...
 
+    async def publish_many(
+        self, topic: str, messages: Sequence[Message], *, return_exceptions: bool = False
+    ) -> List[PublishResult | BaseException]:
+        """Publish ``(key, value)`` pairs, returning results in input order.
+
+        With ``return_exceptions`` a failed message yields its exception in
+        its slot instead of failing the whole call.
+        """
+        ...
+
     async def subscribe(
         self,
         topic: str,
@@ -37,34 +98,279 @@ class MessageBus(Protocol):
     ) -> None: ...
 
 
+OVERFLOW_POLICIES = ("block", "drop-oldest", "spill")
+_SPILL_LENGTH = struct.Struct(">I")
+
+
+@dataclass
+class LogRecord:
+    offset: int
+    key: str | None
+    value: Dict[str, Any]
+
+
+@dataclass
+class SubscriberStats:
+    topic: str
+    group_id: str | None
+    position: int
+    queued: int
+    spilled_pending: int
+    delivered: int
+    dropped: int
+    spilled: int
+    failed: int
+
+
+class _TopicLog:
+    """Ring buffer of the most recent ``retention`` records of a topic."""
+
+    def __init__(self, retention: int) -> None:
+        self.records: Deque[LogRecord] = deque(maxlen=retention)
+        self.next_offset = 0
+
+    @property
+    def first_offset(self) -> int:
+        return self.records[0].offset if self.records else self.next_offset
+
+    def append(self, key: str | None, value: Dict[str, Any]) -> LogRecord:
+        record = LogRecord(self.next_offset, key, value)
+        self.records.append(record)
+        self.next_offset += 1
+        return record
+
+    def read(self, offset: int, limit: int) -> List[LogRecord]:
+        start = max(offset, self.first_offset) - self.first_offset
+        return list(itertools.islice(self.records, start, start + limit))
+
+
+class _SpillFile:
+    """Length-prefixed pickles in an anonymous temporary file, read back in order."""
+
+    def __init__(self, directory: Path | None) -> None:
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._read_at = 0
+        self._write_at = 0
+        self.pending = 0
+
+    def append(self, record: LogRecord) -> None:
+        data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.seek(self._write_at)
+        self._file.write(_SPILL_LENGTH.pack(len(data)) + data)
+        self._write_at = self._file.tell()
+        self.pending += 1
+
+    def pop(self) -> LogRecord:
+        self._file.seek(self._read_at)
+        (length,) = _SPILL_LENGTH.unpack(self._file.read(_SPILL_LENGTH.size))
+        record = pickle.loads(self._file.read(length))
+        self._read_at = self._file.tell()
+        self.pending -= 1
+        if not self.pending:
+            self._file.seek(0)
+            self._file.truncate()
+            self._read_at = self._write_at = 0
+        return record
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _Subscriber:
+    """Bounded queue plus worker task delivering one topic to one handler."""
+
+    def __init__(
+        self,
+        topic: str,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        *,
+        group_id: str | None,
+        log: _TopicLog,
+        start_offset: int,
+        queue_size: int,
+        overflow: str,
+        spill_dir: Path | None,
+        commit: Callable[[int], None],
+    ) -> None:
+        self.topic = topic
+        self.handler = handler
+        self.group_id = group_id
+        self.log = log
+        self.overflow = overflow
+        self.spill_dir = spill_dir
+        self.commit = commit
+        self.queue: "asyncio.Queue[LogRecord]" = asyncio.Queue(maxsize=queue_size)
+        self.spill: _SpillFile | None = None
+        self.position = start_offset
+        # Records before ``live_from`` are replayed from the log; later ones
+        # arrive through ``offer``.
+        self.live_from = log.next_offset
+        self.idle = asyncio.Event()
+        self.delivered = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed = 0
+        self.task = asyncio.create_task(self._run())
+
+    @property
+    def _spill_pending(self) -> int:
+        return self.spill.pending if self.spill is not None else 0
+
+    async def offer(self, record: LogRecord) -> None:
+        self.idle.clear()
+        if self.overflow == "block":
+            await self.queue.put(record)
+            return
+        if self._spill_pending or self.queue.full():
+            if self.overflow == "spill":
+                # Once spilling, everything goes to disk until the backlog
+                # is read back, which keeps delivery in offset order.
+                if self.spill is None:
+                    self.spill = _SpillFile(self.spill_dir)
+                self.spill.append(record)
+                self.spilled += 1
+                return
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.dropped += 1
+        self.queue.put_nowait(record)
+
+    async def _run(self) -> None:
+        while self.position < self.live_from:
+            batch = self.log.read(self.position, 256)
+            if not batch:
+                break
+            if batch[0].offset > self.position:
+                self.dropped += batch[0].offset - self.position
+            for record in batch:
+                if record.offset >= self.live_from:
+                    break
+                await self._deliver(record)
+        while True:
+            if self.queue.empty() and self._spill_pending:
+                await self._deliver(self.spill.pop())
+                continue
+            if self.queue.empty():
+                self.idle.set()
+            record = await self.queue.get()
+            try:
+                await self._deliver(record)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, record: LogRecord) -> None:
+        try:
+            await self.handler(record.value)
+        except Exception:
+            self.failed += 1
+            logger.exception("Subscriber of %s failed on offset %s", self.topic, record.offset)
+        self.delivered += 1
+        self.position = record.offset + 1
+        self.commit(self.position)
+
+    async def drain(self) -> None:
+        if not self.task.done():
+            await self.idle.wait()
+
+    async def close(self) -> None:
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        if self.spill is not None:
+            self.spill.close()
+
+    def stats(self) -> SubscriberStats:
+        return SubscriberStats(
+            topic=self.topic,
+            group_id=self.group_id,
+            position=self.position,
+            queued=self.queue.qsize(),
+            spilled_pending=self._spill_pending,
+            delivered=self.delivered,
+            dropped=self.dropped,
+            spilled=self.spilled,
+            failed=self.failed,
+        )
+
+
 class InMemoryMessageBus:
-    """Fallback message bus used for local development and testing."""
+    """Single-process message bus used for local development and testing.
+
+    Each topic keeps its last ``retention`` records in a ring buffer with
+    Kafka-style offsets. Every subscriber owns a queue of ``queue_size``
+    records drained by its own worker task, so a slow handler never runs
+    inside ``publish``. When a queue is full, ``overflow`` decides what
+    happens: ``block`` makes the publisher wait for room, ``drop-oldest``
+    discards the oldest queued record and ``spill`` appends to a temporary
+    file under ``spill_dir`` that the worker reads back in order.
+
+    Subscribers start at the end of the topic, at the offset their
+    ``group_id`` last reached, or at ``from_offset`` to replay retained
+    records first. Handler exceptions are logged and counted, not raised.
+    """
 
-    def __init__(self) -> None:
-        self._topics: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
-        self._subscribers: Dict[str, List[Callable[[Dict[str, Any]], Awaitable[None]]]] = defaultdict(list)
-        self._lock = asyncio.Lock()
+    def __init__(
+        self,
+        *,
+        retention: int = 10_000,
+        queue_size: int = 1_000,
+        overflow: str = "block",
+        spill_dir: Path | None = None,
+    ) -> None:
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unsupported overflow policy: {overflow}")
+        if retention <= 0 or queue_size <= 0:
+            raise ValueError("retention and queue_size must be positive")
+        self.retention = retention
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.spill_dir = spill_dir
+        self._topics: Dict[str, _TopicLog] = {}
+        self._subscribers: Dict[str, List[_Subscriber]] = defaultdict(list)
+        self._group_offsets: Dict[Tuple[str, str], int] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
         self._started = False
 
     async def start(self) -> None:  # pragma: no cover - trivial
         self._started = True
 
-    async def stop(self) -> None:  # pragma: no cover - trivial
+    async def stop(self) -> None:
+        subscribers = [sub for subs in self._subscribers.values() for sub in subs]
+        await asyncio.gather(*[subscriber.close() for subscriber in subscribers])
         self._topics.clear()
         self._subscribers.clear()
         self._started = False
 
+    def _log(self, topic: str) -> _TopicLog:
+        log = self._topics.get(topic)
+        if log is None:
+            log = self._topics[topic] = _TopicLog(self.retention)
+        return log
+
     async def publish(self, topic: str, key: str | None, value: Dict[str, Any]) -> PublishResult:
+        (result,) = await self.publish_many(topic, [(key, value)])
+        return result
+
+    @instrument_publish("memory")
+    async def publish_many(
+        self, topic: str, messages: Sequence[Message], *, return_exceptions: bool = False
+    ) -> List[PublishResult | BaseException]:
         if not self._started:
             await self.start()
-        async with self._lock:
-            messages = self._topics[topic]
-            messages.append({"key": key, "value": value})
-            offset = len(messages) - 1
-        await asyncio.gather(
-            *[subscriber(value) for subscriber in list(self._subscribers.get(topic, []))]
-        )
-        return PublishResult(topic=topic, partition=0, offset=offset)
+        # The topic lock keeps offsets and per-subscriber delivery order
+        # aligned when a ``block`` subscriber makes publishers wait. It is
+        # per topic so handlers can publish downstream while a publisher of
+        # their own topic is waiting on them.
+        async with self._locks[topic]:
+            log = self._log(topic)
+            records = [log.append(key, value) for key, value in messages]
+            for subscriber in list(self._subscribers.get(topic, [])):
+                for record in records:
+                    await subscriber.offer(record)
+        return [
+            PublishResult(topic=topic, partition=0, offset=record.offset) for record in records
+        ]
 
     async def subscribe(
         self,
@@ -72,15 +378,95 @@ class InMemoryMessageBus:
         handler: Callable[[Dict[str, Any]], Awaitable[None]],
         *,
         group_id: str | None = None,
+        from_offset: int | None = None,
     ) -> None:
         if not self._started:
             await self.start()
-        async with self._lock:
-            self._subscribers[topic].append(handler)
+        async with self._locks[topic]:
+            log = self._log(topic)
+            if from_offset is None:
+                from_offset = log.next_offset
+                if group_id is not None:
+                    from_offset = self._group_offsets.get((topic, group_id), from_offset)
+
+            def _commit(position: int) -> None:
+                if group_id is not None:
+                    self._group_offsets[(topic, group_id)] = position
+
+            self._subscribers[topic].append(
+                _Subscriber(
+                    topic,
+                    handler,
+                    group_id=group_id,
+                    log=log,
+                    start_offset=max(0, from_offset),
+                    queue_size=self.queue_size,
+                    overflow=self.overflow,
+                    spill_dir=self.spill_dir,
+                    commit=_commit,
+                )
+            )
+
+    def read(self, topic: str, offset: int, max_records: int = 500) -> List[LogRecord]:
+        """Retained records from ``offset`` on; trimmed offsets are skipped."""
+
+        log = self._topics.get(topic)
+        return log.read(offset, max_records) if log is not None else []
+
+    def offsets(self, topic: str) -> Tuple[int, int]:
+        """``(first retained offset, next offset)`` of a topic."""
+
+        log = self._topics.get(topic)
+        return (log.first_offset, log.next_offset) if log is not None else (0, 0)
+
+    def committed(self, topic: str, group_id: str) -> int | None:
+        return self._group_offsets.get((topic, group_id))
+
+    async def drain(self) -> None:
+        """Wait until every subscriber has handled everything offered to it."""
+
+        subscribers = [sub for subs in self._subscribers.values() for sub in subs]
+        await asyncio.gather(*[subscriber.drain() for subscriber in subscribers])
+
+    def stats(self) -> List[SubscriberStats]:
+        return [sub.stats() for subs in self._subscribers.values() for sub in subs]
+
+
+def _default_producer_factory(**config: Any) -> Any:
+    try:
+        from aiokafka import AIOKafkaProducer  # type: ignore
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError("aiokafka is required for KafkaMessageBus") from exc
+    return AIOKafkaProducer(**config)
+
+
+def _default_consumer_factory(*topics: str, **config: Any) -> Any:
+    try:
+        from aiokafka import AIOKafkaConsumer  # type: ignore
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise RuntimeError("aiokafka is required for KafkaMessageBus consumers") from exc
+    return AIOKafkaConsumer(*topics, **config)
 
 
 class KafkaMessageBus:
-    """Kafka-backed implementation that can be enabled in production deployments."""
+    """Kafka-backed implementation that can be enabled in production deployments.
+
+    Messages are handed to the producer without waiting for the broker, so
+    concurrent publishes share batches bounded by ``linger_ms`` and
+    ``max_batch_size`` and compressed with ``compression_type``. Each call
+    still awaits its own delivery future to report the partition and offset.
+    ``producer_factory`` builds the producer from the aiokafka keyword
+    configuration and defaults to ``AIOKafkaProducer``.
+
+    Values are encoded with the codec ``codecs`` assigns to the topic and
+    tagged with a ``content-type`` header; consumers decode each record
+    with the codec its header names, falling back to JSON for untagged
+    records.
+
+    ``subscribe`` runs a :class:`~.consumer.BatchConsumer`: batched
+    fetches, up to ``consumer_concurrency`` handlers at once with per-key
+    ordering, and background commits of the processed prefix.
+    """
 
     def __init__(
         self,
@@ -90,24 +476,48 @@ class KafkaMessageBus:
         sasl_mechanism: str | None = None,
         sasl_username: str | None = None,
         sasl_password: str | None = None,
+        linger_ms: int = 5,
+        max_batch_size: int = 65536,
+        compression_type: str | None = None,
+        producer_factory: ProducerFactory | None = None,
+        consumer_factory: ConsumerFactory | None = None,
+        consumer_max_records: int = 500,
+        consumer_concurrency: int = 16,
+        consumer_max_in_flight: int = 2000,
+        consumer_commit_interval_ms: int = 200,
+        consumer_fetch_bytes: int = 1 << 20,
+        codecs: CodecRegistry | None = None,
     ) -> None:
+        if compression_type not in (None, "gzip", "snappy", "lz4", "zstd"):
+            raise ValueError(f"Unsupported Kafka compression type: {compression_type}")
         self.bootstrap_servers = bootstrap_servers
         self.security_protocol = security_protocol
         self.sasl_mechanism = sasl_mechanism
         self.sasl_username = sasl_username
         self.sasl_password = sasl_password
+        self.linger_ms = linger_ms
+        self.max_batch_size = max_batch_size
+        self.compression_type = compression_type
+        self.producer_factory = producer_factory or _default_producer_factory
+        self.consumer_factory = consumer_factory or _default_consumer_factory
+        self.consumer_max_records = consumer_max_records
+        self.consumer_concurrency = consumer_concurrency
+        self.consumer_max_in_flight = consumer_max_in_flight
+        self.consumer_commit_interval_ms = consumer_commit_interval_ms
+        self.consumer_fetch_bytes = consumer_fetch_bytes
+        self.codecs = codecs or CodecRegistry()
         self._producer = None
-        self._consumer_tasks: List[asyncio.Task] = []
+        self._consumers: List[BatchConsumer] = []
 
     async def start(self) -> None:
         if self._producer is not None:
             return
-        try:
-            from aiokafka import AIOKafkaProducer  # type: ignore
-        except ImportError as exc:  # pragma: no cover - optional dependency
-            raise RuntimeError("aiokafka is required for KafkaMessageBus") from exc
-
-        config: Dict[str, Any] = {"bootstrap_servers": self.bootstrap_servers}
+        config: Dict[str, Any] = {
+            "bootstrap_servers": self.bootstrap_servers,
+            "linger_ms": self.linger_ms,
+            "max_batch_size": self.max_batch_size,
+            "compression_type": self.compression_type,
+        }
         if self.security_protocol:
             config["security_protocol"] = self.security_protocol
         if self.sasl_mechanism:
@@ -117,29 +527,65 @@ class KafkaMessageBus:
         if self.sasl_password:
             config["sasl_plain_password"] = self.sasl_password
 
-        self._producer = AIOKafkaProducer(**config)
+        self._producer = self.producer_factory(**config)
         await self._producer.start()
 
     async def stop(self) -> None:
         if self._producer:
             await self._producer.stop()
             self._producer = None
-        for task in self._consumer_tasks:
-            task.cancel()
-        self._consumer_tasks.clear()
+        await asyncio.gather(*[consumer.stop() for consumer in self._consumers])
+        self._consumers.clear()
 
     async def publish(self, topic: str, key: str | None, value: Dict[str, Any]) -> PublishResult:
+        (result,) = await self.publish_many(topic, [(key, value)])
+        return result
+
+    @instrument_publish("kafka")
+    async def publish_many(
+        self, topic: str, messages: Sequence[Message], *, return_exceptions: bool = False
+    ) -> List[PublishResult | BaseException]:
+        """Enqueue every message first, then collect the delivery reports."""
+
+        deliveries: List[asyncio.Future | BaseException] = []
+        for key, value in messages:
+            try:
+                deliveries.append(await self._send(topic, key, value))
+            except Exception as exc:
+                if not return_exceptions:
+                    raise
+                deliveries.append(exc)
+
+        async def _collect(delivery: asyncio.Future | BaseException) -> PublishResult:
+            if isinstance(delivery, BaseException):
+                raise delivery
+            return self._result(topic, await delivery)
+
+        return await asyncio.gather(
+            *[_collect(delivery) for delivery in deliveries], return_exceptions=return_exceptions
+        )
+
+    async def _send(self, topic: str, key: str | None, value: Dict[str, Any]) -> asyncio.Future:
         if self._producer is None:
             await self.start()
         assert self._producer is not None  # for mypy
-        import json
-
-        future = await self._producer.send_and_wait(
+        codec = self.codecs.for_topic(topic)
+        # ``send`` returns once the record is in the accumulator; the future
+        # resolves when its batch is acknowledged.
+        return await self._producer.send(
             topic,
-            json.dumps(value).encode("utf-8"),
+            codec.encode(value),
             key=key.encode("utf-8") if key else None,
+            headers=[(CONTENT_TYPE_HEADER, codec.name.encode("ascii"))],
+        )
+
+    def _result(self, topic: str, metadata: Any) -> PublishResult:
+        return PublishResult(
+            topic=topic,
+            partition=metadata.partition,
+            offset=metadata.offset,
+            headers={CONTENT_TYPE_HEADER: self.codecs.for_topic(topic).name},
         )
-        return PublishResult(topic=topic, partition=future.partition, offset=future.offset)
 
     async def subscribe(
         self,
@@ -148,16 +594,13 @@ class KafkaMessageBus:
         *,
         group_id: str | None = None,
     ) -> None:
-        try:
-            from aiokafka import AIOKafkaConsumer  # type: ignore
-        except ImportError as exc:  # pragma: no cover - optional dependency
-            raise RuntimeError("aiokafka is required for KafkaMessageBus consumers") from exc
-
+        group_id = group_id or "catalog-consumer"
         config: Dict[str, Any] = {
             "bootstrap_servers": self.bootstrap_servers,
-            "group_id": group_id or "catalog-consumer",
+            "group_id": group_id,
             "enable_auto_commit": False,
             "auto_offset_reset": "latest",
+            "max_partition_fetch_bytes": self.consumer_fetch_bytes,
         }
         if self.security_protocol:
             config["security_protocol"] = self.security_protocol
@@ -168,30 +611,35 @@ class KafkaMessageBus:
         if self.sasl_password:
             config["sasl_plain_password"] = self.sasl_password
 
-        consumer = AIOKafkaConsumer(topic, **config)
+        kafka_consumer = self.consumer_factory(**config)
+        consumer = BatchConsumer(
+            kafka_consumer,
+            handler,
+            self.codecs,
+            topic=topic,
+            group_id=group_id,
+            max_records=self.consumer_max_records,
+            concurrency=self.consumer_concurrency,
+            max_in_flight=self.consumer_max_in_flight,
+            commit_interval_ms=self.consumer_commit_interval_ms,
+        )
+        # Subscribing with a listener lets revoked partitions commit their
+        # processed prefix and drop out of later commits.
+        kafka_consumer.subscribe([topic], listener=rebalance_listener(consumer))
         await consumer.start()
+        self._consumers.append(consumer)
 
-        async def _consume() -> None:
-            try:
-                import json
-
-                async for record in consumer:
-                    try:
-                        payload = json.loads(record.value.decode("utf-8"))
-                    except json.JSONDecodeError:
-                        logger.exception("Failed to decode Kafka message")
-                        continue
-                    await handler(payload)
-            finally:
-                await consumer.stop()
-
-        task = asyncio.create_task(_consume())
-        self._consumer_tasks.append(task)
+    def consumer_metrics(self) -> List[ConsumerMetrics]:
+        return [consumer.metrics for consumer in self._consumers]
 
 
 __all__ = [
+    "LogRecord",
     "MessageBus",
+    "OVERFLOW_POLICIES",
     "PublishResult",
     "InMemoryMessageBus",
     "KafkaMessageBus",
+    "SubscriberStats",
+    "instrument_publish",
 ]
@@ -0,0 +1,108 @@
+"""Partition keys and the key-to-partition mapping shared by every bus driver."""
+from __future__ import annotations
+
+import math
+from datetime import datetime
+from typing import Any, Callable, Mapping, Tuple
+
+PARTITION_KEY_STRATEGIES = ("station", "cell", "window")
+Locator = Callable[[str | None, str], Tuple[float, float] | None]
+
+_MASK = 0xFFFFFFFF
+_M = 0x5BD1E995
+
+
+def murmur2(data: bytes) -> int:
+    """Kafka's murmur2 hash as a signed 32-bit integer.
+
+    Matches ``org.apache.kafka.common.utils.Utils.murmur2``, which the Java
+    client and aiokafka's default partitioner use, so every driver sends a
+    key to the same partition a Kafka producer would.
+    """
+
+    length = len(data)
+    h = (0x9747B28C ^ length) & _MASK
+    tail = length & ~3
+    for index in range(0, tail, 4):
+        k = int.from_bytes(data[index : index + 4], "little")
+        k = (k * _M) & _MASK
+        k ^= k >> 24
+        k = (k * _M) & _MASK
+        h = ((h * _M) & _MASK) ^ k
+    remaining = length & 3
+    if remaining == 3:
+        h ^= data[tail + 2] << 16
+    if remaining >= 2:
+        h ^= data[tail + 1] << 8
+    if remaining >= 1:
+        h ^= data[tail]
+        h = (h * _M) & _MASK
+    h ^= h >> 13
+    h = (h * _M) & _MASK
+    h ^= h >> 15
+    return h - (1 << 32) if h & 0x80000000 else h
+
+
+def partition_for(key: bytes, partitions: int) -> int:
+    """Kafka's default partition for a non-null key."""
+
+    return (murmur2(key) & 0x7FFFFFFF) % partitions
+
+
+def station_partition_key(network: str | None, station: str) -> str:
+    return f"{network or ''}.{station}"
+
+
+def message_station_key(message: Mapping[str, Any]) -> str:
+    """Station key of a bus message carrying ``network`` and ``station_code``."""
+
+    return station_partition_key(message.get("network"), message.get("station_code") or "")
+
+
+class PartitionKeyBuilder:
+    """Builds the bus key of a waveform window.
+
+    ``station`` keys every window of a station alike, so a station's data
+    stays on one partition in order. ``cell`` groups stations by a
+    ``cell_degrees`` latitude/longitude grid cell, keeping neighbours that an
+    associator looks at together on one consumer; stations ``locate`` cannot
+    place fall back to their station key. ``window`` is the historical
+    per-window key, which spreads load evenly but gives up ordering.
+    """
+
+    def __init__(
+        self,
+        strategy: str = "station",
+        *,
+        cell_degrees: float = 1.0,
+        locate: Locator | None = None,
+    ) -> None:
+        if strategy not in PARTITION_KEY_STRATEGIES:
+            raise ValueError(f"Unsupported partition key strategy: {strategy}")
+        if strategy == "cell" and cell_degrees <= 0:
+            raise ValueError("cell_degrees must be positive")
+        self.strategy = strategy
+        self.cell_degrees = cell_degrees
+        self.locate = locate
+
+    def __call__(self, network: str | None, station: str, start_time: datetime) -> str:
+        if self.strategy == "window":
+            return f"{network or 'NA'}:{station}:{start_time.isoformat()}"
+        if self.strategy == "cell" and self.locate is not None:
+            coordinates = self.locate(network, station)
+            if coordinates is not None:
+                latitude, longitude = coordinates
+                row = math.floor((latitude + 90) / self.cell_degrees)
+                column = math.floor((longitude + 180) / self.cell_degrees)
+                return f"cell:{self.cell_degrees:g}:{row}:{column}"
+        return station_partition_key(network, station)
+
+
+__all__ = [
+    "PARTITION_KEY_STRATEGIES",
+    "PartitionKeyBuilder",
+    "message_station_key",
+    "murmur2",
+    "partition_for",
+    "station_partition_key",
+]
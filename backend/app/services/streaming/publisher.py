@@ -2,10 +2,11 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Sequence
 
 from ..pipeline.context import WaveformPayload
 from .message_bus import MessageBus, PublishResult
+from .partitioning import PartitionKeyBuilder
 
 
 @dataclass
@@ -21,29 +22,58 @@ class WaveformStreamTopics:
 class WaveformStreamPublisher:
     """Publishes waveform metadata into the realtime streaming bus."""
 
-    def __init__(self, bus: MessageBus, topics: WaveformStreamTopics | None = None):
+    def __init__(
+        self,
+        bus: MessageBus,
+        topics: WaveformStreamTopics | None = None,
+        *,
+        partition_keys: PartitionKeyBuilder | None = None,
+    ):
         self.bus = bus
         self.topics = topics or WaveformStreamTopics()
+        self.partition_keys = partition_keys or PartitionKeyBuilder()
 
     async def publish_waveform(self, payload: WaveformPayload) -> PublishResult:
         record = self._build_payload(payload)
-        key = f"{payload.network or 'NA'}:{payload.station_code}:{payload.start_time.isoformat()}"
-        return await self.bus.publish(self.topics.raw_waveforms, key=key, value=record)
+        return await self.bus.publish(self.topics.raw_waveforms, key=self._key(payload), value=record)
+
+    async def publish_waveforms(
+        self, payloads: Sequence[WaveformPayload]
+    ) -> List[PublishResult | BaseException]:
+        """Publish a batch of windows, reporting failures per window."""
+
+        if not payloads:
+            return []
+        return await self.bus.publish_many(
+            self.topics.raw_waveforms,
+            [(self._key(payload), self._build_payload(payload)) for payload in payloads],
+            return_exceptions=True,
+        )
+
+    def _key(self, payload: WaveformPayload) -> str:
+        return self.partition_keys(payload.network, payload.station_code, payload.start_time)
 
     def _build_payload(self, payload: WaveformPayload) -> Dict[str, Any]:
+        # Timestamps stay datetimes (naive UTC); the topic's codec decides
+        # how they are written.
         window_seconds = (payload.end_time - payload.start_time).total_seconds()
         return {
             "station_code": payload.station_code,
             "network": payload.network,
-            "start_time": payload.start_time.isoformat(),
-            "end_time": payload.end_time.isoformat(),
+            "location": payload.location,
+            "channel": payload.channel,
+            "start_time": payload.start_time,
+            "end_time": payload.end_time,
             "sampling_rate": payload.sampling_rate,
             "sample_count": len(payload.samples) if hasattr(payload.samples, "__len__") else None,
             "window_seconds": window_seconds,
             "object_uri": payload.object_uri,
             "object_key": payload.storage_key,
+            "byte_offset": payload.byte_offset,
+            "byte_length": payload.byte_length,
+            "fingerprint": payload.fingerprint,
             "metadata": payload.metadata,
-            "ingested_at": datetime.utcnow().isoformat() + "Z",
+            "ingested_at": datetime.utcnow(),
         }
 
 
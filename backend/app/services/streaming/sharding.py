@@ -0,0 +1,91 @@
+"""Consumer-side sharding so each station is processed by one worker."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from .partitioning import message_station_key, partition_for
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+KeyFunction = Callable[[Dict[str, Any]], str]
+
+
+class ShardedHandler:
+    """Routes bus messages to ``shards`` workers by station.
+
+    ``factory(shard)`` builds one handler per shard, and every message of a
+    station goes to the same shard through the partitioner the producers
+    use, so per-station state (say a picker's buffer across window
+    boundaries) is only touched by one worker, in arrival order, without
+    locks. Use an instance as the ``handler`` of ``MessageBus.subscribe``:
+    a call returns once its message has been handled and re-raises the
+    handler's exception, so the consumer still commits processed offsets
+    only.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[int], Handler],
+        *,
+        shards: int = 4,
+        key: KeyFunction = message_station_key,
+        queue_size: int = 256,
+    ) -> None:
+        if shards <= 0:
+            raise ValueError("shards must be positive")
+        self.factory = factory
+        self.shards = shards
+        self.key = key
+        self.queue_size = queue_size
+        self.handled: List[int] = [0] * shards
+        self._queues: List[asyncio.Queue[Tuple[Dict[str, Any], asyncio.Future]]] = []
+        self._workers: List[asyncio.Task] = []
+
+    def shard_for(self, message: Dict[str, Any]) -> int:
+        return partition_for(self.key(message).encode("utf-8"), self.shards)
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        for shard in range(self.shards):
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+            self._queues.append(queue)
+            self._workers.append(asyncio.create_task(self._work(shard, queue)))
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for queue in self._queues:
+            while not queue.empty():
+                _, future = queue.get_nowait()
+                future.cancel()
+        self._workers.clear()
+        self._queues.clear()
+
+    async def __call__(self, message: Dict[str, Any]) -> None:
+        if not self._workers:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queues[self.shard_for(message)].put((message, future))
+        await future
+
+    async def _work(self, shard: int, queue: asyncio.Queue) -> None:
+        handler = self.factory(shard)
+        while True:
+            message, future = await queue.get()
+            try:
+                await handler(message)
+            except Exception as exc:
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                if not future.done():
+                    future.set_result(None)
+            self.handled[shard] += 1
+
+
+__all__ = ["ShardedHandler"]
@@ -0,0 +1,106 @@
+"""Decoding helpers for binary waveform ingest bodies."""
+from __future__ import annotations
+
+import io
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+import numpy as np
+from obspy import read as read_stream
+
+from ..pipeline.context import WaveformPayload
+
+MSEED_CONTENT_TYPES = frozenset({"application/vnd.fdsn.mseed", "application/x-mseed"})
+RAW_SAMPLE_DTYPES: Dict[str, np.dtype] = {
+    "int32": np.dtype("<i4"),
+    "float32": np.dtype("<f4"),
+}
+
+
+class WaveformDecodeError(ValueError):
+    """Raised when a binary ingest body cannot be decoded."""
+
+
+def decode_raw_samples(body: bytes, sample_format: str) -> np.ndarray:
+    """Interpret ``body`` as little-endian samples without copying it.
+
+    The returned array is a read-only view over ``body``.
+    """
+
+    dtype = RAW_SAMPLE_DTYPES.get(sample_format.lower())
+    if dtype is None:
+        raise WaveformDecodeError(f"Unsupported sample format: {sample_format}")
+    if not body:
+        raise WaveformDecodeError("Request body is empty")
+    if len(body) % dtype.itemsize:
+        raise WaveformDecodeError(
+            f"Body length {len(body)} is not a multiple of the {sample_format} sample size"
+        )
+    return np.frombuffer(body, dtype=dtype)
+
+
+def build_raw_payload(
+    body: bytes,
+    *,
+    sample_format: str,
+    station_code: str,
+    network: str | None,
+    channel: str | None = None,
+    location: str | None = None,
+    sampling_rate: float,
+    start_time: datetime,
+    metadata: Dict[str, Any] | None = None,
+) -> WaveformPayload:
+    if sampling_rate <= 0:
+        raise WaveformDecodeError("Sampling rate must be positive")
+    samples = decode_raw_samples(body, sample_format)
+    end_time = start_time + timedelta(seconds=(len(samples) - 1) / sampling_rate)
+    return WaveformPayload(
+        station_code=station_code,
+        network=network,
+        channel=channel,
+        location=location,
+        start_time=start_time,
+        end_time=end_time,
+        samples=samples,
+        sampling_rate=sampling_rate,
+        metadata=metadata or {},
+    )
+
+
+def build_mseed_payload(body: bytes, metadata: Dict[str, Any] | None = None) -> WaveformPayload:
+    """Decode MiniSEED records into a single continuous waveform payload."""
+
+    if not body:
+        raise WaveformDecodeError("Request body is empty")
+    try:
+        stream = read_stream(io.BytesIO(body), format="MSEED")
+    except Exception as exc:
+        raise WaveformDecodeError("Body is not valid MiniSEED") from exc
+    stream.merge()
+    if len(stream) != 1 or np.ma.isMaskedArray(stream[0].data):
+        raise WaveformDecodeError("MiniSEED body must contain a single continuous trace")
+
+    trace = stream[0]
+    stats = trace.stats
+    return WaveformPayload(
+        station_code=stats.station,
+        network=stats.network or None,
+        channel=stats.channel or None,
+        location=stats.location or None,
+        start_time=stats.starttime.datetime,
+        end_time=stats.endtime.datetime,
+        samples=trace.data,
+        sampling_rate=float(stats.sampling_rate),
+        metadata=metadata or {},
+    )
+
+
+__all__ = [
+    "MSEED_CONTENT_TYPES",
+    "RAW_SAMPLE_DTYPES",
+    "WaveformDecodeError",
+    "build_mseed_payload",
+    "build_raw_payload",
+    "decode_raw_samples",
+]
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import numpy as np
+from sqlmodel import Session, select
+
+from ...models.base import WaveformFile
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], Session]
+MessageHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def window_fingerprint(
+    network: str | None,
+    station_code: str,
+    channel: str | None,
+    location: str | None,
+    start_time: datetime,
+    samples: np.ndarray,
+) -> str:
+    """Content address of a waveform window.
+
+    ``samples`` should already be normalised by the storage encoding policy so
+    a window resent as JSON floats or as raw int32 hashes identically.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    header = f"{network or ''}.{station_code}.{location or ''}.{channel or ''}|{start_time.isoformat()}"
+    digest.update(header.encode("utf-8"))
+    digest.update(np.ascontiguousarray(samples).view(np.uint8))
+    return digest.hexdigest()
+
+
+@dataclass
+class IndexedWindow:
+    """What the index remembers about the first copy of a window."""
+
+    waveform_file: WaveformFile
+    stream_partition: int | None = None
+    stream_offset: int | None = None
+
+
+class WaveformDedupIndex:
+    """Idempotency index mapping window fingerprints to their stored copy.
+
+    Recent fingerprints are held in a bounded LRU so retried uploads are
+    answered from memory. Writers only consult the LRU (:meth:`cached`): a
+    window stored before it, or by another process, is caught by the unique
+    ``WaveformFile.fingerprint`` index at insert time and then resolved with
+    :meth:`lookup`. Stream offsets are only known for windows published by
+    this process.
+
+    Writers take a :meth:`claim` on a fingerprint before storing it and
+    :meth:`release` it once the row is committed (or the write failed), so
+    concurrent retries of one window in this process wait for the first
+    instead of storing it twice.
+    """
+
+    def __init__(self, session_factory: SessionFactory, *, capacity: int = 100_000) -> None:
+        self.session_factory = session_factory
+        self.capacity = max(1, capacity)
+        self._windows: "OrderedDict[str, IndexedWindow]" = OrderedDict()
+        self._delivered: Dict[str, "OrderedDict[str, None]"] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, fingerprint: str) -> Optional[IndexedWindow]:
+        """Memory-only lookup, cheap enough for every ingested window."""
+
+        with self._lock:
+            entry = self._windows.get(fingerprint)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._windows.move_to_end(fingerprint)
+            self.hits += 1
+            return entry
+
+    def lookup(self, fingerprint: str) -> Optional[IndexedWindow]:
+        """Like :meth:`cached`, falling back to the database on a miss."""
+
+        entry = self.cached(fingerprint)
+        if entry is not None:
+            return entry
+        with self.session_factory() as session:
+            waveform_file = session.exec(
+                select(WaveformFile).where(WaveformFile.fingerprint == fingerprint)
+            ).first()
+        if waveform_file is None:
+            return None
+        return self._insert(fingerprint, IndexedWindow(waveform_file))
+
+    def claim(self, fingerprint: str, *, wait: bool = True) -> bool:
+        """Reserve ``fingerprint`` for writing.
+
+        Returns ``True`` when the caller now owns the reservation and must
+        :meth:`release` it. Otherwise another writer holds it; with ``wait``
+        this blocks until that writer releases, and the caller should
+        check :meth:`cached` again before claiming anew.
+        """
+
+        with self._lock:
+            pending = self._inflight.get(fingerprint)
+            if pending is None:
+                self._inflight[fingerprint] = threading.Event()
+                return True
+        if wait:
+            pending.wait()
+        return False
+
+    def release(self, fingerprint: str) -> None:
+        with self._lock:
+            pending = self._inflight.pop(fingerprint, None)
+        if pending is not None:
+            pending.set()
+
+    def remember(self, fingerprint: str, waveform_file: WaveformFile) -> None:
+        self._insert(fingerprint, IndexedWindow(waveform_file))
+
+    def mark_published(
+        self, fingerprint: str, partition: int | None, offset: int | None
+    ) -> None:
+        with self._lock:
+            entry = self._windows.get(fingerprint)
+            if entry is not None and entry.stream_offset is None:
+                entry.stream_partition = partition
+                entry.stream_offset = offset
+
+    def first_delivery(self, fingerprint: str | None, group: str = "default") -> bool:
+        """Return ``True`` the first time ``group`` sees ``fingerprint``.
+
+        Memory only, so bus consumers can call it for every message; it
+        catches redeliveries and windows republished by other producers.
+        """
+
+        if not fingerprint:
+            return True
+        with self._lock:
+            seen = self._delivered.setdefault(group, OrderedDict())
+            if fingerprint in seen:
+                seen.move_to_end(fingerprint)
+                return False
+            seen[fingerprint] = None
+            if len(seen) > self.capacity:
+                seen.popitem(last=False)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def _insert(self, fingerprint: str, entry: IndexedWindow) -> IndexedWindow:
+        with self._lock:
+            existing = self._windows.get(fingerprint)
+            if existing is not None:
+                return existing
+            self._windows[fingerprint] = entry
+            if len(self._windows) > self.capacity:
+                self._windows.popitem(last=False)
+        return entry
+
+
+def deduplicating_handler(
+    index: WaveformDedupIndex, handler: MessageHandler, *, group: str = "default"
+) -> MessageHandler:
+    """Wrap a ``waveforms.raw`` handler so repeated windows are skipped."""
+
+    async def _handle(message: Dict[str, Any]) -> None:
+        if not index.first_delivery(message.get("fingerprint"), group):
+            logger.debug("Skipping duplicate window %s", message.get("fingerprint"))
+            return
+        await handler(message)
+
+    return _handle
+
+
+__all__ = [
+    "IndexedWindow",
+    "WaveformDedupIndex",
+    "deduplicating_handler",
+    "window_fingerprint",
+]
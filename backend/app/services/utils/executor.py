@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class PersistenceSaturatedError(RuntimeError):
+    """Raised when the persistence executor has no free in-flight slot."""
+
+
+@dataclass
+class PersistenceExecutorStats:
+    workers: int
+    max_inflight: int
+    inflight: int
+    completed: int
+    rejected: int
+    last_queue_wait_seconds: float
+
+
+class PersistenceExecutor:
+    """Bounded thread pool that keeps blocking waveform I/O off the event loop.
+
+    At most ``max_inflight`` calls may be queued or running at once. Further
+    submissions are rejected immediately with :class:`PersistenceSaturatedError`
+    so callers can shed load instead of piling up behind a slow disk.
+    """
+
+    def __init__(self, max_workers: int = 4, max_inflight: int = 64) -> None:
+        if max_workers < 1 or max_inflight < 1:
+            raise ValueError("max_workers and max_inflight must be positive")
+        self.max_workers = max_workers
+        self.max_inflight = max(max_inflight, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="persistence")
+        self._inflight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._last_queue_wait = 0.0
+
+    async def run(
+        self, func: Callable[..., T], *args, timings: Dict[str, float] | None = None
+    ) -> T:
+        """Run ``func(*args)`` on the pool, recording queue wait in ``timings``."""
+
+        if self._inflight >= self.max_inflight:
+            self._rejected += 1
+            raise PersistenceSaturatedError(
+                f"Persistence executor saturated ({self._inflight} requests in flight)"
+            )
+        self._inflight += 1
+        submitted = time.perf_counter()
+
+        def _call() -> tuple[T, float]:
+            queue_wait = time.perf_counter() - submitted
+            return func(*args), queue_wait
+
+        loop = asyncio.get_running_loop()
+        try:
+            result, queue_wait = await loop.run_in_executor(self._pool, _call)
+        finally:
+            self._inflight -= 1
+        self._completed += 1
+        self._last_queue_wait = queue_wait
+        if timings is not None:
+            timings["queue_wait"] = queue_wait
+        return result
+
+    def stats(self) -> PersistenceExecutorStats:
+        return PersistenceExecutorStats(
+            workers=self.max_workers,
+            max_inflight=self.max_inflight,
+            inflight=self._inflight,
+            completed=self._completed,
+            rejected=self._rejected,
+            last_queue_wait_seconds=self._last_queue_wait,
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+__all__ = ["PersistenceExecutor", "PersistenceExecutorStats", "PersistenceSaturatedError"]
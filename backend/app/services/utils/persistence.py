@@ -1,19 +1,73 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Callable, Optional
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
 
 import numpy as np
 from obspy import Stream, Trace, UTCDateTime
-from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
 
-from ...models.base import Event, Station, WaveformFile
+from ...core.metrics import REGISTRY
+from ...models.base import Event, WaveformFile
 from ...services.pipeline.context import ProcessingContext, WaveformPayload
+from ..storage.availability import AvailabilityIndex
 from ..storage.mseed import MSeedStorage
 from ..storage.object_store import ObjectStorageClient
+from ..storage.pyramid import EnvelopePyramid
+from ..storage.segment_cache import SegmentCache
+from .dedup import WaveformDedupIndex, window_fingerprint
+from .station_registry import StationRegistry
+
+logger = logging.getLogger(__name__)
 
 SessionFactory = Callable[[], Session]
 
+STAGE_SECONDS = REGISTRY.histogram(
+    "nscs_persistence_stage_seconds",
+    "Time spent in each step of persisting waveform windows.",
+    ["stage"],
+)
+WINDOWS_TOTAL = REGISTRY.counter(
+    "nscs_persistence_windows_total",
+    "Waveform windows handled by the persistence service.",
+    ["result"],
+)
+
+
+def _record(timings: Dict[str, float] | None, stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def _timed(timings: Dict[str, float] | None, stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(timings, stage, time.perf_counter() - started)
+
+
+class _WindowInFlight(Exception):
+    """Another writer holds the claim on a window's fingerprint."""
+
+
+@dataclass
+class _StoredWindow:
+    path: Path
+    offset: int
+    length: int
+    storage_key: str
+    checksum: str
+    object_uri: str | None
+
 
 class WaveformPersistenceService:
     """Handles conversion of raw waveform samples into stored MiniSEED files."""
@@ -23,54 +77,370 @@ class WaveformPersistenceService:
         storage: MSeedStorage,
         session_factory: SessionFactory,
         object_store: Optional[ObjectStorageClient] = None,
+        station_registry: Optional[StationRegistry] = None,
+        dedup_index: Optional[WaveformDedupIndex] = None,
+        segment_cache: Optional[SegmentCache] = None,
+        envelopes: Optional[EnvelopePyramid] = None,
+        availability: Optional[AvailabilityIndex] = None,
     ):
         self.storage = storage
         self.session_factory = session_factory
         self.object_store = object_store
+        self.stations = station_registry or StationRegistry(session_factory)
+        self.dedup = dedup_index
+        self.segment_cache = segment_cache
+        self.envelopes = envelopes
+        self.availability = availability
 
     def store_waveform(self, payload: WaveformPayload) -> WaveformFile:
-        samples = np.asarray(payload.samples, dtype="float32")
+        try:
+            waveform_file = self._store_one(payload)
+        except Exception:
+            WINDOWS_TOTAL.labels("failed").inc()
+            raise
+        WINDOWS_TOTAL.labels("duplicate" if payload.duplicate else "stored").inc()
+        return waveform_file
+
+    def _store_one(
+        self, payload: WaveformPayload, samples: np.ndarray | None = None
+    ) -> WaveformFile:
+        if samples is None:
+            samples = self.storage.prepare_samples(payload.samples)
+        duplicate = self._find_duplicate(payload, samples)
+        if duplicate is not None:
+            return duplicate
+        try:
+            stored = self._write_window(payload, samples)
+            try:
+                with _timed(payload.stage_timings, "db"), self.session_factory() as session:
+                    station_id = self.stations.resolve(payload.network, payload.station_code)
+                    waveform_file = self._build_record(payload, stored, station_id)
+                    session.add(waveform_file)
+                    session.commit()
+                    session.refresh(waveform_file)
+            except IntegrityError:
+                # The window was indexed before this process remembered it (or
+                # by another process); the bytes just appended stay
+                # unreferenced in the day file.
+                duplicate = self._stored_copy(payload)
+                if duplicate is None:
+                    raise
+                return duplicate
+            self._annotate(payload, stored)
+            self._remember(payload, waveform_file)
+        finally:
+            self._release(payload)
+        self._after_commit(payload)
+        return waveform_file
+
+    def store_waveforms(
+        self, payloads: Sequence[WaveformPayload]
+    ) -> List[WaveformFile | Exception]:
+        """Persist many windows with a single database transaction.
+
+        Files are written window by window; a window that fails to encode or
+        upload is reported as an exception in its slot without affecting the
+        others. All index rows are then inserted in one bulk flush. Windows
+        already stored, including repeats within the batch, are not written
+        again and resolve to the first copy. Windows another request is
+        storing at the same moment are resolved after this batch commits.
+        """
+
+        outcomes: List[WaveformFile | Exception | None] = [None] * len(payloads)
+        written: Dict[int, _StoredWindow] = {}
+        records: Dict[int, WaveformFile] = {}
+        first_seen: Dict[str, int] = {}
+        repeats: Dict[int, int] = {}
+        contended: Dict[int, np.ndarray] = {}
+        try:
+            for index, payload in enumerate(payloads):
+                samples = None
+                try:
+                    samples = self.storage.prepare_samples(payload.samples)
+                    # Never wait while holding claims: two batches waiting on
+                    # each other's windows would deadlock.
+                    duplicate = self._find_duplicate(payload, samples, wait=False)
+                    if duplicate is not None:
+                        outcomes[index] = duplicate
+                        continue
+                    if payload.fingerprint in first_seen:
+                        repeats[index] = first_seen[payload.fingerprint]
+                        continue
+                    if payload.fingerprint:
+                        first_seen[payload.fingerprint] = index
+                    written[index] = self._write_window(payload, samples)
+                except _WindowInFlight:
+                    contended[index] = samples
+                except Exception as exc:
+                    logger.warning("Failed to store waveform window %s: %s", index, exc)
+                    outcomes[index] = exc
+
+            if written:
+                records = {
+                    index: self._build_record(
+                        payloads[index],
+                        stored,
+                        self.stations.resolve(
+                            payloads[index].network, payloads[index].station_code
+                        ),
+                    )
+                    for index, stored in written.items()
+                }
+                try:
+                    with _timed(None, "db_batch"), self.session_factory() as session:
+                        session.expire_on_commit = False
+                        session.add_all(list(records.values()))
+                        session.commit()
+                    logger.debug("Stored %s waveform rows in one transaction", len(records))
+                except IntegrityError:
+                    logger.info("Batch raced another writer; inserting rows one by one")
+                    records = self._insert_each(payloads, records, outcomes)
+
+                for index, record in records.items():
+                    self._annotate(payloads[index], written[index])
+                    self._remember(payloads[index], record)
+                    outcomes[index] = record
+        finally:
+            for index in first_seen.values():
+                self._release(payloads[index])
+        for index in records:
+            self._after_commit(payloads[index])
+
+        for index, original in repeats.items():
+            outcomes[index] = outcomes[original]
+            if original in records:
+                self._annotate(payloads[index], written[original])
+                payloads[index].duplicate = True
+            elif isinstance(outcomes[original], WaveformFile):
+                self._mark_duplicate(payloads[index], outcomes[original])
+        for index, samples in contended.items():
+            try:
+                outcomes[index] = self._store_one(payloads[index], samples)
+            except Exception as exc:
+                logger.warning("Failed to store waveform window %s: %s", index, exc)
+                outcomes[index] = exc
+
+        failed = sum(1 for outcome in outcomes if isinstance(outcome, Exception))
+        duplicates = sum(1 for payload in payloads if payload.duplicate)
+        WINDOWS_TOTAL.labels("stored").inc(len(payloads) - failed - duplicates)
+        WINDOWS_TOTAL.labels("duplicate").inc(duplicates)
+        WINDOWS_TOTAL.labels("failed").inc(failed)
+        return outcomes  # type: ignore[return-value]
+
+    def _insert_each(
+        self,
+        payloads: Sequence[WaveformPayload],
+        records: Dict[int, WaveformFile],
+        outcomes: List[WaveformFile | Exception | None],
+    ) -> Dict[int, WaveformFile]:
+        """Insert ``records`` one transaction each after the bulk insert failed.
+
+        Rows whose window another writer indexed first resolve to that copy
+        in ``outcomes``; only the rows inserted here are returned.
+        """
+
+        inserted: Dict[int, WaveformFile] = {}
+        for index, record in records.items():
+            try:
+                with self.session_factory() as session:
+                    session.expire_on_commit = False
+                    session.add(record)
+                    session.commit()
+            except IntegrityError as exc:
+                duplicate = self._stored_copy(payloads[index])
+                outcomes[index] = duplicate if duplicate is not None else exc
+                continue
+            inserted[index] = record
+        return inserted
+
+    def mark_published(self, payload: WaveformPayload) -> None:
+        """Record where ``payload``'s window landed on the stream.
+
+        Only the first position is kept; duplicates are published (and marked)
+        when their original never reached the stream.
+        """
+
+        if self.dedup is not None and payload.fingerprint:
+            self.dedup.mark_published(
+                payload.fingerprint, payload.stream_partition, payload.stream_offset
+            )
+
+    def resolve_stream_position(self, payload: WaveformPayload) -> None:
+        """Copy the original stream position onto a duplicate ``payload``."""
+
+        if self.dedup is None or not payload.fingerprint:
+            return
+        entry = self.dedup.lookup(payload.fingerprint)
+        if entry is not None:
+            payload.stream_partition = entry.stream_partition
+            payload.stream_offset = entry.stream_offset
+
+    def _find_duplicate(
+        self, payload: WaveformPayload, samples: np.ndarray, *, wait: bool = True
+    ) -> WaveformFile | None:
+        """The remembered copy of ``payload``'s window, or ``None`` after claiming it.
+
+        ``samples`` are the window's prepared samples, hashed here so the
+        fingerprint does not depend on whether the window arrived as JSON
+        floats or raw integers. Only the in-memory index is consulted; older
+        copies surface as an ``IntegrityError`` on insert. If another writer
+        is storing the same window, wait for it and use its copy; without
+        ``wait`` raise :class:`_WindowInFlight` instead.
+        """
+
+        if self.dedup is None:
+            return None
+        with _timed(payload.stage_timings, "dedup"):
+            payload.samples = samples
+            payload.fingerprint = window_fingerprint(
+                payload.network,
+                payload.station_code,
+                payload.channel,
+                payload.location,
+                payload.start_time,
+                samples,
+            )
+            entry = self.dedup.cached(payload.fingerprint)
+            while entry is None:
+                if self.dedup.claim(payload.fingerprint, wait=wait):
+                    return None
+                if not wait:
+                    raise _WindowInFlight(payload.fingerprint)
+                entry = self.dedup.cached(payload.fingerprint)
+        self._mark_duplicate(payload, entry.waveform_file)
+        payload.stream_partition = entry.stream_partition
+        payload.stream_offset = entry.stream_offset
+        logger.debug(
+            "Window %s already stored as file %s", payload.fingerprint, entry.waveform_file.id
+        )
+        return entry.waveform_file
+
+    def _stored_copy(self, payload: WaveformPayload) -> WaveformFile | None:
+        """The copy another writer indexed for ``payload``'s window, if any."""
+
+        if self.dedup is None or not payload.fingerprint:
+            return None
+        entry = self.dedup.lookup(payload.fingerprint)
+        if entry is None:
+            return None
+        self._mark_duplicate(payload, entry.waveform_file)
+        return entry.waveform_file
+
+    def _mark_duplicate(self, payload: WaveformPayload, waveform_file: WaveformFile) -> None:
+        payload.duplicate = True
+        payload.file_path = Path(waveform_file.file_path)
+        payload.byte_offset = waveform_file.byte_offset
+        payload.byte_length = waveform_file.byte_length
+        try:
+            payload.storage_key = self.storage.build_object_key(payload.file_path)
+        except ValueError:  # pragma: no cover - archived under a previous root
+            payload.storage_key = None
+        payload.object_uri = waveform_file.object_uri or waveform_file.file_path
+
+    def _release(self, payload: WaveformPayload) -> None:
+        if self.dedup is not None and payload.fingerprint:
+            self.dedup.release(payload.fingerprint)
+
+    def _remember(self, payload: WaveformPayload, waveform_file: WaveformFile) -> None:
+        if self.dedup is not None and payload.fingerprint:
+            self.dedup.remember(payload.fingerprint, waveform_file)
+
+    def _after_commit(self, payload: WaveformPayload) -> None:
+        # Only after the index row is committed, so readers reloading a
+        # cache block are guaranteed to see the new window.
+        if self.availability is not None:
+            self.availability.add(
+                payload.network,
+                payload.station_code,
+                payload.location,
+                payload.channel,
+                payload.start_time,
+                payload.end_time,
+                payload.sampling_rate,
+            )
+        if self.segment_cache is not None:
+            self.segment_cache.invalidate(
+                payload.network,
+                payload.station_code,
+                payload.location,
+                payload.channel,
+                payload.start_time,
+                payload.end_time,
+            )
+
+    def _write_window(self, payload: WaveformPayload, samples: np.ndarray) -> _StoredWindow:
+        timings = payload.stage_timings
+        started = time.perf_counter()
+        if samples.size == 0:
+            raise ValueError("Waveform window contains no samples")
         stats = {
             "network": payload.network or "",
             "station": payload.station_code,
+            "location": payload.location or "",
+            "channel": payload.channel or "",
             "starttime": UTCDateTime(payload.start_time),
             "sampling_rate": payload.sampling_rate,
         }
         trace = Trace(data=samples, header=stats)
         stream = Stream(traces=[trace])
-        path = self.storage.save_stream(payload.station_code, payload.start_time, stream)
-        storage_key = self.storage.build_object_key(path)
-        checksum = self.storage.compute_checksum(path)
-        object_uri = None
-        if self.object_store:
-            object_uri = self.object_store.put_file(path, storage_key)
-
-        with self.session_factory() as session:
-            station = session.exec(
-                select(Station).where(Station.code == payload.station_code)
-            ).first()
-            if not station:
-                station = Station(code=payload.station_code, network=payload.network)
-                session.add(station)
-                session.commit()
-                session.refresh(station)
-
-            waveform_file = WaveformFile(
-                station_id=station.id,
-                start_time=payload.start_time,
-                end_time=payload.end_time,
-                file_path=str(path),
-                object_uri=object_uri,
-                checksum=checksum,
-            )
-            session.add(waveform_file)
-            session.commit()
-            session.refresh(waveform_file)
+        records = self.storage.encode_stream(stream)
+        # Hashing happens inside the encoder's writes; report it on its own.
+        elapsed = time.perf_counter() - started
+        _record(timings, "encode", elapsed - records.checksum_seconds)
+        _record(timings, "checksum", records.checksum_seconds)
+        with _timed(timings, "write"):
+            segment = self.storage.append_stream(stream, records.data)
+        if self.envelopes is not None:
+            with _timed(timings, "envelope"):
+                self.envelopes.update(
+                    payload.network,
+                    payload.station_code,
+                    payload.location,
+                    payload.channel,
+                    payload.start_time,
+                    payload.sampling_rate,
+                    samples,
+                )
+        storage_key = self.storage.build_object_key(segment.path)
+        # Day files reach the object store when the storage seals them (on day
+        # roll or at shutdown), so the URI is known up front and the window is
+        # addressed by its byte range.
+        object_uri = self.object_store.build_uri(storage_key) if self.object_store else None
+        return _StoredWindow(
+            path=segment.path,
+            offset=segment.offset,
+            length=segment.length,
+            storage_key=storage_key,
+            checksum=records.checksum,
+            object_uri=object_uri,
+        )
 
-        payload.file_path = path
-        payload.storage_key = storage_key
-        payload.object_uri = object_uri or str(path)
-        return waveform_file
+    @staticmethod
+    def _build_record(
+        payload: WaveformPayload, stored: _StoredWindow, station_id: int | None
+    ) -> WaveformFile:
+        return WaveformFile(
+            station_id=station_id,
+            channel=payload.channel,
+            location=payload.location,
+            start_time=payload.start_time,
+            end_time=payload.end_time,
+            sampling_rate=payload.sampling_rate,
+            file_path=str(stored.path),
+            byte_offset=stored.offset,
+            byte_length=stored.length,
+            object_uri=stored.object_uri,
+            checksum=stored.checksum,
+            fingerprint=payload.fingerprint,
+        )
+
+    @staticmethod
+    def _annotate(payload: WaveformPayload, stored: _StoredWindow) -> None:
+        payload.file_path = stored.path
+        payload.byte_offset = stored.offset
+        payload.byte_length = stored.length
+        payload.storage_key = stored.storage_key
+        payload.object_uri = stored.object_uri or str(stored.path)
 
 
 async def persist_processing_result(
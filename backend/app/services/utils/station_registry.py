@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Callable, Dict, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from ...models.base import Station
+
+logger = logging.getLogger(__name__)
+
+SessionFactory = Callable[[], Session]
+StationKey = Tuple[str, str]
+Coordinates = Tuple[float, float]
+
+
+def station_key(network: str | None, code: str) -> StationKey:
+    return (network or "", code)
+
+
+def _same_station(network: str | None, code: str):
+    # Matches the ``ux_station_network_code`` index: no network equals "".
+    return (func.coalesce(Station.network, "") == (network or "")) & (Station.code == code)
+
+
+class StationRegistry:
+    """Process-wide map of (network, station code) to ``Station.id``.
+
+    Lookups are served from memory. Unknown stations are inserted under the
+    unique ``(network, code)`` index, which treats a missing network as "";
+    if another process wins the race the existing row is re-read instead.
+    The station CRUD endpoints call :meth:`register` and :meth:`invalidate`
+    so the cache follows edits.
+    """
+
+    def __init__(self, session_factory: SessionFactory) -> None:
+        self.session_factory = session_factory
+        self._ids: Dict[StationKey, int] = {}
+        self._coordinates: Dict[StationKey, Coordinates] = {}
+        self._lock = threading.Lock()
+
+    def warm(self) -> int:
+        """Load every known station; returns the number cached."""
+
+        with self.session_factory() as session:
+            rows = session.exec(
+                select(
+                    Station.id, Station.network, Station.code, Station.latitude, Station.longitude
+                )
+            ).all()
+        with self._lock:
+            self._ids = {
+                station_key(network, code): station_id for station_id, network, code, *_ in rows
+            }
+            self._coordinates = {
+                station_key(network, code): (latitude, longitude)
+                for _, network, code, latitude, longitude in rows
+                if latitude is not None and longitude is not None
+            }
+        logger.info("Station registry warmed with %s stations", len(rows))
+        return len(rows)
+
+    def resolve(self, network: str | None, code: str) -> int:
+        key = station_key(network, code)
+        station_id = self._ids.get(key)
+        if station_id is not None:
+            return station_id
+        with self._lock:
+            station_id = self._ids.get(key)
+            if station_id is None:
+                station_id = self._upsert(network, code)
+                self._ids[key] = station_id
+        return station_id
+
+    def lookup(self, network: str | None, code: str) -> int | None:
+        """Like :meth:`resolve` but never creates the station."""
+
+        station_id = self._ids.get(station_key(network, code))
+        if station_id is not None:
+            return station_id
+        with self.session_factory() as session:
+            station_id = session.exec(
+                select(Station.id).where(_same_station(network, code))
+            ).first()
+        if station_id is not None:
+            with self._lock:
+                self._ids[station_key(network, code)] = station_id
+        return station_id
+
+    def coordinates(self, network: str | None, code: str) -> Coordinates | None:
+        """``(latitude, longitude)`` of a cached station, if it has both."""
+
+        return self._coordinates.get(station_key(network, code))
+
+    def register(self, station: Station) -> None:
+        if station.id is None:
+            return
+        key = station_key(station.network, station.code)
+        with self._lock:
+            self._ids[key] = station.id
+            if station.latitude is not None and station.longitude is not None:
+                self._coordinates[key] = (station.latitude, station.longitude)
+            else:
+                self._coordinates.pop(key, None)
+
+    def invalidate(self, network: str | None, code: str) -> None:
+        with self._lock:
+            self._ids.pop(station_key(network, code), None)
+            self._coordinates.pop(station_key(network, code), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids.clear()
+            self._coordinates.clear()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _upsert(self, network: str | None, code: str) -> int:
+        with self.session_factory() as session:
+            station = Station(code=code, network=network)
+            session.add(station)
+            try:
+                session.commit()
+                return station.id  # type: ignore[return-value]
+            except IntegrityError:
+                session.rollback()
+            existing = session.exec(
+                select(Station.id).where(_same_station(network, code))
+            ).one()
+        return existing
+
+
+__all__ = ["StationRegistry", "StationKey", "station_key"]
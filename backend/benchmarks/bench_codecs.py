@@ -0,0 +1,110 @@
+"""Compare bus message codecs on size and encode/decode throughput.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_codecs --messages 20000
+
+Encodes realistic waveform, phase pick and association messages with every
+codec available in this environment (``msgpack`` and ``orjson`` are skipped
+when not installed) and reports the mean encoded size and messages per
+second in each direction. ``binary`` uses the schema registered for the
+message type.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from app.services.streaming.codecs import CodecRegistry
+
+
+def _waveforms(count: int) -> List[Dict[str, Any]]:
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "station_code": f"STA{index % 50:02d}",
+            "network": "XX",
+            "location": "00",
+            "channel": "HHZ",
+            "start_time": start + timedelta(seconds=10 * index),
+            "end_time": start + timedelta(seconds=10 * index + 9.99),
+            "sampling_rate": 100.0,
+            "sample_count": 1000,
+            "window_seconds": 9.99,
+            "object_uri": f"file:///data/2024/XX/STA{index % 50:02d}/HHZ.mseed",
+            "object_key": f"2024/XX/STA{index % 50:02d}/HHZ.mseed",
+            "byte_offset": 4096 * index,
+            "byte_length": 4096,
+            "fingerprint": f"{index:032x}",
+            "metadata": {"source": "seedlink"},
+            "ingested_at": start + timedelta(seconds=10 * index + 12),
+        }
+        for index in range(count)
+    ]
+
+
+def _picks(count: int) -> List[Dict[str, Any]]:
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "station_code": f"STA{index % 50:02d}",
+            "phase_type": "P" if index % 2 else "S",
+            "pick_time": start + timedelta(seconds=rng.uniform(0, 86400)),
+            "probability": rng.random(),
+            "polarity": rng.choice(["U", "D", None]),
+            "extra": {},
+        }
+        for index in range(count)
+    ]
+
+
+def _associations(count: int) -> List[Dict[str, Any]]:
+    rng = random.Random(1)
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "origin_time": start + timedelta(seconds=rng.uniform(0, 86400)),
+            "latitude": rng.uniform(20, 50),
+            "longitude": rng.uniform(75, 135),
+            "depth_km": rng.uniform(0, 30),
+            "score": rng.random(),
+            "method": "gamma",
+        }
+        for _ in range(count)
+    ]
+
+
+def _rate(count: int, action: Callable[[], None]) -> float:
+    started = time.perf_counter()
+    action()
+    return count / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    registry = CodecRegistry()
+    datasets = {
+        "waveform": _waveforms(args.messages),
+        "phase_pick": _picks(args.messages),
+        "association": _associations(args.messages),
+    }
+    print(f"{'message':<12} {'codec':<8} {'bytes':>8} {'encode/s':>12} {'decode/s':>12}")
+    for schema, messages in datasets.items():
+        for name in registry.available:
+            codec = registry.binary.for_schema(schema) if name == "binary" else registry.for_content_type(name)
+            encoded: List[bytes] = []
+            encode_rate = _rate(len(messages), lambda: encoded.extend(map(codec.encode, messages)))
+            decode_rate = _rate(len(encoded), lambda: list(map(codec.decode, encoded)))
+            size = sum(map(len, encoded)) / len(encoded)
+            print(f"{schema:<12} {name:<8} {size:8.1f} {encode_rate:12.0f} {decode_rate:12.0f}")
+
+
+if __name__ == "__main__":
+    main()
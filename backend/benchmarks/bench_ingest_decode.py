@@ -0,0 +1,70 @@
+"""Compare decode throughput of the JSON and binary waveform ingest paths.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_ingest_decode --samples 30000 --rounds 50
+
+The JSON path measures ``json.loads`` + pydantic validation + ``np.asarray``;
+the binary path measures ``np.frombuffer`` over the raw request body, which
+is what ``POST /waveforms/ingest/binary`` does before persistence.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.schemas.waveform import WaveformIngestRequest
+from app.services.utils.binary import decode_raw_samples
+
+
+def _bench(label: str, func, rounds: int, samples: int) -> float:
+    func()  # warm-up
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    elapsed = time.perf_counter() - started
+    rate = samples * rounds / elapsed
+    print(f"{label:<10} {elapsed / rounds * 1e3:10.3f} ms/window {rate / 1e6:10.2f} Msamples/s")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=30_000, help="Samples per window")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    counts = rng.integers(-50_000, 50_000, size=args.samples, dtype="int32")
+    start = datetime(2024, 1, 1)
+    json_body = json.dumps(
+        {
+            "station_code": "BENCH",
+            "network": "XX",
+            "sampling_rate": 100.0,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(seconds=args.samples / 100.0)).isoformat(),
+            "samples": counts.astype(float).tolist(),
+        }
+    ).encode("utf-8")
+    binary_body = counts.astype("<i4").tobytes()
+
+    def json_path() -> None:
+        request = WaveformIngestRequest(**json.loads(json_body))
+        np.asarray(request.samples, dtype="float32")
+
+    def binary_path() -> None:
+        decode_raw_samples(binary_body, "int32")
+
+    print(f"window: {args.samples} samples, json={len(json_body)} B, binary={len(binary_body)} B")
+    json_rate = _bench("json", json_path, args.rounds, args.samples)
+    binary_rate = _bench("binary", binary_path, args.rounds, args.samples)
+    print(f"speedup: {binary_rate / json_rate:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Publish and consume throughput of the file-backed log bus.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_log_bus --messages 50000 --batch 100
+
+Publishes waveform-sized messages in ``--batch`` sized ``publish_many``
+calls (or concurrent single publishes with ``--batch 1``) under each fsync
+policy, then consumes everything back through a consumer group. Segments
+are written to a temporary directory unless ``--root`` is given.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from app.services.streaming.log_bus import FSYNC_POLICIES, LogMessageBus
+
+
+def _message(index: int) -> dict:
+    return {
+        "station_code": f"STA{index % 50:02d}",
+        "network": "XX",
+        "channel": "HHZ",
+        "sequence": index,
+        "object_key": f"2024/XX/STA{index % 50:02d}/HHZ.mseed",
+        "byte_offset": 4096 * index,
+        "byte_length": 4096,
+    }
+
+
+async def _run(policy: str, root: Path, args: argparse.Namespace) -> None:
+    bus = LogMessageBus(
+        root,
+        partitions=args.partitions,
+        segment_bytes=args.segment_mb * 1024 * 1024,
+        fsync=policy,
+        auto_offset_reset="earliest",
+    )
+    await bus.start()
+    messages = [(f"XX:STA{index % 50:02d}", _message(index)) for index in range(args.messages)]
+    started = time.perf_counter()
+    if args.batch > 1:
+        for start in range(0, len(messages), args.batch):
+            await bus.publish_many("bench", messages[start : start + args.batch])
+    else:
+        await asyncio.gather(*[bus.publish("bench", key, value) for key, value in messages])
+    published = time.perf_counter() - started
+
+    done = asyncio.Event()
+    count = 0
+
+    async def handler(message: dict) -> None:
+        nonlocal count
+        count += 1
+        if count == args.messages:
+            done.set()
+
+    started = time.perf_counter()
+    await bus.subscribe("bench", handler, group_id="bench")
+    await done.wait()
+    consumed = time.perf_counter() - started
+    await bus.stop()
+    print(
+        f"{policy:<9} publish {args.messages / published:10.0f} msg/s   "
+        f"consume {args.messages / consumed:10.0f} msg/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--partitions", type=int, default=3)
+    parser.add_argument("--segment-mb", type=int, default=64)
+    parser.add_argument("--root", type=Path, default=None)
+    args = parser.parse_args()
+    for policy in FSYNC_POLICIES:
+        root = Path(tempfile.mkdtemp(dir=args.root))
+        try:
+            asyncio.run(_run(policy, root, args))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
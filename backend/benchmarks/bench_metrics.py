@@ -0,0 +1,61 @@
+"""Measure the per-observation cost of the in-process metrics registry.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_metrics --iterations 500000
+
+Times the operations instrumented code performs on hot paths: a labelled
+histogram observation, the same with the child looked up once, a labelled
+counter increment, a gauge update and a ``time()`` block. Also reports how
+long rendering a registry of that size takes, which is paid per scrape.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable
+
+from app.core.metrics import MetricsRegistry
+
+
+def _per_call(operation: Callable[[], None], iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        operation()
+    return (time.perf_counter() - started) / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=500_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_stage_seconds", "Bench.", ["stage"])
+    counter = registry.counter("bench_total", "Bench.", ["stage", "result"])
+    gauge = registry.gauge("bench_depth", "Bench.")
+    child = histogram.labels("encode")
+
+    def timed_block() -> None:
+        with child.time():
+            pass
+
+    operations = {
+        "histogram.labels().observe": lambda: histogram.labels("encode").observe(0.003),
+        "child.observe": lambda: child.observe(0.003),
+        "counter.labels().inc": lambda: counter.labels("encode", "ok").inc(),
+        "gauge.inc": gauge.inc,
+        "child.time() block": timed_block,
+    }
+    print(f"{'operation':<28} {'ns/op':>8}")
+    for name, operation in operations.items():
+        best = min(_per_call(operation, args.iterations) for _ in range(args.repeats))
+        print(f"{name:<28} {best * 1e9:8.0f}")
+    started = time.perf_counter()
+    registry.render()
+    print(f"{'render':<28} {(time.perf_counter() - started) * 1e9:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
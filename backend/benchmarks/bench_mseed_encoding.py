@@ -0,0 +1,73 @@
+"""Compression ratio and encode throughput of the MiniSEED encodings.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_mseed_encoding --hours 1
+
+The synthetic trace mimics a broadband vertical channel in counts at
+100 Hz: secondary microseism, red background noise, digitiser noise and
+a local event with an exponentially decaying coda.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+
+from app.services.storage.mseed import MSeedEncodingPolicy, MSeedStorage
+
+
+def synthetic_counts(seconds: int, sampling_rate: float = 100.0) -> np.ndarray:
+    rng = np.random.default_rng(2024)
+    n = int(seconds * sampling_rate)
+    t = np.arange(n) / sampling_rate
+    microseism = 3000 * np.sin(2 * np.pi * 0.18 * t) + 1200 * np.sin(2 * np.pi * 0.07 * t + 1.3)
+    red = np.cumsum(rng.normal(0, 15, n))
+    red -= np.convolve(red, np.ones(2001) / 2001, mode="same")
+    digitiser = rng.normal(0, 4, n)
+    event = np.zeros(n)
+    onset = n // 3
+    coda = np.arange(n - onset) / sampling_rate
+    event[onset:] = 2e5 * np.exp(-coda / 8.0) * np.sin(2 * np.pi * 4.0 * coda) * rng.normal(
+        1, 0.3, n - onset
+    )
+    return np.rint(microseism + red + digitiser + event).astype("int32")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--window-seconds", type=int, default=10)
+    args = parser.parse_args()
+
+    counts = synthetic_counts(int(args.hours * 3600))
+    window = args.window_seconds * 100
+    windows = [counts[i : i + window] for i in range(0, counts.size, window)]
+    raw_bytes = counts.size * 4
+    print(f"{counts.size} samples in {len(windows)} windows of {args.window_seconds} s")
+    print(f"{'encoding':<9} {'reclen':>6} {'bytes':>12} {'ratio':>7} {'Msamples/s':>11}")
+
+    header = {"sampling_rate": 100.0, "starttime": UTCDateTime(2024, 1, 1)}
+    with tempfile.TemporaryDirectory(prefix="nscs-bench-") as scratch:
+        for encoding in ("FLOAT32", "INT32", "STEIM1", "STEIM2"):
+            for record_length in (512, 4096):
+                policy = MSeedEncodingPolicy(encoding=encoding, record_length=record_length)
+                storage = MSeedStorage(scratch, encoding=policy)
+                streams = [
+                    Stream([Trace(storage.prepare_samples(data), header=header)])
+                    for data in windows
+                ]
+                started = time.perf_counter()
+                total = sum(len(storage.encode_stream(stream).data) for stream in streams)
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{encoding:<9} {record_length:>6} {total:>12} {raw_bytes / total:>7.2f} "
+                    f"{counts.size / elapsed / 1e6:>11.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
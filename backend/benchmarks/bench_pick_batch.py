@@ -0,0 +1,81 @@
+"""Compare the dict round-trips the pipeline used to do with a shared PickBatch.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_pick_batch --picks 5000 --rounds 20
+
+``dicts`` reproduces the former hand-off: picker output is stored as
+``pick.__dict__`` and rebuilt as ``PhaseDetection`` objects for each of the
+four downstream stages. ``batch`` builds one ``PickBatch`` from the picker
+output and hands it to the four stages, each of which does a typical column
+operation (time sort, probability filter). Reports milliseconds per context
+and the size of the pick payload.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from app.services.processing.pick_batch import PickBatch
+from app.services.processing.result_types import PhaseDetection
+
+STAGES = 4
+
+
+def _detections(count: int) -> List[PhaseDetection]:
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    return [
+        PhaseDetection(
+            station_code=f"STA{index % 200:03d}",
+            phase_type="P" if index % 2 else "S",
+            pick_time=start + timedelta(seconds=rng.uniform(0, 120)),
+            probability=rng.random(),
+            polarity=rng.choice(["U", "D", None]),
+        )
+        for index in range(count)
+    ]
+
+
+def _dicts(detections: List[PhaseDetection]) -> int:
+    picks = [pick.__dict__ for pick in detections]
+    for _ in range(STAGES):
+        stage_input = [PhaseDetection(**pick) for pick in picks]
+        sorted(stage_input, key=lambda pick: pick.pick_time)
+    return sum(sys.getsizeof(pick) for pick in picks)
+
+
+def _batch(detections: List[PhaseDetection]) -> int:
+    batch = PickBatch.from_detections(detections)
+    for _ in range(STAGES):
+        batch.sorted_by_time().above(0.5)
+    return batch.nbytes
+
+
+def _measure(rounds: int, detections: List[PhaseDetection], action) -> tuple:
+    size = action(detections)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        action(detections)
+    return (time.perf_counter() - started) / rounds * 1000, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--picks", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    detections = _detections(args.picks)
+    print(f"{'hand-off':<8} {'ms/context':>11} {'payload bytes':>14}")
+    for name, action in (("dicts", _dicts), ("batch", _batch)):
+        elapsed, size = _measure(args.rounds, detections, action)
+        print(f"{name:<8} {elapsed:11.2f} {size:14d}")
+
+
+if __name__ == "__main__":
+    main()
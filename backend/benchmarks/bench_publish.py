@@ -0,0 +1,71 @@
+"""Compare per-message and pipelined publishing on the Kafka bus.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_publish --messages 5000 --round-trip-ms 1
+
+Uses the in-process broker from ``app.services.streaming.fake_kafka`` with a
+simulated round trip. ``sequential`` awaits each delivery before sending the
+next message, which is how ingest published before batching; ``concurrent``
+issues independent ``publish`` calls that share linger batches; and
+``publish_many`` enqueues the whole batch before collecting deliveries.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from app.services.streaming.fake_kafka import FakeKafkaBroker
+from app.services.streaming.message_bus import KafkaMessageBus
+
+
+def _messages(count: int):
+    return [
+        (f"XX:STA{index % 50}", {"station_code": f"STA{index % 50}", "sequence": index})
+        for index in range(count)
+    ]
+
+
+async def _run(mode: str, args: argparse.Namespace) -> None:
+    broker = FakeKafkaBroker(partitions=args.partitions, round_trip_ms=args.round_trip_ms)
+    bus = KafkaMessageBus(
+        "fake:9092",
+        producer_factory=broker.producer,
+        linger_ms=args.linger_ms,
+        max_batch_size=args.batch_bytes,
+        compression_type=args.compression,
+    )
+    await bus.start()
+    messages = _messages(args.messages)
+    started = time.perf_counter()
+    if mode == "sequential":
+        for key, value in messages:
+            await bus.publish("bench", key, value)
+    elif mode == "concurrent":
+        await asyncio.gather(*[bus.publish("bench", key, value) for key, value in messages])
+    else:
+        await bus.publish_many("bench", messages)
+    elapsed = time.perf_counter() - started
+    await bus.stop()
+    print(
+        f"{mode:<12} {args.messages / elapsed:12.0f} msg/s "
+        f"{broker.produce_requests:8d} requests {broker.bytes_received / 1024:10.1f} KiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--partitions", type=int, default=3)
+    parser.add_argument("--round-trip-ms", type=float, default=1.0)
+    parser.add_argument("--linger-ms", type=int, default=5)
+    parser.add_argument("--batch-bytes", type=int, default=65536)
+    parser.add_argument("--compression", default=None)
+    args = parser.parse_args()
+    for mode in ("sequential", "concurrent", "publish_many"):
+        asyncio.run(_run(mode, args))
+
+
+if __name__ == "__main__":
+    main()
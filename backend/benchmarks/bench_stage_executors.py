@@ -0,0 +1,159 @@
+"""Compare inline, thread and process execution of the pipeline stages.
+
+Run from the ``backend`` directory::
+
+    python -m benchmarks.bench_stage_executors --contexts 32 --concurrency 8
+
+Every context runs the same synthetic workload through ``ProcessingPipeline``:
+a pure-Python STA/LTA trigger over the samples stands in for picking and
+a pure-Python grid search over the picks for location, both of which hold
+the GIL the way un-vectorised numeric code does. Contexts are submitted
+``--concurrency`` at a time and every stage runs on the backend under test.
+Reports contexts per second and the mean latency per context. Process
+workers are started and warmed before timing, as a long-running service
+would have them.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.services.pipeline.context import ProcessingContext, WaveformPayload
+from app.services.pipeline.executors import build_stage_executors
+from app.services.pipeline.orchestrator import (
+    STAGE_SERVICES,
+    ProcessingPipeline,
+    build_default_services,
+)
+from app.services.processing.pick_batch import PickBatch
+from app.services.processing.result_types import AssociationCandidate, LocationEstimate
+
+
+class SyntheticPicker:
+    def pick_batch(self, samples: np.ndarray) -> PickBatch:
+        values = samples[::4].tolist()
+        short = long = 1e-9
+        onsets: List[int] = []
+        for index, value in enumerate(values):
+            energy = value * value
+            short += (energy - short) * 0.1
+            long += (energy - long) * 0.01
+            if short / long > 4 and (not onsets or index - onsets[-1] > 200):
+                onsets.append(index)
+        count = max(len(onsets), 8)
+        start = np.datetime64("2024-01-01T00:00:00", "us")
+        return PickBatch.from_arrays(
+            [f"STA{index % 8}" for index in range(count)],
+            ["P" if index % 2 else "S" for index in range(count)],
+            start + np.arange(count) * np.timedelta64(250_000, "us"),
+            np.linspace(0.5, 0.99, count),
+        )
+
+
+class SyntheticAssociator:
+    def associate(self, picks: PickBatch) -> List[AssociationCandidate]:
+        return [AssociationCandidate(datetime(2024, 1, 1), 0.0, 0.0, 10.0, 1.0, "synthetic")]
+
+
+class SyntheticLocator:
+    def __init__(self) -> None:
+        self.grid: List[tuple] = []
+
+    def warm(self) -> None:
+        self.grid = [(lat / 10, lon / 10) for lat in range(-20, 21) for lon in range(-20, 21)]
+
+    def locate(self, picks: PickBatch) -> LocationEstimate:
+        times = picks.epoch_seconds().tolist()
+        best = (float("inf"), 0.0, 0.0)
+        for latitude, longitude in self.grid:
+            misfit = 0.0
+            for index, moment in enumerate(times):
+                predicted = abs(latitude - index * 0.1) + abs(longitude + index * 0.05)
+                misfit += (moment % 7 - predicted) ** 2
+            best = min(best, (misfit, latitude, longitude))
+        return LocationEstimate(best[1], best[2], 10.0, 1.0, {"misfit": best[0]})
+
+
+def services() -> Dict[str, Any]:
+    built = build_default_services()
+    built.update(
+        phase_picker=SyntheticPicker(),
+        associator=SyntheticAssociator(),
+        locator=SyntheticLocator(),
+    )
+    return built
+
+
+def _context(samples: np.ndarray) -> ProcessingContext:
+    start = datetime(2024, 1, 1)
+    return ProcessingContext(
+        waveform=WaveformPayload(
+            station_code="STA0",
+            network="XX",
+            start_time=start,
+            end_time=start + timedelta(seconds=len(samples) / 100),
+            samples=samples,
+            sampling_rate=100.0,
+        )
+    )
+
+
+async def _drive(
+    pipeline: ProcessingPipeline, samples: np.ndarray, contexts: int, concurrency: int
+):
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with slots:
+            started = time.perf_counter()
+            context = await pipeline.run(_context(samples))
+            latencies.append(time.perf_counter() - started)
+            if context.errors:
+                raise RuntimeError(context.errors)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(contexts)))
+    return time.perf_counter() - started, sum(latencies) / len(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--contexts", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=360_000, help="samples per context")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    samples = rng.normal(size=args.samples).astype(np.float32)
+    samples[args.samples // 2 :: 5000] *= 40
+    print(f"{'backend':<8} {'contexts/s':>11} {'mean ms':>9}   ({args.workers} workers)")
+    for kind in ("inline", "thread", "process"):
+        executors = build_stage_executors(
+            {stage: kind for stage in STAGE_SERVICES},
+            services_factory=services,
+            thread_workers=args.workers,
+            process_workers=args.workers,
+            shared_memory_threshold=256 * 1024,
+        )
+        pipeline = ProcessingPipeline(**services(), executors=executors)
+        pipeline.locator.warm()
+        try:
+            asyncio.run(_drive(pipeline, samples, args.workers, args.workers))
+            elapsed, latency = asyncio.run(
+                _drive(pipeline, samples, args.contexts, args.concurrency)
+            )
+        finally:
+            pipeline.shutdown()
+        print(f"{kind:<8} {args.contexts / elapsed:11.1f} {latency * 1000:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Measure bytes and I/O operations spent per ingested waveform window.
+
+Run from the ``backend`` directory on Linux::
+
+    python -m benchmarks.bench_write_path --windows 500
+
+``legacy`` reproduces the former write path: one MiniSEED file per window,
+a full read-back for the SHA-256 checksum and a byte copy into the object
+store cache. ``current`` encodes and hashes in memory in one pass, appends
+to the SDS day file and hard links the sealed day file into the cache.
+Counters come from ``/proc/self/io`` (``wchar``/``rchar`` are bytes passed
+to write/read system calls, ``syscw``/``syscr`` the number of calls).
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime
+
+from app.services.storage.mseed import MSeedStorage
+from app.services.storage.object_store import ObjectStorageClient
+
+_COUNTERS = ("wchar", "rchar", "syscw", "syscr")
+
+
+def _io_counters() -> Dict[str, int]:
+    with open("/proc/self/io") as handle:
+        values = dict(line.split(": ") for line in handle.read().splitlines())
+    return {name: int(values[name]) for name in _COUNTERS}
+
+
+def _windows(count: int, samples: int) -> list[Stream]:
+    rng = np.random.default_rng(7)
+    start = UTCDateTime(2024, 1, 1)
+    streams = []
+    for index in range(count):
+        header = {
+            "network": "XX",
+            "station": "BENCH",
+            "channel": "HHZ",
+            "sampling_rate": 100.0,
+            "starttime": start + index * samples / 100.0,
+        }
+        data = rng.normal(0, 500, samples).astype("float32")
+        streams.append(Stream([Trace(data=data, header=header)]))
+    return streams
+
+
+def legacy_path(root: Path, streams: list[Stream]) -> None:
+    cache = root / "cache"
+    for index, stream in enumerate(streams):
+        path = root / "data" / f"BENCH_{index:06d}.mseed"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        stream.write(path, format="MSEED")
+        digest = hashlib.sha256()
+        with path.open("rb") as handle:
+            for chunk in iter(lambda: handle.read(8192), b""):
+                digest.update(chunk)
+        destination = cache / path.name
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, destination)
+
+
+def current_path(root: Path, streams: list[Stream]) -> None:
+    object_store = ObjectStorageClient("bench", base_path=root / "cache")
+    storage = MSeedStorage(root / "data")
+    storage.on_seal = lambda path: object_store.put_file(path, storage.build_object_key(path))
+    for stream in streams:
+        records = storage.encode_stream(stream)
+        storage.append_stream(stream, records.data)
+    # Roll the channel over to the next day so the day file is sealed.
+    roll = streams[-1].copy()
+    roll[0].stats.starttime = UTCDateTime(2024, 1, 2)
+    storage.append_stream(roll)
+    storage.close()
+
+
+def _measure(label: str, func: Callable[[Path, list[Stream]], None], streams: list[Stream]) -> None:
+    with tempfile.TemporaryDirectory(prefix="nscs-bench-") as scratch:
+        before = _io_counters()
+        started = time.perf_counter()
+        func(Path(scratch), streams)
+        elapsed = time.perf_counter() - started
+        after = _io_counters()
+    count = len(streams)
+    delta = {name: (after[name] - before[name]) / count for name in _COUNTERS}
+    print(
+        f"{label:<8} {elapsed / count * 1e3:8.3f} ms/window "
+        f"written {delta['wchar']:10.0f} B/window read {delta['rchar']:10.0f} B/window "
+        f"write ops {delta['syscw']:6.2f}/window read ops {delta['syscr']:6.2f}/window"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--windows", type=int, default=500)
+    parser.add_argument("--samples", type=int, default=1000, help="Samples per window")
+    args = parser.parse_args()
+
+    streams = _windows(args.windows, args.samples)
+    _measure("legacy", legacy_path, streams)
+    _measure("current", current_path, streams)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Settings are read at import time, so point storage at a scratch directory
+# before the application modules are imported by the test modules.
+_scratch = tempfile.mkdtemp(prefix="nscs-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_scratch}/catalog.db")
+os.environ.setdefault("DATA_ROOT", os.path.join(_scratch, "data"))
+os.environ.setdefault("OBJECT_STORE_CACHE", os.path.join(_scratch, "object_store_cache"))
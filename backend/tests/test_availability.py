@@ -0,0 +1,54 @@
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def _ingest(client, station, start, samples=1000):
+    response = client.post(
+        "/waveforms/ingest/binary",
+        content=np.arange(samples, dtype="<i4").tobytes(),
+        headers={
+            "Content-Type": "application/octet-stream",
+            "X-Station-Code": station,
+            "X-Network": "AV",
+            "X-Channel": "HHZ",
+            "X-Sampling-Rate": "100",
+            "X-Start-Time": start,
+        },
+    )
+    assert response.status_code == 202
+
+
+def test_availability_merges_runs_and_reports_gaps():
+    window = {"start": "2024-04-01T00:00:00", "end": "2024-04-01T00:01:00"}
+    with TestClient(app) as client:
+        _ingest(client, "GAP1", "2024-04-01T00:00:00")
+        _ingest(client, "GAP1", "2024-04-01T00:00:10")
+        _ingest(client, "GAP1", "2024-04-01T00:00:40")
+        _ingest(client, "FULL", "2024-04-01T00:00:00", samples=6001)
+
+        spans = client.get("/availability/query", params={**window, "station": "GAP1"})
+        gaps = client.get(
+            "/availability/gaps", params={**window, "network": "AV", "gaps_only": True, "mingap": 1}
+        )
+        extent = client.get("/availability/extent", params={"station": "GAP1,FULL"})
+
+    (source,) = spans.json()["datasources"]
+    assert len(source["timespans"]) == 2
+    assert source["timespans"][0][1].startswith("2024-04-01T00:00:19.99")
+
+    channels = gaps.json()["datasources"]
+    assert [item["station"] for item in channels] == ["GAP1"]
+    assert len(channels[0]["gaps"]) == 2
+    assert 0.49 < channels[0]["coverage"] < 0.5
+    assert {item["station"] for item in extent.json()["datasources"]} == {"GAP1", "FULL"}
+
+
+def test_availability_index_is_rebuilt_from_the_catalog():
+    with TestClient(app) as client:
+        _ingest(client, "WARM", "2024-04-02T00:00:00")
+    with TestClient(app) as client:
+        response = client.get("/availability/extent", params={"station": "WARM"})
+    assert response.status_code == 200
+    assert response.json()["datasources"][0]["timespan_count"] == 1
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.metrics import REGISTRY, MetricsRegistry
+from app.main import app
+from app.services.pipeline.context import ProcessingContext, WaveformPayload
+from app.services.pipeline.executors import InlineStageExecutor
+from app.services.pipeline.orchestrator import STAGE_SERVICES, build_default_pipeline
+from app.services.pipeline.queue import RealtimeQueue
+
+
+def _sample(text: str, series: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(series + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("demo_seconds", "Demo latency.", ["stage"], buckets=(0.1, 1.0))
+    counter = registry.counter("demo_total", "Demo events.", ["name"])
+    histogram.labels("encode").observe(0.05)
+    histogram.labels("encode").observe(0.5)
+    histogram.labels("encode").observe(5)
+    counter.labels('a"b\\c').inc(2)
+
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="encode",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="encode",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="encode",le="+Inf"} 3' in text
+    assert 'demo_seconds_sum{stage="encode"} 5.55' in text
+    assert 'demo_seconds_count{stage="encode"} 3' in text
+    assert 'demo_total{name="a\\"b\\\\c"} 2' in text
+
+    assert registry.counter("demo_total", "Demo events.", ["name"]) is counter
+    with pytest.raises(ValueError):
+        registry.gauge("demo_total", "Demo events.")
+    with pytest.raises(ValueError):
+        counter.labels("x").inc(-1)
+    with pytest.raises(ValueError):
+        counter.inc()
+
+
+def test_observation_overhead_stays_under_a_few_microseconds():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("overhead_seconds", "Overhead.", ["stage"])
+    counter = registry.counter("overhead_total", "Overhead.", ["stage", "result"])
+    iterations = 20_000
+
+    def per_call() -> float:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            histogram.labels("encode").observe(0.003)
+            counter.labels("encode", "ok").inc()
+        return (time.perf_counter() - started) / iterations / 2
+
+    assert min(per_call() for _ in range(5)) < 5e-6
+
+
+def test_metrics_endpoint_reports_ingest_persistence_and_bus_timings():
+    samples = np.arange(500, dtype="<i4")
+    with TestClient(app) as client:
+        before = client.get("/metrics").text
+        response = client.post(
+            "/waveforms/ingest/binary",
+            content=samples.tobytes(),
+            headers={
+                "Content-Type": "application/octet-stream",
+                "X-Sample-Format": "int32",
+                "X-Station-Code": "MET1",
+                "X-Network": "XX",
+                "X-Sampling-Rate": "100",
+                "X-Start-Time": "2024-03-01T00:00:00",
+            },
+        )
+        assert response.status_code == 202
+        assert "checksum" in response.json()["timings_ms"]
+        scraped = client.get("/metrics")
+
+    assert scraped.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = scraped.text
+    for series in (
+        'nscs_waveform_ingest_windows_total{endpoint="binary",result="accepted"}',
+        'nscs_waveform_ingest_seconds_count{endpoint="binary"}',
+        'nscs_persistence_stage_seconds_count{stage="encode"}',
+        'nscs_persistence_stage_seconds_count{stage="checksum"}',
+        'nscs_persistence_stage_seconds_count{stage="db"}',
+    ):
+        assert _sample(after, series) == _sample(before, series) + 1, series
+    assert "nscs_bus_publish_seconds_count{" in after
+
+
+def test_realtime_queue_and_pipeline_stages_are_instrumented():
+    start = datetime(2024, 1, 1)
+    context = ProcessingContext(
+        waveform=WaveformPayload(
+            station_code="MET2",
+            network="XX",
+            start_time=start,
+            end_time=start + timedelta(seconds=10),
+            samples=np.zeros(1000, dtype=np.float32),
+            sampling_rate=100.0,
+        )
+    )
+    pipeline = build_default_pipeline(
+        executors={stage: InlineStageExecutor() for stage in STAGE_SERVICES}
+    )
+    before = REGISTRY.render()
+
+    async def scenario():
+        queue = RealtimeQueue(pipeline)
+        await queue.start()
+        await queue.submit(context)
+        await queue.stop()
+
+    asyncio.run(scenario())
+    after = REGISTRY.render()
+    for series in (
+        'nscs_pipeline_contexts_total{outcome="completed"}',
+        "nscs_pipeline_queue_wait_seconds_count",
+        'nscs_pipeline_stage_seconds_count{stage="pick"}',
+    ):
+        assert _sample(after, series) == _sample(before, series) + 1, series
+    assert _sample(after, "nscs_pipeline_queue_depth") == _sample(before, "nscs_pipeline_queue_depth")
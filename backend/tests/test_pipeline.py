@@ -0,0 +1,462 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.services.pipeline.context import ProcessingContext, WaveformPayload
+from app.services.pipeline.batching import MicroBatcher
+from app.services.pipeline.executors import (
+    InlineStageExecutor,
+    ProcessStageExecutor,
+    build_stage_executors,
+)
+from app.services.pipeline.orchestrator import (
+    PipelineStage,
+    _topological_order,
+    build_default_pipeline,
+    build_default_services,
+)
+from app.services.pipeline.queue import RealtimeQueue
+from app.services.processing.phase_picker import stack_windows
+from app.services.processing.pick_batch import NO_POLARITY, PICK_DTYPE, PickBatch
+from app.services.processing.result_types import AssociationCandidate, PhaseDetection
+
+
+def _context(station: str = "STA") -> ProcessingContext:
+    start = datetime(2024, 1, 1)
+    return ProcessingContext(
+        waveform=WaveformPayload(
+            station_code=station,
+            network="XX",
+            start_time=start,
+            end_time=start + timedelta(seconds=10),
+            samples=np.zeros(1000, dtype=np.float32),
+            sampling_rate=100.0,
+        )
+    )
+
+
+class _SlowPipeline:
+    def __init__(self, delay: float = 0.01, fail_on: str | None = None) -> None:
+        self.delay = delay
+        self.fail_on = fail_on
+        self.running = 0
+        self.peak = 0
+
+    async def run(self, context):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        if context.waveform.station_code == self.fail_on:
+            raise RuntimeError("boom")
+        return context
+
+
+def test_realtime_queue_runs_pipelines_concurrently_and_drains_on_stop():
+    pipeline = _SlowPipeline()
+    completed = []
+
+    async def on_complete(context):
+        completed.append(context.waveform.station_code)
+
+    async def scenario():
+        queue = RealtimeQueue(pipeline, on_complete=on_complete, workers=4)
+        await queue.start()
+        for index in range(12):
+            await queue.submit(_context(f"S{index}"))
+        await queue.stop()
+        with pytest.raises(RuntimeError):
+            await queue.submit(_context())
+        return queue.metrics
+
+    metrics = asyncio.run(scenario())
+    assert pipeline.peak == 4
+    assert sorted(completed) == sorted(f"S{index}" for index in range(12))
+    assert (metrics.submitted, metrics.completed, metrics.failed, metrics.dropped) == (12, 12, 0, 0)
+    assert metrics.service.count == 12
+    assert metrics.service.mean >= 0.01
+    assert metrics.wait.percentile(100) >= metrics.wait.percentile(50) >= 0
+    assert metrics.busy == 0
+
+
+def test_realtime_queue_stop_does_not_hang_and_counts_failures_and_drops():
+    async def scenario():
+        idle = RealtimeQueue(_SlowPipeline(), workers=2)
+        await idle.start()
+        await asyncio.wait_for(idle.stop(), timeout=1)
+
+        failing = RealtimeQueue(_SlowPipeline(fail_on="BAD"), workers=2)
+        await failing.start()
+        await failing.submit(_context("BAD"))
+        await failing.submit(_context("OK"))
+        await failing.stop()
+
+        slow = RealtimeQueue(_SlowPipeline(delay=0.2), workers=1)
+        await slow.start()
+        for _ in range(3):
+            await slow.submit(_context())
+        await slow.stop(timeout=0.05)
+        return failing.metrics, slow.metrics
+
+    failing, slow = asyncio.run(scenario())
+    assert (failing.completed, failing.failed) == (1, 1)
+    assert slow.completed == 0
+    assert slow.dropped == 2
+
+
+def _detections():
+    start = datetime(2024, 1, 1, 0, 0, 5)
+    return [
+        PhaseDetection("STA1", "P", start + timedelta(seconds=2), 0.75, "U"),
+        PhaseDetection("STA2", "P", start, 0.5, None, {"snr": 12.0}),
+        PhaseDetection("STA1", "S", start + timedelta(seconds=4.25), 0.875, None),
+    ]
+
+
+def test_pick_batch_round_trips_and_stays_columnar():
+    detections = _detections()
+    batch = PickBatch.from_detections(detections)
+
+    assert batch.data.dtype == PICK_DTYPE
+    assert batch.stations == ("STA1", "STA2")
+    assert batch.phases == ("P", "S")
+    assert batch.data["polarity"].tolist() == [0, NO_POLARITY, NO_POLARITY]
+    assert batch.to_detections() == detections
+    assert PickBatch.from_records(batch.to_records()).to_detections() == detections
+    assert PickBatch.coerce(batch) is batch
+
+    ordered = batch.sorted_by_time()
+    assert ordered.station_codes.tolist() == ["STA2", "STA1", "STA1"]
+    assert ordered.extras == {0: {"snr": 12.0}}
+    assert ordered.with_phase("S").to_detections() == [detections[2]]
+    assert len(ordered.with_phase("Pn")) == 0
+    assert len(batch.above(0.7)) == 2
+    window = batch.between(datetime(2024, 1, 1, 0, 0, 6), datetime(2024, 1, 1, 0, 0, 10))
+    assert window.to_detections() == [detections[0], detections[2]]
+    epoch = (datetime(2024, 1, 1, 0, 0, 5) - datetime(1970, 1, 1)).total_seconds()
+    assert batch.epoch_seconds()[1] == epoch
+
+
+def test_pick_batch_concatenate_and_from_arrays_merge_label_tables():
+    first = PickBatch.from_detections(_detections())
+    second = PickBatch.from_arrays(
+        ["STA3", "STA1"],
+        ["Pn", "P"],
+        np.array(["2024-01-01T00:01:00", "2024-01-01T00:02:00"], dtype="datetime64[us]"),
+        [0.25, 1.0],
+        polarities=["D", None],
+    )
+
+    merged = PickBatch.concatenate([first, PickBatch.empty(), second])
+
+    assert len(merged) == 5
+    assert merged.stations == ("STA1", "STA2", "STA3")
+    assert merged.phases == ("P", "S", "Pn")
+    assert merged.polarities == ("U", "D")
+    assert merged.extras == {1: {"snr": 12.0}}
+    assert merged.to_detections()[3:] == [
+        PhaseDetection("STA3", "Pn", datetime(2024, 1, 1, 0, 1), 0.25, "D"),
+        PhaseDetection("STA1", "P", datetime(2024, 1, 1, 0, 2), 1.0, None),
+    ]
+
+
+def test_pipeline_hands_one_pick_batch_to_every_stage():
+    pipeline = build_default_pipeline()
+    batch = PickBatch.from_detections(_detections())
+    received = []
+
+    def record(result):
+        def stage(picks):
+            received.append(picks)
+            return result
+
+        return stage
+
+    pipeline.phase_picker.pick_batch = lambda samples: batch
+    pipeline.associator.associate = record(
+        [AssociationCandidate(datetime(2024, 1, 1), 30.0, 100.0, 10.0, 0.9, "test")]
+    )
+    pipeline.locator.locate = record(None)
+    pipeline.magnitude.estimate = record(None)
+    pipeline.mechanism.invert = record(None)
+
+    context = asyncio.run(pipeline.run(_context()))
+
+    assert context.errors == []
+    assert context.phase_picks.batch is batch
+    assert context.phase_picks.raw_output == {"count": 3}
+    assert context.phase_picks.picks[1]["extra"] == {"snr": 12.0}
+    assert len(received) == 4
+    assert all(picks is batch for picks in received)
+
+
+class _WorkerPicker:
+    """Picker whose result reveals the process it ran in and what it saw."""
+
+    def __init__(self) -> None:
+        self.warmed_in = None
+
+    def warm(self) -> None:
+        import os
+
+        self.warmed_in = os.getpid()
+
+    def pick_batch(self, samples):
+        import os
+
+        return PickBatch.from_arrays(
+            [f"PID{os.getpid()}", f"WARM{self.warmed_in}"],
+            ["P", "S"],
+            np.array(["2024-01-01T00:00:00", "2024-01-01T00:00:01"], dtype="datetime64[us]"),
+            [float(samples.sum()), float(len(samples))],
+        )
+
+
+class _WorkerLocator:
+    def locate(self, picks):
+        return picks.stations, float(picks.probabilities.sum())
+
+
+def _worker_services():
+    services = build_default_services()
+    services["phase_picker"] = _WorkerPicker()
+    services["locator"] = _WorkerLocator()
+    return services
+
+
+def test_process_executor_uses_warm_workers_and_shared_memory():
+    import os
+
+    executor = ProcessStageExecutor(_worker_services, max_workers=1, shared_memory_threshold=1024)
+    samples = np.ones(100_000, dtype=np.float32)
+    picks = PickBatch.from_arrays(
+        [f"S{index % 7}" for index in range(200)],
+        ["P"] * 200,
+        np.full(200, np.datetime64("2024-01-01T00:00:00", "us")),
+        np.full(200, 0.5),
+    )
+
+    async def scenario():
+        first = await executor.run("phase_picker", _WorkerPicker.pick_batch, samples)
+        second = await executor.run("phase_picker", _WorkerPicker.pick_batch, samples[:10])
+        located = await executor.run("locator", _WorkerLocator.locate, picks)
+        return first, second, located
+
+    try:
+        first, second, located = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    worker = first.stations[0]
+    assert worker != f"PID{os.getpid()}"
+    assert first.stations == (worker, "WARM" + worker[3:])
+    assert second.stations == first.stations
+    assert first.probabilities.tolist() == [100_000.0, 100_000.0]
+    assert second.probabilities.tolist() == [10.0, 10.0]
+    assert located == (picks.stations, 100.0)
+
+
+def test_pipeline_routes_stages_to_configured_executors():
+    with pytest.raises(ValueError):
+        build_stage_executors({"pick": "gpu"})
+    with pytest.raises(ValueError):
+        build_default_pipeline(executors={"pack": InlineStageExecutor()})
+
+    executors = build_stage_executors(
+        {"pick": "thread", "associate": "inline", "locate": "inline", "magnitude": "thread"}
+    )
+    assert executors["associate"] is executors["locate"]
+    assert executors["pick"] is executors["magnitude"]
+    pipeline = build_default_pipeline(executors=executors)
+    calls = []
+
+    class _Recording:
+        def __init__(self, inner):
+            self.inner = inner
+
+        async def run(self, service, func, *args):
+            calls.append(service)
+            return await self.inner.run(service, func, *args)
+
+        def shutdown(self, wait=True):
+            self.inner.shutdown(wait)
+
+    pipeline.executors = {stage: _Recording(executor) for stage, executor in executors.items()}
+    pipeline.phase_picker.pick_batch = lambda samples: PickBatch.from_detections(_detections())
+    pipeline.associator.associate = lambda picks: [
+        AssociationCandidate(datetime(2024, 1, 1), 30.0, 100.0, 10.0, 0.9, "test")
+    ]
+
+    context = asyncio.run(pipeline.run(_context()))
+    pipeline.shutdown()
+
+    assert context.errors == []
+    assert calls[:2] == ["phase_picker", "associator"]
+    assert sorted(calls[2:]) == ["locator", "magnitude"]
+
+
+def test_pipeline_runs_independent_stages_concurrently_and_records_critical_path():
+    pipeline = build_default_pipeline()
+
+    def sleeping(seconds, result=None):
+        def stage(picks):
+            time.sleep(seconds)
+            return result
+
+        return stage
+
+    pipeline.phase_picker.pick_batch = lambda samples: PickBatch.from_detections(_detections())
+    pipeline.associator.associate = sleeping(
+        0.01, [AssociationCandidate(datetime(2024, 1, 1), 30.0, 100.0, 10.0, 0.9, "test")]
+    )
+    pipeline.locator.locate = sleeping(0.2)
+    pipeline.magnitude.estimate = sleeping(0.2)
+    pipeline.mechanism.invert = sleeping(0.3)
+
+    started = time.perf_counter()
+    context = asyncio.run(pipeline.run(_context()))
+    elapsed = time.perf_counter() - started
+    pipeline.shutdown()
+
+    assert context.errors == []
+    assert elapsed < 0.6
+    assert set(context.stage_timings) == {"pick", "associate", "locate", "magnitude", "mechanism"}
+    assert context.stage_timings["mechanism"] >= 0.3
+    assert context.critical_path == ["pick", "associate", "mechanism"]
+
+
+def test_pipeline_skips_dependents_of_failed_or_empty_stages():
+    pipeline = build_default_pipeline()
+    pipeline.phase_picker.pick_batch = lambda samples: PickBatch.from_detections(_detections())
+    context = asyncio.run(pipeline.run(_context()))
+
+    assert context.association.candidate_events == []
+    assert context.location is None
+    assert set(context.stage_timings) == {"pick", "associate"}
+    assert context.critical_path == ["pick", "associate"]
+
+    def broken(samples):
+        raise RuntimeError("model missing")
+
+    pipeline.phase_picker.pick_batch = broken
+    context = asyncio.run(pipeline.run(_context()))
+    pipeline.shutdown()
+
+    assert context.errors == ["phase_picking: model missing"]
+    assert context.association is None
+    assert list(context.stage_timings) == ["pick"]
+
+
+def test_stage_graph_is_validated():
+    async def noop(context):
+        return True
+
+    ordered = _topological_order(
+        [PipelineStage("b", ("a",), noop), PipelineStage("a", (), noop)]
+    )
+    assert [stage.name for stage in ordered] == ["a", "b"]
+    with pytest.raises(ValueError):
+        _topological_order([PipelineStage("a", ("b",), noop), PipelineStage("b", ("a",), noop)])
+    with pytest.raises(ValueError):
+        _topological_order([PipelineStage("a", ("missing",), noop)])
+
+
+def test_micro_batcher_fills_batches_and_flushes_on_max_wait():
+    sizes = []
+
+    async def runner(items):
+        sizes.append(len(items))
+        if "bad" in items:
+            raise RuntimeError("inference failed")
+        return [item * 2 for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(runner, max_batch=4, max_wait_ms=30)
+        results = await asyncio.gather(*(batcher.submit(index) for index in range(10)))
+        failures = await asyncio.gather(
+            batcher.submit(1), batcher.submit("bad"), return_exceptions=True
+        )
+        return batcher.metrics, results, failures
+
+    metrics, results, failures = asyncio.run(scenario())
+    assert results == [index * 2 for index in range(10)]
+    assert sizes == [4, 4, 2, 2]
+    assert all(isinstance(failure, RuntimeError) for failure in failures)
+    assert (metrics.batches, metrics.items, metrics.full, metrics.timed_out) == (4, 12, 2, 2)
+    assert metrics.failed == 1
+    assert metrics.fill_ratio == 12 / 16
+    assert metrics.delay.count == 12
+    assert metrics.delay.max >= 0.025
+
+
+def test_stack_windows_pads_to_the_longest_window():
+    tensor, lengths = stack_windows([np.ones(3), np.arange(5, dtype=np.int32)])
+    assert tensor.dtype == np.float32
+    assert tensor.tolist() == [[1, 1, 1, 0, 0], [0, 1, 2, 3, 4]]
+    assert lengths.tolist() == [3, 5]
+    tensor, _ = stack_windows([np.ones((3, 4)), np.ones((3, 2))])
+    assert tensor.shape == (2, 3, 4)
+    with pytest.raises(ValueError):
+        stack_windows([np.ones((3, 4)), np.ones((2, 4))])
+
+
+def test_pipeline_batches_concurrent_windows_into_one_picker_call():
+    pipeline = build_default_pipeline(pick_max_wait_ms=50)
+    shapes = []
+
+    def pick_stacked(tensor, lengths):
+        shapes.append(tensor.shape)
+        return [
+            PickBatch.from_arrays(
+                [f"ROW{row}"], ["P"], [datetime(2024, 1, 1)], [float(lengths[row])]
+            )
+            for row in range(len(tensor))
+        ]
+
+    pipeline.phase_picker.pick_stacked = pick_stacked
+    contexts = [_context(f"S{index}") for index in range(5)]
+    for index, context in enumerate(contexts):
+        context.waveform.samples = np.zeros(100 + index, dtype=np.float32)
+
+    async def scenario():
+        return await asyncio.gather(*(pipeline.run(context) for context in contexts))
+
+    processed = asyncio.run(scenario())
+    pipeline.shutdown()
+
+    assert shapes == [(5, 104)]
+    assert [context.phase_picks.batch.probabilities.tolist() for context in processed] == [
+        [100.0], [101.0], [102.0], [103.0], [104.0]
+    ]
+    assert pipeline.pick_batcher.metrics.fill_ratio == 5 / 32
+
+
+def test_pipeline_batches_windows_per_channel_layout():
+    pipeline = build_default_pipeline(pick_max_wait_ms=50)
+    shapes = []
+
+    def pick_stacked(tensor, lengths):
+        shapes.append(tensor.shape)
+        return [PickBatch.empty() for _ in range(len(tensor))]
+
+    pipeline.phase_picker.pick_stacked = pick_stacked
+    single, three, broken = _context("S1"), _context("S3"), _context("BAD")
+    single.waveform.samples = np.zeros(100, dtype=np.float32)
+    three.waveform.samples = np.zeros((3, 100), dtype=np.float32)
+    broken.waveform.samples = np.float32(0.0)
+
+    async def scenario():
+        return await asyncio.gather(*(pipeline.run(c) for c in (single, three, broken)))
+
+    processed = asyncio.run(scenario())
+    pipeline.shutdown()
+
+    assert sorted(shapes) == [(1, 3, 100), (1, 100)]
+    assert processed[0].phase_picks is not None and processed[1].phase_picks is not None
+    assert processed[2].phase_picks is None
+    assert any(error.startswith("phase_picking") for error in processed[2].errors)
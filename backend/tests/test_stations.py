@@ -0,0 +1,59 @@
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.db.session import init_db, session_factory
+from app.main import app
+from app.models.base import Station
+from app.services.utils.station_registry import StationRegistry
+
+
+def _rows(network: str, code: str) -> list[Station]:
+    with session_factory() as session:
+        return session.exec(
+            select(Station).where(Station.network == network, Station.code == code)
+        ).all()
+
+
+def test_registry_upserts_once_across_processes():
+    init_db()
+    first = StationRegistry(session_factory)
+    second = StationRegistry(session_factory)  # stands in for another worker process
+
+    station_id = first.resolve("RG", "REG1")
+    assert second.resolve("RG", "REG1") == station_id
+    assert first.resolve("RG", "REG1") == station_id
+    assert len(_rows("RG", "REG1")) == 1
+
+
+def test_station_endpoints_keep_registry_in_sync():
+    with TestClient(app) as client:
+        registry: StationRegistry = app.state.station_registry
+        created = client.post("/stations/", json={"code": "REG2", "network": "RG"}).json()
+        assert registry.resolve("RG", "REG2") == created["id"]
+
+        duplicate = client.post("/stations/", json={"code": "REG2", "network": "RG"})
+        assert duplicate.status_code == 409
+
+        client.patch(f"/stations/{created['id']}", json={"network": "RH"})
+        assert registry.resolve("RH", "REG2") == created["id"]
+
+        client.delete(f"/stations/{created['id']}")
+        assert _rows("RH", "REG2") == []
+        registry.resolve("RH", "REG2")  # re-created rather than served from a stale entry
+        assert len(_rows("RH", "REG2")) == 1
+
+
+def test_stations_without_network_are_not_duplicated():
+    init_db()
+    first = StationRegistry(session_factory)
+    second = StationRegistry(session_factory)
+
+    station_id = first.resolve(None, "NN1")
+    assert second.resolve(None, "NN1") == station_id
+    assert StationRegistry(session_factory).resolve("", "NN1") == station_id
+    with session_factory() as session:
+        rows = session.exec(select(Station).where(Station.code == "NN1")).all()
+    assert len(rows) == 1
+
+    with TestClient(app) as client:
+        assert client.post("/stations/", json={"code": "NN1"}).status_code == 409
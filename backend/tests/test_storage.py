@@ -0,0 +1,231 @@
+import io
+
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime, read
+
+from app.services.storage.mseed import MSeedStorage
+
+
+def _stream(start: UTCDateTime, value: int, channel: str = "HHZ") -> Stream:
+    header = {
+        "network": "XX",
+        "station": "STO1",
+        "channel": channel,
+        "sampling_rate": 100.0,
+        "starttime": start,
+    }
+    return Stream([Trace(data=np.full(200, value, dtype="float32"), header=header)])
+
+
+def test_windows_in_same_second_share_a_day_file(tmp_path):
+    storage = MSeedStorage(tmp_path)
+    start = UTCDateTime(2024, 3, 1, 12, 0, 0)
+    first = storage.append_stream(_stream(start, 1))
+    second = storage.append_stream(_stream(start + 0.5, 2))
+
+    assert first.path == second.path
+    assert first.path.relative_to(tmp_path).as_posix() == "2024/XX/STO1/HHZ.D/XX.STO1..HHZ.D.2024.061"
+    assert second.offset == first.offset + first.length
+
+    window = read(io.BytesIO(storage.read_segment(second.path, second.offset, second.length)))
+    assert window[0].stats.starttime == start + 0.5
+    assert window[0].data[0] == 2
+    storage.close()
+
+
+def test_day_roll_seals_previous_day_file(tmp_path):
+    sealed = []
+    storage = MSeedStorage(tmp_path, max_open_files=1, on_seal=sealed.append)
+    first = storage.append_stream(_stream(UTCDateTime(2024, 3, 1, 23, 59, 0), 1))
+    storage.append_stream(_stream(UTCDateTime(2024, 3, 1, 23, 59, 0), 1, channel="HHN"))
+    assert sealed == []  # evicted from the LRU, but the day is not over yet
+
+    storage.append_stream(_stream(UTCDateTime(2024, 3, 2, 0, 0, 0), 3))
+    assert sealed == [first.path]
+    storage.close()
+    # Shutdown uploads the days still being written, open or evicted.
+    assert len(sealed) == 3 and len(set(sealed)) == 3
+
+
+def test_object_store_stages_sealed_files_without_copying(tmp_path):
+    from app.services.storage.object_store import ObjectStorageClient, stage_file
+
+    source = tmp_path / "archive" / "day.mseed"
+    source.parent.mkdir()
+    source.write_bytes(b"records")
+    assert stage_file(source, tmp_path / "staged" / "day.mseed") in {"hardlink", "reflink"}
+
+    client = ObjectStorageClient("bucket", base_path=tmp_path / "cache")
+    uri = client.put_file(source, "2024/XX/day.mseed")
+    assert uri == "s3://bucket/2024/XX/day.mseed"
+    assert client.resolve_local_path("2024/XX/day.mseed").read_bytes() == b"records"
+
+
+def test_integer_counts_are_steim2_compressed(tmp_path):
+    from app.services.storage.mseed import MSeedEncodingPolicy
+
+    storage = MSeedStorage(tmp_path, encoding=MSeedEncodingPolicy(record_length=512))
+    counts = np.cumsum(np.random.default_rng(0).integers(-20, 20, 5000)).astype(float)
+    samples = storage.prepare_samples(counts)
+    assert samples.dtype == np.int32
+    stream = _stream(UTCDateTime(2024, 3, 1), 0)
+    stream[0].data = samples
+    records = storage.encode_stream(stream)
+
+    decoded = read(io.BytesIO(records.data))[0]
+    assert decoded.stats.mseed.encoding == "STEIM2"
+    assert decoded.stats.mseed.record_length == 512
+    np.testing.assert_array_equal(decoded.data, counts)
+    assert len(records.data) < counts.size * 4 / 2
+
+    assert storage.prepare_samples([0.5, 1.25]).dtype == np.float32
+    storage.close()
+
+
+def _fake_s3_engine(tmp_path, transport=None, **options):
+    import httpx
+
+    from app.services.storage.fake_s3 import create_fake_s3_app
+    from app.services.storage.s3 import S3UploadEngine
+
+    fake = create_fake_s3_app(tmp_path / "s3")
+    engine = S3UploadEngine(
+        "http://fake-s3",
+        "waveforms",
+        access_key="test",
+        secret_key="secret",
+        transport=transport or httpx.ASGITransport(app=fake),
+        backoff_seconds=0,
+        **options,
+    )
+    return engine, tmp_path / "s3" / "objects" / "waveforms"
+
+
+def test_s3_engine_uploads_large_files_in_concurrent_parts(tmp_path):
+    import asyncio
+
+    payload = np.random.default_rng(1).bytes(10_000)
+    source = tmp_path / "day.mseed"
+    source.write_bytes(payload)
+    engine, bucket = _fake_s3_engine(tmp_path, multipart_threshold=4096, part_size=3000)
+
+    async def scenario() -> None:
+        await engine.start()
+        await engine.upload_file(source, "2024/XX/day.mseed")
+        await engine.upload_file(tmp_path / "day.mseed", "2024/XX/copy.mseed")
+        await engine.stop()
+
+    asyncio.run(scenario())
+    assert (bucket / "2024/XX/day.mseed").read_bytes() == payload
+    assert engine.metrics.parts_uploaded == 8
+    assert engine.metrics.objects_uploaded == 2
+    assert engine.metrics.throughput_bytes_per_second > 0
+
+
+def test_s3_engine_retries_transient_failures(tmp_path):
+    import asyncio
+
+    import httpx
+
+    from app.services.storage.fake_s3 import create_fake_s3_app
+
+    inner = httpx.ASGITransport(app=create_fake_s3_app(tmp_path / "s3"))
+    failures = {"remaining": 2}
+
+    class FlakyTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            if failures["remaining"]:
+                failures["remaining"] -= 1
+                return httpx.Response(503)
+            return await inner.handle_async_request(request)
+
+    source = tmp_path / "window.mseed"
+    source.write_bytes(b"records")
+    engine, bucket = _fake_s3_engine(tmp_path, transport=FlakyTransport())
+
+    async def scenario() -> None:
+        await engine.start()
+        engine.enqueue(source, "retry/window.mseed")
+        await engine.stop()
+
+    asyncio.run(scenario())
+    assert (bucket / "retry/window.mseed").read_bytes() == b"records"
+    assert engine.metrics.retries == 2
+
+
+def test_segment_cache_evicts_by_bytes_and_serves_views():
+    from obspy import UTCDateTime
+
+    from app.services.storage.segment_cache import DecodedSegment, SegmentCache, SegmentKey
+
+    cache = SegmentCache(max_bytes=2 * 400, block_seconds=60)
+    start = UTCDateTime(2024, 1, 1)
+    keys = [SegmentKey("XX", "STA", "", "HHZ", block) for block in range(3)]
+    for key in keys:
+        segment = DecodedSegment(start, 100.0, np.arange(100, dtype="int32"))
+        cache.put(key, [segment], cache.get(key)[1])
+
+    assert cache.get(keys[0])[0] is None
+    segments, _ = cache.get(keys[2])
+    first, view = segments[0].slice(start + 0.1, start + 0.2)
+    assert first == start + 0.1
+    assert np.array_equal(view, np.arange(10, 21))
+    assert np.shares_memory(view, segments[0].data) and not view.flags.writeable
+    stats = cache.stats()
+    assert (stats.entries, stats.bytes_used, stats.evictions) == (2, 800, 1)
+    assert (stats.hits, stats.misses) == (1, 4)
+
+
+def test_segment_cache_drops_blocks_decoded_during_a_write():
+    from datetime import datetime
+
+    from obspy import UTCDateTime
+
+    from app.services.storage.segment_cache import DecodedSegment, SegmentCache, SegmentKey
+
+    cache = SegmentCache(block_seconds=60)
+    key = SegmentKey("XX", "STA", "", "HHZ", cache.block_of(datetime(2024, 1, 1)))
+    _, version = cache.get(key)
+    cache.invalidate("XX", "STA", None, "HHZ", datetime(2024, 1, 1), datetime(2024, 1, 1, 0, 0, 5))
+    cache.put(key, [DecodedSegment(UTCDateTime(2024, 1, 1), 1.0, np.zeros(3))], version)
+    assert cache.get(key)[0] is None
+
+
+def test_envelope_pyramid_folds_windows_across_midnight(tmp_path):
+    from datetime import datetime
+
+    from app.services.storage.pyramid import EnvelopePyramid
+
+    pyramid = EnvelopePyramid(tmp_path)
+    start = datetime(2024, 1, 1, 23, 59, 58)
+    pyramid.update("XX", "ENV", None, "HHZ", start, 10.0, np.arange(40, dtype="int32"))
+    pyramid.update("XX", "ENV", None, "HHZ", start, 10.0, np.full(5, -7, dtype="int32"))
+
+    (series,) = pyramid.preview("XX", "ENV", start, datetime(2024, 1, 2, 0, 0, 2), 4)
+    assert series.resolution_seconds == 1
+    assert series.minimum.tolist() == [-7.0, 10.0, 20.0, 30.0]
+    assert series.maximum.tolist() == [9.0, 19.0, 29.0, 39.0]
+    assert pyramid.path_for(("XX", "ENV", "", "HHZ"), datetime(2024, 1, 2).date()).exists()
+
+    (coarse,) = pyramid.preview(
+        "XX", "ENV", datetime(2024, 1, 1), datetime(2024, 1, 3), 48, channel="HHZ"
+    )
+    assert coarse.resolution_seconds == 60
+    assert np.isnan(coarse.minimum[0]) and coarse.maximum[23] == 19.0
+    assert coarse.minimum[24] == 20.0
+
+
+def test_interval_runs_merge_and_answer_coverage_queries():
+    from app.services.storage.availability import IntervalRuns
+
+    runs = IntervalRuns()
+    for start, end in ((20, 30), (0, 9.9), (10, 15), (40, 50)):
+        runs.insert(start, end, slack=0.15)
+    assert list(zip(runs.starts, runs.ends)) == [(0, 15), (20, 30), (40, 50)]
+
+    overlaps = runs.insert(25, 35, slack=0.15)
+    assert overlaps == [(25, 30)]
+    assert runs.spans(12, 45) == [(12, 15), (20, 35), (40, 45)]
+    assert runs.covered(12, 45) == 3 + 15 + 5
+    assert runs.gaps(12, 45) == [(15, 20), (35, 40)]
+    assert runs.gaps(12, 56, min_gap=5) == [(50, 56)]
@@ -0,0 +1,493 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app.services.streaming.codecs import (
+    PHASE_PICK_V1,
+    BinaryCodec,
+    CodecError,
+    CodecRegistry,
+    MessageSchema,
+)
+from app.services.streaming.consumer import TopicPartition
+from app.services.streaming.fake_kafka import FakeKafkaBroker
+from app.services.streaming.log_bus import LogMessageBus
+from app.services.streaming.partitioning import PartitionKeyBuilder, murmur2, partition_for
+from app.services.streaming.sharding import ShardedHandler
+from app.services.streaming.message_bus import InMemoryMessageBus, KafkaMessageBus
+
+
+def _kafka_bus(broker, **options):
+    return KafkaMessageBus("fake:9092", producer_factory=broker.producer, **options)
+
+
+def test_publish_many_pipelines_messages_into_batches():
+    broker = FakeKafkaBroker(round_trip_ms=5)
+    bus = _kafka_bus(broker, linger_ms=2, max_batch_size=1 << 20, compression_type="gzip")
+    messages = [(f"XX:STA{index}", {"index": index}) for index in range(200)]
+
+    async def scenario():
+        await bus.start()
+        results = await bus.publish_many("waveforms.raw", messages)
+        single = await bus.publish("waveforms.raw", "XX:ONE", {"index": 200})
+        await bus.stop()
+        return results, single
+
+    results, single = asyncio.run(scenario())
+    assert [result.offset for result in results] == list(range(200))
+    assert single.offset == 200
+    assert broker.produce_requests == 2
+    stored = broker.records("waveforms.raw")
+    assert json.loads(stored[5].value) == {"index": 5}
+    assert stored[5].key == b"XX:STA5"
+
+
+def test_concurrent_publishes_share_a_linger_window():
+    broker = FakeKafkaBroker(round_trip_ms=5)
+    bus = _kafka_bus(broker, linger_ms=5, max_batch_size=400)
+
+    async def scenario():
+        return await asyncio.gather(
+            *[bus.publish("picks", None, {"pick": index}) for index in range(20)]
+        )
+
+    results = asyncio.run(scenario())
+    assert sorted(result.offset for result in results) == list(range(20))
+    # Each record is ~12 bytes of value plus a 16 byte content-type header,
+    # so the 400 byte batch fills after 15 records.
+    assert broker.produce_requests == 2
+
+
+def test_kafka_bus_rejects_unknown_compression():
+    with pytest.raises(ValueError):
+        KafkaMessageBus("fake:9092", compression_type="brotli")
+
+
+def test_in_memory_publish_many_reports_sequential_offsets():
+    bus = InMemoryMessageBus()
+    received = []
+
+    async def handler(message):
+        received.append(message["n"])
+
+    async def scenario():
+        await bus.subscribe("topic", handler)
+        await bus.publish("topic", None, {"n": 0})
+        results = await bus.publish_many("topic", [(None, {"n": 1}), ("k", {"n": 2})])
+        await bus.drain()
+        await bus.stop()
+        return results
+
+    results = asyncio.run(scenario())
+    assert [result.offset for result in results] == [1, 2]
+    assert received == [0, 1, 2]
+
+
+def _slow_consumer_scenario(bus, count, *, release_after=0):
+    received = []
+    gate = asyncio.Event()
+
+    async def handler(message):
+        await gate.wait()
+        received.append(message["n"])
+
+    async def scenario():
+        await bus.subscribe("topic", handler)
+        for index in range(count):
+            if index == release_after:
+                asyncio.get_running_loop().call_later(0.01, gate.set)
+            await bus.publish("topic", None, {"n": index})
+        gate.set()
+        await bus.drain()
+        stats = bus.stats()[0]
+        await bus.stop()
+        return stats
+
+    return received, asyncio.run(scenario())
+
+
+def test_in_memory_block_policy_applies_backpressure():
+    bus = InMemoryMessageBus(queue_size=2, overflow="block")
+    received, stats = _slow_consumer_scenario(bus, 10, release_after=0)
+    assert received == list(range(10))
+    assert stats.dropped == 0
+
+
+def test_in_memory_drop_oldest_keeps_publishers_moving():
+    bus = InMemoryMessageBus(queue_size=2, overflow="drop-oldest")
+    received, stats = _slow_consumer_scenario(bus, 10, release_after=10)
+    # Publishing never yields here, so only the newest two reach the worker.
+    assert received == [8, 9]
+    assert stats.dropped == 8
+
+
+def test_in_memory_spill_preserves_order(tmp_path):
+    bus = InMemoryMessageBus(queue_size=2, overflow="spill", spill_dir=tmp_path)
+    received, stats = _slow_consumer_scenario(bus, 50, release_after=50)
+    assert received == list(range(50))
+    assert stats.spilled > 0 and stats.spilled_pending == 0
+
+
+def test_in_memory_retention_and_replay():
+    bus = InMemoryMessageBus(retention=5)
+    replayed = []
+    resumed = []
+
+    async def scenario():
+        await bus.publish_many("topic", [(None, {"n": index}) for index in range(8)])
+        assert bus.offsets("topic") == (3, 8)
+        assert [record.offset for record in bus.read("topic", 0)] == [3, 4, 5, 6, 7]
+
+        async def replay(message):
+            replayed.append(message["n"])
+
+        await bus.subscribe("topic", replay, group_id="replay", from_offset=0)
+        await bus.drain()
+        await bus.publish("topic", None, {"n": 8})
+        await bus.drain()
+
+        async def resume(message):
+            resumed.append(message["n"])
+
+        # A second member of the group picks up where the group left off.
+        await bus.publish("topic", None, {"n": 9})
+        await bus.drain()
+        await bus.subscribe("topic", resume, group_id="replay")
+        await bus.publish("topic", None, {"n": 10})
+        await bus.drain()
+        stats = bus.stats()[0]
+        await bus.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert replayed == [3, 4, 5, 6, 7, 8, 9, 10]
+    assert stats.dropped == 3
+    assert resumed == [10]
+
+
+def test_in_memory_handler_errors_do_not_reach_publisher():
+    bus = InMemoryMessageBus()
+
+    async def handler(message):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        await bus.subscribe("topic", handler)
+        result = await bus.publish("topic", None, {"n": 0})
+        await bus.drain()
+        stats = bus.stats()[0]
+        await bus.stop()
+        return result, stats
+
+    result, stats = asyncio.run(scenario())
+    assert result.offset == 0
+    assert stats.failed == 1
+
+
+def test_in_memory_rejects_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        InMemoryMessageBus(overflow="ignore")
+
+
+def test_binary_codec_round_trips_picks_and_unknown_fields():
+    codec = CodecRegistry().binary.for_schema("phase_pick")
+    pick = {
+        "station_code": "STA01",
+        "phase_type": "P",
+        "pick_time": datetime(2024, 1, 1, 0, 0, 1, 250000),
+        "probability": 0.5,
+        "polarity": None,
+        "extra": {"snr": 12.5},
+        "network": "XX",
+    }
+    data = codec.encode(pick)
+    assert codec.decode(data) == pick
+    assert len(data) < len(json.dumps(pick, default=str))
+
+
+def test_binary_codec_decodes_older_schema_versions():
+    v2 = MessageSchema(2, 2, "phase_pick", PHASE_PICK_V1.fields + (("model", "str"),))
+    writer = BinaryCodec([PHASE_PICK_V1, v2])
+    reader = BinaryCodec([PHASE_PICK_V1])
+    old = writer.encode({"station_code": "STA01", "phase_type": "S"}, PHASE_PICK_V1)
+    assert reader.decode(old)["phase_type"] == "S"
+    with pytest.raises(CodecError):
+        reader.decode(writer.for_schema("phase_pick").encode({"station_code": "STA01"}))
+
+
+def test_kafka_bus_tags_records_with_topic_codec():
+    broker = FakeKafkaBroker()
+    codecs = CodecRegistry({"picks": "binary:phase_pick"})
+    bus = _kafka_bus(broker, codecs=codecs)
+    pick = {"station_code": "STA01", "phase_type": "P", "pick_time": datetime(2024, 1, 1)}
+
+    async def scenario():
+        picks = await bus.publish("picks", "XX:STA01", pick)
+        raw = await bus.publish("raw", None, {"start_time": datetime(2024, 1, 1)})
+        await bus.stop()
+        return picks, raw
+
+    picks, raw = asyncio.run(scenario())
+    assert picks.headers == {"content-type": "binary"}
+    stored = broker.records("picks")[0]
+    assert stored.headers == [("content-type", b"binary")]
+    assert codecs.decode(stored.value, stored.headers)["pick_time"] == datetime(2024, 1, 1)
+    untagged = broker.records("raw")[0]
+    assert codecs.decode(untagged.value) == {"start_time": "2024-01-01T00:00:00"}
+
+
+def test_codec_registry_rejects_unavailable_codecs():
+    with pytest.raises(ValueError):
+        CodecRegistry({"picks": "binary"})
+    with pytest.raises(ValueError):
+        CodecRegistry(default="avro")
+
+
+def _consumer_bus(broker, **options):
+    return KafkaMessageBus(
+        "fake:9092",
+        producer_factory=broker.producer,
+        consumer_factory=broker.consumer,
+        linger_ms=0,
+        **options,
+    )
+
+
+def test_kafka_consumer_orders_keys_and_commits_processed_prefix():
+    broker = FakeKafkaBroker(partitions=2)
+    bus = _consumer_bus(broker, consumer_concurrency=8, consumer_commit_interval_ms=0)
+    seen = {}
+    active = 0
+    peak = 0
+
+    async def handler(message):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.001 * (message["n"] % 3))
+        seen.setdefault(message["station"], []).append(message["n"])
+        active -= 1
+
+    async def scenario():
+        await bus.subscribe("picks", handler, group_id="pickers")
+        await bus.publish_many(
+            "picks",
+            [(f"STA{index % 5}", {"station": index % 5, "n": index}) for index in range(100)],
+        )
+        (metrics,) = bus.consumer_metrics()
+        while metrics.processed < 100:
+            await asyncio.sleep(0.005)
+        await bus.stop()
+        return metrics
+
+    metrics = asyncio.run(scenario())
+    for station, values in seen.items():
+        assert values == sorted(values)
+    assert sum(len(values) for values in seen.values()) == 100
+    assert 1 < peak <= 8
+    committed = [broker.committed("pickers", "picks", partition) or 0 for partition in range(2)]
+    assert sum(committed) == 100
+    assert metrics.total_lag == 0 and metrics.commits >= 1
+
+
+def test_kafka_consumer_resumes_from_committed_offsets():
+    broker = FakeKafkaBroker()
+    received = []
+
+    async def handler(message):
+        received.append(message["n"])
+
+    async def consume(values, expected):
+        bus = _consumer_bus(broker)
+        await bus.subscribe("picks", handler, group_id="pickers")
+        await bus.publish_many("picks", [(None, {"n": n}) for n in values])
+        while bus.consumer_metrics()[0].processed < expected:
+            await asyncio.sleep(0.005)
+        await bus.stop()
+
+    async def publish_offline():
+        bus = _consumer_bus(broker)
+        await bus.publish("picks", None, {"n": 3})
+        await bus.stop()
+
+    asyncio.run(consume([0, 1, 2], 3))
+    # Published while no member of the group is running.
+    asyncio.run(publish_offline())
+    asyncio.run(consume([4, 5], 3))
+    assert received == [0, 1, 2, 3, 4, 5]
+
+
+def test_kafka_consumer_commits_only_assigned_partitions_after_rebalance():
+    broker = FakeKafkaBroker(partitions=2)
+    bus = _consumer_bus(broker, consumer_commit_interval_ms=0)
+
+    async def handler(message):
+        return None
+
+    async def drained(consumer, count):
+        async def wait():
+            while consumer.metrics.processed < count:
+                await asyncio.sleep(0.005)
+
+        await asyncio.wait_for(wait(), timeout=5)
+        await asyncio.sleep(0.02)
+
+    async def scenario():
+        await bus.subscribe("picks", handler, group_id="pickers")
+        (consumer,) = bus._consumers
+        await bus.publish_many("picks", [(f"STA{n}", {"n": n}) for n in range(20)])
+        await drained(consumer, 20)
+        await consumer.consumer.rebalance([TopicPartition("picks", 0)])
+        revoked = broker.committed("pickers", "picks", 1)
+        before = len(broker.records("picks", 0))
+        await bus.publish_many("picks", [(f"STA{n}", {"n": n}) for n in range(20, 40)])
+        # Only partition 0 is still assigned, so only its new records arrive.
+        await drained(consumer, 20 + len(broker.records("picks", 0)) - before)
+        metrics = consumer.metrics
+        await bus.stop()
+        return revoked, metrics
+
+    revoked, metrics = asyncio.run(scenario())
+    assert metrics.commit_failures == 0
+    assert broker.committed("pickers", "picks", 0) == len(broker.records("picks", 0))
+    # Partition 1 was committed when it was revoked and never touched again.
+    assert revoked is not None and revoked > 0
+    assert broker.committed("pickers", "picks", 1) == revoked
+
+
+def test_log_bus_survives_restart_and_torn_tail(tmp_path):
+    async def write():
+        bus = LogMessageBus(tmp_path, fsync="always")
+        results = await bus.publish_many("picks", [("STA1", {"n": n}) for n in range(10)])
+        await bus.stop()
+        return results
+
+    results = asyncio.run(write())
+    assert [result.offset for result in results] == list(range(10))
+    # Simulate a crash halfway through appending another record.
+    log = tmp_path / "picks-0" / f"{0:020d}.log"
+    size = log.stat().st_size
+    with open(log, "ab") as handle:
+        handle.write(b"\x00\x00\x00\x40garbage")
+
+    async def reopen():
+        bus = LogMessageBus(tmp_path, auto_offset_reset="earliest")
+        assert bus.offsets("picks") == (0, 10)
+        appended = await bus.publish("picks", "STA1", {"n": 10})
+        received = []
+
+        async def handler(message):
+            received.append(message["n"])
+
+        await bus.subscribe("picks", handler, group_id="pickers")
+        while bus.consumer_metrics()[0].processed < 11:
+            await asyncio.sleep(0.005)
+        await bus.stop()
+        return appended, received
+
+    appended, received = asyncio.run(reopen())
+    assert appended.offset == 10
+    assert received == list(range(11))
+    assert log.stat().st_size > size
+
+
+def test_log_bus_rolls_segments_and_applies_retention(tmp_path):
+    async def scenario():
+        bus = LogMessageBus(
+            tmp_path, segment_bytes=2048, index_interval_bytes=256, retention_bytes=6144
+        )
+        await bus.publish_many("raw", [(None, {"n": n, "pad": "x" * 40}) for n in range(300)])
+        first, end = bus.offsets("raw")
+        partition = bus._partitions("raw")[0]
+        middle = partition.read(first + 17, 3)
+        await bus.stop()
+        return first, end, [entry.offset for entry in middle]
+
+    first, end, middle = asyncio.run(scenario())
+    segments = sorted((tmp_path / "raw-0").glob("*.log"))
+    assert end == 300
+    assert 0 < first and len(segments) <= 4
+    assert int(segments[0].stem) == first
+    assert middle == [first + 17, first + 18, first + 19]
+
+
+def test_log_bus_consumer_group_resumes_after_restart(tmp_path):
+    received = []
+
+    async def handler(message):
+        received.append(message["n"])
+
+    async def run(values, expected):
+        bus = LogMessageBus(tmp_path, partitions=3, fsync="never")
+        await bus.subscribe("picks", handler, group_id="pickers")
+        await bus.publish_many("picks", [(f"STA{n % 4}", {"n": n}) for n in values])
+        while sum(m.processed for m in bus.consumer_metrics()) < expected:
+            await asyncio.sleep(0.005)
+        await bus.stop()
+
+    asyncio.run(run(range(20), 20))
+    asyncio.run(run(range(20, 30), 10))
+    assert sorted(received) == list(range(30))
+    assert json.loads((tmp_path / "picks-0" / "consumer-offsets.json").read_text())["pickers"] > 0
+
+
+def test_murmur2_matches_kafka_reference_values():
+    assert murmur2(b"21") == -973932308
+    assert murmur2(b"foobar") == -790332482
+    assert murmur2(b"a-little-bit-long-string") == -985981536
+    assert murmur2(b"") == 275646681
+    assert partition_for(b"foobar", 7) == (-790332482 & 0x7FFFFFFF) % 7
+
+
+def test_partition_keys_group_windows_by_station_or_cell():
+    start = datetime(2024, 1, 1)
+    later = datetime(2024, 1, 1, 0, 10)
+    station = PartitionKeyBuilder()
+    assert station("XX", "STA01", start) == station("XX", "STA01", later) == "XX.STA01"
+    coordinates = {("XX", "STA01"): (39.9, 116.3), ("XX", "STA02"): (39.1, 116.8)}
+    cell = PartitionKeyBuilder(
+        "cell", cell_degrees=1.0, locate=lambda net, sta: coordinates.get((net, sta))
+    )
+    assert cell("XX", "STA01", start) == cell("XX", "STA02", later)
+    assert cell("XX", "STA03", start) == "XX.STA03"
+    window = PartitionKeyBuilder("window")
+    assert window("XX", "STA01", start) != window("XX", "STA01", later)
+    with pytest.raises(ValueError):
+        PartitionKeyBuilder("random")
+
+
+def test_sharded_handler_keeps_each_station_on_one_worker():
+    seen = {}
+    owners = {}
+
+    def factory(shard):
+        state = {}
+
+        async def handle(message):
+            station = message["station_code"]
+            owners.setdefault(station, set()).add(shard)
+            # Per-shard state needs no locking: only this worker touches it.
+            state[station] = state.get(station, -1) + 1
+            assert state[station] == message["n"]
+            await asyncio.sleep(0)
+            seen.setdefault(station, []).append(message["n"])
+
+        return handle
+
+    handler = ShardedHandler(factory, shards=4)
+
+    async def scenario():
+        await asyncio.gather(
+            *[
+                handler({"network": "XX", "station_code": f"STA{index % 6}", "n": index // 6})
+                for index in range(60)
+            ]
+        )
+        await handler.stop()
+
+    asyncio.run(scenario())
+    assert all(len(shards) == 1 for shards in owners.values())
+    assert all(values == list(range(10)) for values in seen.values())
+    assert sum(handler.handled) == 60
@@ -0,0 +1,433 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.utils.executor import PersistenceExecutor, PersistenceSaturatedError
+
+
+def test_binary_ingest_accepts_raw_int32_samples():
+    samples = np.arange(500, dtype="<i4")
+    with TestClient(app) as client:
+        response = client.post(
+            "/waveforms/ingest/binary",
+            content=samples.tobytes(),
+            headers={
+                "Content-Type": "application/octet-stream",
+                "X-Sample-Format": "int32",
+                "X-Station-Code": "WAV1",
+                "X-Network": "XX",
+                "X-Sampling-Rate": "100",
+                "X-Start-Time": "2024-01-01T00:00:00",
+            },
+        )
+    assert response.status_code == 202
+    body = response.json()
+    assert body["waveform_file_id"] > 0
+    assert {"queue_wait", "encode", "write", "db"} <= set(body["timings_ms"])
+
+
+def test_binary_ingest_accepts_miniseed_records():
+    import io
+
+    from obspy import Stream, Trace, UTCDateTime
+
+    trace = Trace(
+        data=np.arange(300, dtype="int32"),
+        header={
+            "network": "XX",
+            "station": "WAV2",
+            "sampling_rate": 50.0,
+            "starttime": UTCDateTime(2024, 1, 1, 1),
+        },
+    )
+    buffer = io.BytesIO()
+    Stream([trace]).write(buffer, format="MSEED")
+    with TestClient(app) as client:
+        response = client.post(
+            "/waveforms/ingest/binary",
+            content=buffer.getvalue(),
+            headers={"Content-Type": "application/vnd.fdsn.mseed"},
+        )
+    assert response.status_code == 202
+
+
+def test_binary_ingest_rejects_truncated_body():
+    with TestClient(app) as client:
+        response = client.post(
+            "/waveforms/ingest/binary",
+            content=b"\x00\x01\x02",
+            headers={
+                "Content-Type": "application/octet-stream",
+                "X-Station-Code": "WAV1",
+                "X-Sampling-Rate": "100",
+                "X-Start-Time": "2024-01-01T00:00:00",
+            },
+        )
+    assert response.status_code == 400
+
+
+def test_batch_ingest_reports_partial_failures():
+    good = {
+        "station_code": "BAT1",
+        "network": "XX",
+        "sampling_rate": 100.0,
+        "start_time": "2024-01-02T00:00:00",
+        "end_time": "2024-01-02T00:00:00.04",
+        "samples": [1.0, 2.0, 3.0, 4.0, 5.0],
+    }
+    other_station = dict(good, station_code="BAT2")
+    empty = dict(good, samples=[])
+    malformed = {"station_code": "BAT1"}
+    with TestClient(app) as client:
+        response = client.post(
+            "/waveforms/ingest/batch",
+            json={"windows": [good, malformed, other_station, empty]},
+        )
+    assert response.status_code == 202
+    body = response.json()
+    assert body["accepted"] == 2
+    assert body["failed"] == 2
+    results = body["results"]
+    assert [item["accepted"] for item in results] == [True, False, True, False]
+    assert results[0]["waveform_file_id"] != results[2]["waveform_file_id"]
+    assert results[1]["error"]
+
+
+def test_persistence_executor_rejects_when_saturated():
+    release = threading.Event()
+
+    async def scenario() -> None:
+        executor = PersistenceExecutor(max_workers=1, max_inflight=1)
+        try:
+            blocked = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0)
+            with pytest.raises(PersistenceSaturatedError):
+                await executor.run(lambda: None)
+            release.set()
+            assert await blocked is True
+            assert executor.stats().rejected == 1
+        finally:
+            release.set()
+            executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_resent_window_returns_original_file_and_offset():
+    samples = np.arange(200, dtype="<i4") * 3
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "X-Station-Code": "DUP1",
+        "X-Network": "XX",
+        "X-Sampling-Rate": "100",
+        "X-Start-Time": "2024-02-01T00:00:00",
+    }
+    window = {
+        "station_code": "DUP1",
+        "network": "XX",
+        "sampling_rate": 100.0,
+        "start_time": "2024-02-01T00:00:00",
+        "end_time": "2024-02-01T00:00:01.99",
+        "samples": [float(value) for value in samples],
+    }
+    with TestClient(app) as client:
+        first = client.post("/waveforms/ingest/binary", content=samples.tobytes(), headers=headers)
+        retry = client.post("/waveforms/ingest/binary", content=samples.tobytes(), headers=headers)
+        as_json = client.post("/waveforms/ingest", json=window)
+        batch = client.post("/waveforms/ingest/batch", json={"windows": [window, window]})
+
+    original = first.json()
+    assert original["duplicate"] is False
+    for response in (retry.json(), as_json.json()):
+        assert response["duplicate"] is True
+        assert response["waveform_file_id"] == original["waveform_file_id"]
+        assert response["stream_offset"] == original["stream_offset"]
+        assert "encode" not in response["timings_ms"]
+    results = batch.json()["results"]
+    assert all(item["duplicate"] and item["accepted"] for item in results)
+    assert {item["waveform_file_id"] for item in results} == {original["waveform_file_id"]}
+
+
+def test_batch_repeats_are_stored_once():
+    window = {
+        "station_code": "DUP2",
+        "network": "XX",
+        "sampling_rate": 50.0,
+        "start_time": "2024-02-02T00:00:00",
+        "end_time": "2024-02-02T00:00:00.06",
+        "samples": [5.0, 6.0, 7.0, 8.0],
+    }
+    with TestClient(app) as client:
+        response = client.post("/waveforms/ingest/batch", json={"windows": [window, window]})
+    first, repeat = response.json()["results"]
+    assert first["duplicate"] is False and repeat["duplicate"] is True
+    assert repeat["waveform_file_id"] == first["waveform_file_id"]
+    assert repeat["stream_offset"] == first["stream_offset"] is not None
+
+
+def test_retry_republishes_window_whose_first_publish_failed():
+    samples = np.arange(120, dtype="<i4") * 7
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "X-Station-Code": "DUP3",
+        "X-Network": "XX",
+        "X-Sampling-Rate": "100",
+        "X-Start-Time": "2024-02-03T00:00:00",
+    }
+    with TestClient(app, raise_server_exceptions=False) as client:
+        publisher = app.state.waveform_stream_publisher
+        original = publisher.publish_waveform
+
+        async def fail_once(payload):
+            publisher.publish_waveform = original
+            raise RuntimeError("broker unavailable")
+
+        publisher.publish_waveform = fail_once
+        failed = client.post("/waveforms/ingest/binary", content=samples.tobytes(), headers=headers)
+        retry = client.post("/waveforms/ingest/binary", content=samples.tobytes(), headers=headers)
+        again = client.post("/waveforms/ingest/binary", content=samples.tobytes(), headers=headers)
+
+    assert failed.status_code == 500
+    assert retry.json()["duplicate"] is True
+    assert retry.json()["stream_offset"] is not None
+    assert again.json()["stream_offset"] == retry.json()["stream_offset"]
+
+
+def test_concurrent_writes_of_one_window_store_it_once():
+    from datetime import datetime, timedelta
+
+    from sqlalchemy.exc import IntegrityError
+    from sqlmodel import select
+
+    from app.db.session import session_factory
+    from app.models.base import WaveformFile
+    from app.services.pipeline.context import WaveformPayload
+
+    def payload() -> WaveformPayload:
+        start = datetime(2024, 2, 4)
+        return WaveformPayload(
+            station_code="DUP4",
+            network="XX",
+            start_time=start,
+            end_time=start + timedelta(seconds=1),
+            samples=np.arange(100, dtype=np.int32),
+            sampling_rate=100.0,
+        )
+
+    with TestClient(app):
+        persistence = app.state.waveform_persistence
+        write_window = persistence._write_window
+        entered = threading.Event()
+
+        def slow_write(window, samples):
+            entered.set()
+            threading.Event().wait(0.2)
+            return write_window(window, samples)
+
+        persistence._write_window = slow_write
+        results = {}
+        try:
+            first = threading.Thread(
+                target=lambda: results.setdefault("first", persistence.store_waveform(payload()))
+            )
+            first.start()
+            entered.wait(5)
+            results["second"] = persistence.store_waveform(payload())
+            first.join()
+        finally:
+            del persistence._write_window
+
+    assert results["first"].id == results["second"].id
+    with session_factory() as session:
+        rows = session.exec(
+            select(WaveformFile).where(WaveformFile.fingerprint == results["first"].fingerprint)
+        ).all()
+        assert len(rows) == 1
+        row = rows[0]
+        session.add(
+            WaveformFile(
+                station_id=row.station_id,
+                start_time=row.start_time,
+                end_time=row.end_time,
+                file_path=row.file_path,
+                fingerprint=row.fingerprint,
+            )
+        )
+        with pytest.raises(IntegrityError):
+            session.commit()
+
+
+def test_new_windows_skip_the_database_and_old_copies_resolve_on_insert():
+    from datetime import datetime, timedelta
+
+    from app.db.session import session_factory
+    from app.services.pipeline.context import WaveformPayload
+    from app.services.utils.dedup import WaveformDedupIndex
+
+    def payload(offset: int) -> WaveformPayload:
+        start = datetime(2024, 2, 5) + timedelta(seconds=offset)
+        return WaveformPayload(
+            station_code="DUP5",
+            network="XX",
+            start_time=start,
+            end_time=start + timedelta(seconds=1),
+            samples=np.arange(100, dtype=np.int32) + offset,
+            sampling_rate=100.0,
+        )
+
+    queries = []
+
+    def counting_factory():
+        queries.append(1)
+        return session_factory()
+
+    with TestClient(app):
+        persistence = app.state.waveform_persistence
+        original = persistence.store_waveform(payload(0))
+        persistence.dedup = WaveformDedupIndex(counting_factory)  # as after a restart
+        try:
+            persistence.store_waveform(payload(1))
+            assert queries == []
+            retried = payload(0)
+            stored = persistence.store_waveform(retried)
+        finally:
+            persistence.dedup = app.state.waveform_dedup
+
+    assert retried.duplicate is True
+    assert stored.id == original.id
+    assert len(queries) == 1
+
+
+def test_deduplicating_handler_skips_redelivered_windows():
+    from app.services.utils.dedup import WaveformDedupIndex, deduplicating_handler
+
+    seen = []
+
+    async def handler(message):
+        seen.append(message["fingerprint"])
+
+    index = WaveformDedupIndex(session_factory=None)  # consumer checks never hit the DB
+    wrapped = deduplicating_handler(index, handler, group="picker")
+
+    async def scenario() -> None:
+        for fingerprint in ("a", "b", "a", None):
+            await wrapped({"fingerprint": fingerprint})
+
+    asyncio.run(scenario())
+    assert seen == ["a", "b", None]
+    assert index.first_delivery("a", group="locator") is True
+
+
+def test_read_waveforms_returns_trimmed_span():
+    import io
+
+    from obspy import read
+
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "X-Station-Code": "RD1",
+        "X-Network": "XX",
+        "X-Channel": "HHZ",
+        "X-Sampling-Rate": "100",
+    }
+    first = np.arange(1000, dtype="<i4")
+    second = np.arange(1000, 2000, dtype="<i4")
+    with TestClient(app) as client:
+        for start, samples in (("2024-03-01T00:00:00", first), ("2024-03-01T00:00:10", second)):
+            client.post(
+                "/waveforms/ingest/binary",
+                content=samples.tobytes(),
+                headers={**headers, "X-Start-Time": start},
+            )
+        span = {"start": "2024-03-01T00:00:05", "end": "2024-03-01T00:00:14.99"}
+        as_npy = client.get("/waveforms/XX/RD1", params={**span, "format": "npy"})
+        as_mseed = client.get("/waveforms/XX/RD1", params=span)
+        missing = client.get(
+            "/waveforms/XX/RD1",
+            params={"start": "2024-03-02T00:00:00", "end": "2024-03-02T01:00:00"},
+        )
+
+    assert as_npy.status_code == 200
+    data = np.load(io.BytesIO(as_npy.content))
+    assert np.array_equal(data, np.arange(500, 1500))
+    assert as_npy.headers["x-channel"] == "HHZ"
+    assert as_npy.headers["x-start-time"].startswith("2024-03-01T00:00:05")
+
+    stream = read(io.BytesIO(as_mseed.content))
+    stream.merge()
+    assert as_mseed.headers["content-type"] == "application/vnd.fdsn.mseed"
+    assert np.array_equal(stream[0].data, np.arange(500, 1500))
+    assert missing.status_code == 404
+
+
+def test_repeated_reads_hit_the_segment_cache_until_new_data_arrives():
+    import io
+
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "X-Station-Code": "RD2",
+        "X-Network": "XX",
+        "X-Channel": "HHZ",
+        "X-Sampling-Rate": "100",
+    }
+    span = {"start": "2024-03-05T00:00:00", "end": "2024-03-05T00:00:19.99", "format": "npy"}
+    with TestClient(app) as client:
+        cache = app.state.segment_cache
+        client.post(
+            "/waveforms/ingest/binary",
+            content=np.arange(1000, dtype="<i4").tobytes(),
+            headers={**headers, "X-Start-Time": "2024-03-05T00:00:00"},
+        )
+        first = client.get("/waveforms/XX/RD2", params=span)
+        misses = cache.stats().misses
+        client.get("/waveforms/XX/RD2", params=span)
+        assert cache.stats().misses == misses and cache.stats().hits >= 1
+
+        client.post(
+            "/waveforms/ingest/binary",
+            content=np.arange(1000, 2000, dtype="<i4").tobytes(),
+            headers={**headers, "X-Start-Time": "2024-03-05T00:00:10"},
+        )
+        extended = client.get("/waveforms/XX/RD2", params=span)
+
+    assert len(np.load(io.BytesIO(first.content))) == 1000
+    assert np.array_equal(np.load(io.BytesIO(extended.content)), np.arange(2000))
+
+
+def test_preview_returns_fixed_number_of_envelope_points():
+    samples = np.sin(np.linspace(0, 20 * np.pi, 6000)) * 1000
+    with TestClient(app) as client:
+        client.post(
+            "/waveforms/ingest/binary",
+            content=samples.astype("<f4").tobytes(),
+            headers={
+                "Content-Type": "application/octet-stream",
+                "X-Sample-Format": "float32",
+                "X-Station-Code": "PRV1",
+                "X-Network": "XX",
+                "X-Channel": "HHZ",
+                "X-Sampling-Rate": "100",
+                "X-Start-Time": "2024-03-10T00:00:00",
+            },
+        )
+        response = client.get(
+            "/waveforms/XX/PRV1/preview",
+            params={"start": "2024-03-10T00:00:00", "end": "2024-03-10T00:01:00", "points": 30},
+        )
+        missing = client.get(
+            "/waveforms/XX/PRV1/preview",
+            params={"start": "2024-03-11T00:00:00", "end": "2024-03-11T01:00:00"},
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["points"] == 30 and body["resolution_seconds"] == 1
+    (channel,) = body["channels"]
+    assert channel["channel"] == "HHZ" and len(channel["maximum"]) == 30
+    assert max(channel["maximum"]) == pytest.approx(1000, rel=1e-3)
+    assert min(channel["minimum"]) == pytest.approx(-1000, rel=1e-3)
+    assert missing.status_code == 404